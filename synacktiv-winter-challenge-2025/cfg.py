@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Recursive traversal disassembly into basic blocks.
+
+Starting from one or more entry points every branch kind the decoder knows about
+(jmp, jcc, loop*, jecxz, call) is followed. Decoded blocks are cached by address
+in the `ControlFlowGraph` so new entry points only decode the code that was not
+reached yet. Jumps landing on an instruction of a known block split it; jumps in
+the middle of an instruction (overlapping code, common in golfed headers) start
+a new block that overlaps the existing one.
+"""
+
+import json
+from collections.abc import Callable, Iterable
+from typing import Any, NamedTuple
+
+from report import cfg_lines
+from x86_decoder import Flow, Instruction
+
+
+class Edge(NamedTuple):
+    target: int
+    kind: str  # 'fallthrough', 'jump', 'branch' or 'call'
+
+
+class BasicBlock:
+    __slots__ = ('instructions', 'start', 'successors')
+
+    def __init__(self, start: int, instructions: list[Instruction], successors: list[Edge]) -> None:
+        self.start = start
+        self.instructions = instructions
+        self.successors = successors
+
+    @property
+    def end(self) -> int:
+        """Address following the last instruction of the block"""
+        return self.instructions[-1].next_address if self.instructions else self.start
+
+
+def successors_of(instruction: Instruction) -> list[Edge]:
+    """Edges leaving a block that ends with `instruction`"""
+    flow = instruction.flow
+    target = instruction.target
+    if flow == Flow.JUMP and target is not None:
+        return [Edge(target, 'jump')]
+    if flow == Flow.BRANCH and target is not None:
+        return [Edge(target, 'branch'), Edge(instruction.next_address, 'fallthrough')]
+    if flow == Flow.CALL and target is not None:
+        return [Edge(target, 'call'), Edge(instruction.next_address, 'fallthrough')]
+    if flow == Flow.NEXT:
+        return [Edge(instruction.next_address, 'fallthrough')]
+    # ret, indirect jumps, hlt and invalid opcodes end the path
+    return []
+
+
+class ControlFlowGraph:
+    def __init__(self, decode_at: Callable[[int], Instruction | None], max_instructions: int = 100_000) -> None:
+        self.decode_at = decode_at
+        self.max_instructions = max_instructions
+        self.blocks: dict[int, BasicBlock] = {}
+        self.entries: list[int] = []
+        self.unresolved: set[int] = set()  # Targets that are not loaded from the file
+        self.decoded = 0
+        # Instruction address -> start of the block holding it, to split blocks
+        self.owner: dict[int, int] = {}
+
+    def add_entry(self, address: int) -> None:
+        """Explore the code reachable from `address`, reusing the blocks already decoded"""
+        if address not in self.entries:
+            self.entries.append(address)
+        worklist = [address]
+        while worklist:
+            start = worklist.pop()
+            if start in self.blocks or start in self.unresolved:
+                continue
+            if start in self.owner:
+                self.split(start)
+                continue
+            block = self.decode_block(start)
+            if block is None:
+                self.unresolved.add(start)
+                continue
+            worklist.extend(edge.target for edge in reversed(block.successors))
+
+    def decode_block(self, start: int) -> BasicBlock | None:
+        instructions: list[Instruction] = []
+        successors: list[Edge] = []
+        address = start
+        while self.decoded < self.max_instructions:
+            instruction = self.decode_at(address)
+            if instruction is None:
+                break
+            self.decoded += 1
+            instructions.append(instruction)
+            successors = successors_of(instruction)
+            address = instruction.next_address
+            if instruction.flow != Flow.NEXT:
+                break
+            if address in self.blocks or address in self.owner:
+                # Fall into a block that is already known
+                break
+            successors = []
+        if not instructions:
+            return None
+        block = BasicBlock(start, instructions, successors)
+        self.blocks[start] = block
+        for instruction in instructions:
+            self.owner.setdefault(instruction.address, start)
+        return block
+
+    def split(self, address: int) -> None:
+        """Split the block holding the instruction at `address` so a block starts there"""
+        block = self.blocks[self.owner[address]]
+        index = next(i for i, instruction in enumerate(block.instructions) if instruction.address == address)
+        tail = BasicBlock(address, block.instructions[index:], block.successors)
+        block.instructions = block.instructions[:index]
+        block.successors = [Edge(address, 'fallthrough')]
+        self.blocks[address] = tail
+        for instruction in tail.instructions:
+            if self.owner.get(instruction.address) == block.start:
+                self.owner[instruction.address] = address
+
+    def sorted_blocks(self) -> list[BasicBlock]:
+        return [self.blocks[start] for start in sorted(self.blocks)]
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'entries': self.entries,
+            'blocks': [
+                {
+                    'start': block.start,
+                    'end': block.end,
+                    'instructions': [ins.as_dict() for ins in block.instructions],
+                    'successors': [edge._asdict() for edge in block.successors],
+                }
+                for block in self.sorted_blocks()
+            ],
+            'unresolved': sorted(self.unresolved),
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.as_dict(), separators=(',', ':'))
+
+    def to_dot(self) -> str:
+        lines = ['digraph cfg {', '  node [shape=box, fontname="monospace"];']
+        for block in self.sorted_blocks():
+            label = ''.join(f'0x{ins.address:08x}: {ins.text}\\l' for ins in block.instructions)
+            style = ', style=bold' if block.start in self.entries else ''
+            lines.append(f'  "0x{block.start:x}" [label="{label}"{style}];')
+        for block in self.sorted_blocks():
+            for edge in block.successors:
+                style = ' [style=dashed]' if edge.kind == 'fallthrough' else f' [label="{edge.kind}"]'
+                lines.append(f'  "0x{block.start:x}" -> "0x{edge.target:x}"{style};')
+        for address in sorted(self.unresolved):
+            lines.append(f'  "0x{address:x}" [label="0x{address:x} (not in file)", style=dotted];')
+        lines.append('}')
+        return '\n'.join(lines)
+
+    def to_text(self) -> str:
+        return '\n'.join(cfg_lines(self.as_dict()))
+
+
+def build_cfg(decode_at: Callable[[int], Instruction | None], entries: Iterable[int]) -> ControlFlowGraph:
+    cfg = ControlFlowGraph(decode_at)
+    for entry in entries:
+        cfg.add_entry(entry)
+    return cfg
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""Vectorized ELF header parsing for mass triage of small ELFs.
+
+The first bytes of N files are stacked in one (N, width) uint8 buffer and every
+field is decoded at once by viewing the rows through NumPy structured dtypes, one
+per (class, endianness) layout, then merging the views row by row. The program
+headers are gathered at e_phoff the same way, so the validity masks (magic,
+e_phentsize, p_memsz >= p_filesz, entry inside a PT_LOAD) are plain array
+expressions. Layouts are chosen like `unpack_ehdr`: EI_CLASS 2 is 64-bit,
+anything else 32-bit, EI_DATA 2 is big-endian, anything else little-endian.
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+
+from elf_parser import EHDR64_SIZE, PAGE_SIZE, PhType
+from report import ReportWriter
+
+ELF_MAGIC = np.frombuffer(b'\x7fELF', dtype=np.uint8)
+PHDR32_SIZE = 32
+PHDR64_SIZE = 56
+
+# (name, 32-bit offset, 32-bit format, 64-bit offset, 64-bit format)
+Layout = Sequence[tuple[str, int, str, int, str]]
+
+EHDR_LAYOUT: Layout = (
+    ('ei_class', 4, 'u1', 4, 'u1'),
+    ('ei_data', 5, 'u1', 5, 'u1'),
+    ('e_type', 16, 'u2', 16, 'u2'),
+    ('e_machine', 18, 'u2', 18, 'u2'),
+    ('e_version', 20, 'u4', 20, 'u4'),
+    ('e_entry', 24, 'u4', 24, 'u8'),
+    ('e_phoff', 28, 'u4', 32, 'u8'),
+    ('e_shoff', 32, 'u4', 40, 'u8'),
+    ('e_flags', 36, 'u4', 48, 'u4'),
+    ('e_ehsize', 40, 'u2', 52, 'u2'),
+    ('e_phentsize', 42, 'u2', 54, 'u2'),
+    ('e_phnum', 44, 'u2', 56, 'u2'),
+    ('e_shentsize', 46, 'u2', 58, 'u2'),
+    ('e_shnum', 48, 'u2', 60, 'u2'),
+    ('e_shstrndx', 50, 'u2', 62, 'u2'),
+)
+# Same order as the `Phdr` NamedTuple
+PHDR_LAYOUT: Layout = (
+    ('p_type', 0, 'u4', 0, 'u4'),
+    ('p_offset', 4, 'u4', 8, 'u8'),
+    ('p_vaddr', 8, 'u4', 16, 'u8'),
+    ('p_paddr', 12, 'u4', 24, 'u8'),
+    ('p_filesz', 16, 'u4', 32, 'u8'),
+    ('p_memsz', 20, 'u4', 40, 'u8'),
+    ('p_flags', 24, 'u4', 4, 'u4'),
+    ('p_align', 28, 'u4', 48, 'u8'),
+)
+
+
+def layout_dtype(layout: Layout, is_64bit: bool, endian: str, itemsize: int) -> np.dtype:
+    """Structured dtype reading the fields of `layout` in place from a row of `itemsize` bytes"""
+    return np.dtype(
+        {
+            'names': [field[0] for field in layout],
+            'formats': [endian + (field[4] if is_64bit else field[2]) for field in layout],
+            'offsets': [field[3] if is_64bit else field[1] for field in layout],
+            'itemsize': itemsize,
+        },
+    )
+
+
+def native_dtype(layout: Layout) -> np.dtype:
+    """Decoded fields, in native byte order and wide enough for both classes"""
+    return np.dtype([(field[0], field[4]) for field in layout])
+
+
+EHDR_DTYPE = native_dtype(EHDR_LAYOUT)
+PHDR_DTYPE = native_dtype(PHDR_LAYOUT)
+LAYOUTS = tuple((is_64bit, endian) for is_64bit in (False, True) for endian in '<>')
+
+
+def decode_rows(
+    rows: np.ndarray,
+    layout: Layout,
+    is_64bit: np.ndarray,
+    big_endian: np.ndarray,
+) -> np.ndarray:
+    """Decode each row of the contiguous (N, width) uint8 array `rows` with the
+    layout selected by its class and endianness"""
+    count, width = rows.shape
+    dtype = native_dtype(layout)
+    out = np.zeros(count, dtype=dtype)
+    for layout_64bit, endian in LAYOUTS:
+        selected = (is_64bit == layout_64bit) & (big_endian == (endian == '>'))
+        if not selected.any():
+            continue
+        view = rows.view(layout_dtype(layout, layout_64bit, endian, width)).reshape(count)
+        # Structured casts convert field by field in one pass (and swap the bytes)
+        if selected.all():
+            # Homogeneous batch (the common case)
+            return view.astype(dtype)
+        out[selected] = view[selected].astype(dtype)
+    return out
+
+
+def stack(blobs: Iterable[bytes], width: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """(N, width) buffer of the blobs padded with zeros (like the virtual padding of
+    ElfParser) and their sizes. `width` defaults to the longest blob."""
+    blobs = list(blobs)
+    sizes = np.fromiter((len(blob) for blob in blobs), dtype=np.int64, count=len(blobs))
+    if width is None:
+        width = int(sizes.max()) if len(blobs) else 0
+    width = max(width, EHDR64_SIZE)
+    if len(blobs) and (sizes == width).all():
+        buffer = np.frombuffer(b''.join(blobs), dtype=np.uint8).reshape(len(blobs), width)
+    else:
+        buffer = np.frombuffer(
+            b''.join(blob[:width].ljust(width, b'\x00') for blob in blobs),
+            dtype=np.uint8,
+        ).reshape(len(blobs), width)
+    return buffer, sizes
+
+
+def read_prefixes(filenames: Iterable[str], width: int) -> list[bytes]:
+    """First `width` bytes of each file (b'' for the files that cannot be read)"""
+    prefixes = []
+    for filename in filenames:
+        try:
+            fd = os.open(filename, os.O_RDONLY)
+        except OSError:
+            prefixes.append(b'')
+            continue
+        try:
+            prefixes.append(os.pread(fd, width, 0))
+        except OSError:
+            prefixes.append(b'')
+        finally:
+            os.close(fd)
+    return prefixes
+
+
+class HeaderBatch:
+    """ELF and program headers of N files decoded at once"""
+
+    def __init__(self, buffer: np.ndarray, sizes: np.ndarray, max_phnum: int = 8) -> None:
+        self.buffer = np.ascontiguousarray(buffer, dtype=np.uint8)
+        # Bytes of each file that are in the buffer (the rest is padding)
+        self.sizes = np.minimum(sizes, self.buffer.shape[1])
+        self.is_64bit = self.buffer[:, 4] == 2
+        self.big_endian = self.buffer[:, 5] == 2
+        self.ehdr = decode_rows(self.buffer, EHDR_LAYOUT, self.is_64bit, self.big_endian)
+        self.phdrs, self.phdr_present = self.gather_phdrs(max_phnum)
+
+    @classmethod
+    def from_bytes(cls, blobs: Iterable[bytes], width: int | None = None, max_phnum: int = 8) -> 'HeaderBatch':
+        return cls(*stack(blobs, width), max_phnum=max_phnum)
+
+    @classmethod
+    def from_files(cls, filenames: Iterable[str], width: int = 1024, max_phnum: int = 8) -> 'HeaderBatch':
+        return cls(*stack(read_prefixes(filenames, width), width), max_phnum=max_phnum)
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def gather_phdrs(self, max_phnum: int) -> tuple[np.ndarray, np.ndarray]:
+        """(N, max_phnum) program headers and the mask of the ones that exist and
+        are entirely in the buffer"""
+        count, width = self.buffer.shape
+        # Clipped so that the offsets past the buffer cannot overflow int64
+        phoff = np.minimum(self.ehdr['e_phoff'], width).astype(np.int64)
+        phentsize = self.ehdr['e_phentsize'].astype(np.int64)
+        entry_size = np.where(self.is_64bit, PHDR64_SIZE, PHDR32_SIZE)
+        phdrs = np.zeros((count, max_phnum), dtype=PHDR_DTYPE)
+        present = np.zeros((count, max_phnum), dtype=bool)
+        # Every 56-byte window of each row (padded so a 32-bit header at the end of a
+        # row still has one), so that gathering a program header takes one record per
+        # file instead of one index per byte
+        padded = np.zeros((count, width + PHDR64_SIZE - PHDR32_SIZE), dtype=np.uint8)
+        padded[:, :width] = self.buffer
+        windows = np.ndarray(
+            (count, width - PHDR32_SIZE + 1),
+            dtype=np.dtype((np.void, PHDR64_SIZE)),
+            buffer=padded,
+            strides=(padded.shape[1], 1),
+        )
+        rows_index = np.arange(count)
+        for i in range(max_phnum):
+            start = phoff + i * phentsize
+            present[:, i] = (i < self.ehdr['e_phnum']) & (start + entry_size <= self.sizes)
+            if not present[:, i].any():
+                # No file has more headers: drop the empty columns
+                return phdrs[:, :i].copy(), present[:, :i].copy()
+            start = np.where(present[:, i], start, 0)
+            rows = windows[rows_index, start].view(np.uint8).reshape(count, PHDR64_SIZE)
+            phdrs[:, i] = decode_rows(rows, PHDR_LAYOUT, self.is_64bit, self.big_endian)
+        return phdrs, present
+
+    # --- Validity masks ---
+
+    def magic_ok(self) -> np.ndarray:
+        return (self.buffer[:, :4] == ELF_MAGIC).all(axis=1)
+
+    def phentsize_ok(self) -> np.ndarray:
+        return self.ehdr['e_phentsize'] == np.where(self.is_64bit, PHDR64_SIZE, PHDR32_SIZE)
+
+    def phdrs_ok(self) -> np.ndarray:
+        """Every program header announced by e_phnum has been read"""
+        max_phnum = self.phdrs.shape[1]
+        return self.phdr_present.sum(axis=1) == np.minimum(self.ehdr['e_phnum'], max_phnum)
+
+    def loads(self) -> np.ndarray:
+        """Mask of the PT_LOAD program headers"""
+        return self.phdr_present & (self.phdrs['p_type'] == PhType.PT_LOAD.value)
+
+    def memsz_ok(self) -> np.ndarray:
+        """p_memsz >= p_filesz for every PT_LOAD"""
+        return ~(self.loads() & (self.phdrs['p_memsz'] < self.phdrs['p_filesz'])).any(axis=1)
+
+    def entry_ok(self) -> np.ndarray:
+        """The entry point is mapped by a PT_LOAD (page aligned like `SegmentMap`)"""
+        page_mask = np.uint64(~(PAGE_SIZE - 1) & 0xFFFFFFFFFFFFFFFF)
+        vaddr = self.phdrs['p_vaddr']
+        start = vaddr & page_mask
+        end = (vaddr + self.phdrs['p_memsz'] + np.uint64(PAGE_SIZE - 1)) & page_mask
+        entry = self.ehdr['e_entry'][:, None]
+        return (self.loads() & (start <= entry) & (entry < end)).any(axis=1)
+
+    def masks(self) -> dict[str, np.ndarray]:
+        masks = {
+            'magic': self.magic_ok(),
+            'phentsize': self.phentsize_ok(),
+            'phdrs': self.phdrs_ok(),
+            'memsz': self.memsz_ok(),
+            'entry': self.entry_ok(),
+        }
+        masks['valid'] = np.logical_and.reduce(list(masks.values()))
+        return masks
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Decode and check the headers of many ELF files at once')
+    argparser.add_argument('files', nargs='+')
+    argparser.add_argument('--width', type=int, default=1024, help='bytes read at the start of each file')
+    argparser.add_argument('--max-phnum', type=int, default=8, help='program headers decoded per file')
+    args = argparser.parse_args()
+
+    batch = HeaderBatch.from_files(args.files, args.width, args.max_phnum)
+    masks = batch.masks()
+    with ReportWriter(sys.stdout) as out:
+        for i, filename in enumerate(args.files):
+            record = {
+                'file': filename,
+                'ehdr': {name: batch.ehdr[name][i].item() for name in EHDR_DTYPE.names or ()},
+                **{name: bool(mask[i]) for name, mask in masks.items()},
+            }
+            out.line(json.dumps(record, separators=(',', ':')))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,32 @@
 #!/usr/bin/env python3
+import argparse
+import bisect
+import hashlib
+import itertools
+import json
+import mmap
+import os
 import struct
 import sys
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
 from enum import Enum
+from types import TracebackType
+from typing import Any, NamedTuple
+
+from cfg import ControlFlowGraph
+from parse_cache import ReportCache, default_cache_dir, file_digest, merge_ranges
+from report import (
+    CSV_HEADER,
+    RENDERERS,
+    Report,
+    ReportWriter,
+    render_cfg,
+    render_disassembly,
+    render_ehdr,
+    render_phdrs,
+)
+from x86_decoder import MAX_INSTRUCTION_SIZE, Flow, Instruction, decode
 
 
 class ElfClass(Enum):
@@ -58,21 +83,444 @@ class PhType(Enum):
     PT_GNU_RELRO = 0x6474E552
 
 
+class ShType(Enum):
+    SHT_NULL = 0
+    SHT_PROGBITS = 1
+    SHT_SYMTAB = 2
+    SHT_STRTAB = 3
+    SHT_RELA = 4
+    SHT_HASH = 5
+    SHT_DYNAMIC = 6
+    SHT_NOTE = 7
+    SHT_NOBITS = 8
+    SHT_REL = 9
+    SHT_SHLIB = 10
+    SHT_DYNSYM = 11
+    SHT_INIT_ARRAY = 14
+    SHT_FINI_ARRAY = 15
+    SHT_GNU_HASH = 0x6FFFFFF6
+    SHT_GNU_VERDEF = 0x6FFFFFFD
+    SHT_GNU_VERNEED = 0x6FFFFFFE
+    SHT_GNU_VERSYM = 0x6FFFFFFF
+
+
+SHN_UNDEF = 0
+SHN_XINDEX = 0xFFFF
+
+
+class Elf32Ehdr(NamedTuple):
+    ei_class: int
+    ei_data: int
+    e_type: int
+    e_machine: int
+    e_version: int
+    e_entry: int
+    e_phoff: int
+    e_shoff: int
+    e_flags: int
+    e_ehsize: int
+    e_phentsize: int
+    e_phnum: int
+    e_shentsize: int
+    e_shnum: int
+    e_shstrndx: int
+
+    @property
+    def is_64bit(self) -> bool:
+        return False
+
+    @property
+    def is_little_endian(self) -> bool:
+        return self.ei_data != 2
+
+    def as_dict(self) -> dict[str, int]:
+        """Dict view with the keys of the former dict based header"""
+        return {**self._asdict(), 'is_64bit': self.is_64bit, 'is_little_endian': self.is_little_endian}
+
+
+class Elf64Ehdr(NamedTuple):
+    ei_class: int
+    ei_data: int
+    e_type: int
+    e_machine: int
+    e_version: int
+    e_entry: int
+    e_phoff: int
+    e_shoff: int
+    e_flags: int
+    e_ehsize: int
+    e_phentsize: int
+    e_phnum: int
+    e_shentsize: int
+    e_shnum: int
+    e_shstrndx: int
+
+    @property
+    def is_64bit(self) -> bool:
+        return True
+
+    @property
+    def is_little_endian(self) -> bool:
+        return self.ei_data != 2
+
+    def as_dict(self) -> dict[str, int]:
+        """Dict view with the keys of the former dict based header"""
+        return {**self._asdict(), 'is_64bit': self.is_64bit, 'is_little_endian': self.is_little_endian}
+
+
+ElfEhdr = Elf32Ehdr | Elf64Ehdr
+
+
+class Phdr(NamedTuple):
+    # Fields in the order of the 32-bit layout (p_flags comes second in 64-bit)
+    p_type: int
+    p_offset: int
+    p_vaddr: int
+    p_paddr: int
+    p_filesz: int
+    p_memsz: int
+    p_flags: int
+    p_align: int
+
+    def as_dict(self) -> dict[str, int]:
+        return self._asdict()
+
+
+class Shdr(NamedTuple):
+    name: str  # Resolved from .shstrtab
+    sh_name: int
+    sh_type: int
+    sh_flags: int
+    sh_addr: int
+    sh_offset: int
+    sh_size: int
+    sh_link: int
+    sh_info: int
+    sh_addralign: int
+    sh_entsize: int
+
+    def as_dict(self) -> dict[str, int | str]:
+        return self._asdict()
+
+
+class Symbol(NamedTuple):
+    # Fields in the order of the 32-bit layout (64-bit puts st_value and st_size last)
+    name: str  # Resolved from the string table linked to the symbol table
+    st_name: int
+    st_value: int
+    st_size: int
+    st_info: int
+    st_other: int
+    st_shndx: int
+
+    @property
+    def end(self) -> int:
+        return self.st_value + self.st_size
+
+
+# Precompiled headers layouts, indexed by (is_64bit, endianness). The ELF header
+# structs start at offset 0 and skip e_ident except for EI_CLASS and EI_DATA
+EHDR_STRUCTS = {
+    (is_64bit, endian): struct.Struct(endian + ('4xBB10xHHIQQQIHHHHHH' if is_64bit else '4xBB10xHHIIIIIHHHHHH'))
+    for is_64bit in (False, True)
+    for endian in '<>'
+}
+PHDR_STRUCTS = {
+    (is_64bit, endian): struct.Struct(endian + ('IIQQQQQQ' if is_64bit else 'IIIIIIII'))
+    for is_64bit in (False, True)
+    for endian in '<>'
+}
+SHDR_STRUCTS = {
+    (is_64bit, endian): struct.Struct(endian + ('IIQQQQIIQQ' if is_64bit else 'IIIIIIIIII'))
+    for is_64bit in (False, True)
+    for endian in '<>'
+}
+SYM_STRUCTS = {
+    (is_64bit, endian): struct.Struct(endian + ('IBBHQQ' if is_64bit else 'IIIBBH'))
+    for is_64bit in (False, True)
+    for endian in '<>'
+}
+
+
+def make_phdr(unpacked: tuple[int, ...], is_64bit: bool) -> Phdr:
+    """Build a program header from the fields unpacked with PHDR_STRUCTS"""
+    if is_64bit:
+        p_type, p_flags, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_align = unpacked
+        return Phdr(p_type, p_offset, p_vaddr, p_paddr, p_filesz, p_memsz, p_flags, p_align)
+    return Phdr._make(unpacked)
+
+
+def make_symbol(name: str, unpacked: tuple[int, ...], is_64bit: bool) -> Symbol:
+    """Build a symbol from the fields unpacked with SYM_STRUCTS"""
+    if is_64bit:
+        st_name, st_info, st_other, st_shndx, st_value, st_size = unpacked
+        return Symbol(name, st_name, st_value, st_size, st_info, st_other, st_shndx)
+    return Symbol(name, *unpacked)
+
+
+def c_string(table: bytes, offset: int) -> str:
+    """NUL terminated string at `offset` of a string table ('' when out of the table)"""
+    if not 0 <= offset < len(table):
+        return ''
+    end = table.find(b'\x00', offset)
+    return table[offset : end if end >= 0 else len(table)].decode('utf-8', 'replace')
+
+
+def unpack_ehdr(buffer: bytes | memoryview, offset: int = 0) -> ElfEhdr:
+    """Decode an ELF header from a buffer holding at least 64 bytes (for reparsing
+    candidate headers in tight loops without going through an ElfParser)"""
+    is_64bit = buffer[offset + 4] == 2
+    endian = '>' if buffer[offset + 5] == 2 else '<'
+    unpacked = EHDR_STRUCTS[is_64bit, endian].unpack_from(buffer, offset)
+    return Elf64Ehdr._make(unpacked) if is_64bit else Elf32Ehdr._make(unpacked)
+
+
+PAGE_SIZE = 4096
+
+
+class Mapping(NamedTuple):
+    start: int  # First virtual address of the mapping
+    end: int  # End of the mapping (page aligned, includes the bss)
+    file_start: int  # File offset mapped at `start`
+    file_end: int  # Virtual address where the file backed part stops (zeros after it)
+    phdr: Phdr
+    index: int  # Index of the program header in the table
+
+    def offset_of(self, vaddr: int) -> int | None:
+        """File offset backing `vaddr` (None in the bss part)"""
+        if vaddr < self.file_end:
+            return self.file_start + (vaddr - self.start)
+        return None
+
+
+class SegmentMap:
+    """Virtual address space of an executable, built from its PT_LOAD program headers
+    the way binfmt_elf maps them: each segment is mapped from its page aligned vaddr
+    (so the bytes before p_vaddr on the same page are mapped too) and the mappings
+    of later segments replace the pages of the earlier ones (MAP_FIXED), which makes
+    the resolution of overlapping segments deterministic. Lookups are bisections."""
+
+    def __init__(self, phdrs: Iterable[Phdr], page_size: int = PAGE_SIZE) -> None:
+        self.page_size = page_size
+        mappings: list[Mapping] = []
+        for index, phdr in enumerate(phdrs):
+            if phdr.p_type != PhType.PT_LOAD.value or phdr.p_memsz == 0:
+                continue
+            page_offset = phdr.p_vaddr % page_size
+            start = phdr.p_vaddr - page_offset
+            end = self.page_align(phdr.p_vaddr + phdr.p_memsz)
+            file_end = phdr.p_vaddr + phdr.p_filesz
+            if phdr.p_memsz <= phdr.p_filesz:
+                # No bss to clear: the end of the last page still holds the file
+                file_end = self.page_align(file_end)
+            mapping = Mapping(start, end, phdr.p_offset - page_offset, min(file_end, end), phdr, index)
+            mappings = [*self.carve(mappings, start, end), mapping]
+        mappings.sort()
+        self.mappings = mappings
+        self.starts = [mapping.start for mapping in mappings]
+
+        # File offset -> vaddr index: elementary file ranges, each one resolved to the
+        # lowest virtual address it is mapped at
+        bounds = sorted(
+            {m.file_start for m in mappings if m.file_end > m.start}
+            | {m.file_start + (m.file_end - m.start) for m in mappings if m.file_end > m.start},
+        )
+        self.offset_starts: list[int] = []
+        self.offset_vaddrs: list[int | None] = []
+        for lo, hi in itertools.pairwise(bounds):
+            vaddrs = [
+                m.start + (lo - m.file_start)
+                for m in mappings
+                if m.file_start <= lo and hi <= m.file_start + (m.file_end - m.start)
+            ]
+            self.offset_starts.append(lo)
+            self.offset_vaddrs.append(min(vaddrs) if vaddrs else None)
+        if bounds:
+            self.offset_starts.append(bounds[-1])
+            self.offset_vaddrs.append(None)
+
+    def page_align(self, address: int) -> int:
+        return -(-address // self.page_size) * self.page_size
+
+    @staticmethod
+    def carve(mappings: list[Mapping], start: int, end: int) -> list[Mapping]:
+        """Remove [start, end) from the mappings, splitting the ones that straddle it"""
+        kept = []
+        for m in mappings:
+            if m.end <= start or end <= m.start:
+                kept.append(m)
+                continue
+            if m.start < start:
+                kept.append(m._replace(end=start, file_end=min(m.file_end, start)))
+            if end < m.end:
+                kept.append(
+                    m._replace(start=end, file_start=m.file_start + (end - m.start)),
+                )
+        return kept
+
+    def lookup(self, vaddr: int) -> Mapping | None:
+        """Mapping containing `vaddr`"""
+        i = bisect.bisect_right(self.starts, vaddr) - 1
+        if i >= 0 and vaddr < self.mappings[i].end:
+            return self.mappings[i]
+        return None
+
+    def vaddr_to_offset(self, vaddr: int) -> int | None:
+        """File offset of the byte loaded at `vaddr` (None if unmapped or in a bss)"""
+        mapping = self.lookup(vaddr)
+        return mapping.offset_of(vaddr) if mapping is not None else None
+
+    def offset_to_vaddr(self, offset: int) -> int | None:
+        """Lowest virtual address at which the byte at file `offset` is loaded"""
+        i = bisect.bisect_right(self.offset_starts, offset) - 1
+        if i < 0 or (base := self.offset_vaddrs[i]) is None:
+            return None
+        return base + (offset - self.offset_starts[i])
+
+
+class LoadMode(Enum):
+    READ = 'read'  # Read the whole file in memory
+    MMAP = 'mmap'  # Map the file in memory, pages are only touched when read
+    PREAD = 'pread'  # Header-only: positioned reads of the ranges that are needed
+
+
+EHDR32_SIZE = 52
+EHDR64_SIZE = 64
+
+
 class ElfParser:
-    def __init__(self, filename: str) -> None:
+    def __init__(self, filename: str, *, mode: LoadMode = LoadMode.READ, verbose: bool = True) -> None:
         self.filename = filename
-        self.data = b''
-        self.ehdr: dict[str, int] = {}
-        self.phdrs: list[dict[str, int]] = []
+        self.mode = mode
+        self.verbose = verbose  # Print the notes about malformed files while parsing
+        self.notes: list[str] = []
+        self.parsed = False
+        self.data: bytes | memoryview = b''
+        # Logical size of the file: truncated headers are padded with zeros
+        # virtually (see `read`) so this can be bigger than the file
+        self.size = 0
+        self.ehdr: ElfEhdr = Elf32Ehdr._make((0,) * len(Elf32Ehdr._fields))
+        self.phdrs: list[Phdr] = []
+        self.segments = SegmentMap([])
+        self.cfg: ControlFlowGraph | None = None
         self.endianness = '<'  # Default to little-endian
+        self._mmap: mmap.mmap | None = None
+        # Header-only mode: file descriptor and last range fetched with pread
+        self._fd: int | None = None
+        self._window = b''
+        self._window_offset = 0
+        # Sections and symbols are only decoded when first used (see `sections` and `symbols`)
+        self._sections: list[Shdr] | None = None
+        self._section_index: dict[str, Shdr] = {}
+        self._symbols: list[Symbol] | None = None
+        self._symbol_index: dict[str, Symbol] = {}
+        self._symbols_by_address: list[Symbol] = []
+        self._symbol_starts: list[int] = []
+        # Byte ranges read from the file, recorded when not None (see `cached_report`)
+        self.reads: list[tuple[int, int]] | None = None
+
+    def __enter__(self) -> 'ElfParser':
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def load(self) -> None:
+        """Load the file, either by reading it, by mapping it in memory (zero-copy) or
+        by only opening it so that the headers can be fetched with positioned reads"""
+        self.close()
+        if self.mode == LoadMode.PREAD:
+            self._fd = os.open(self.filename, os.O_RDONLY)
+            self.size = os.fstat(self._fd).st_size
+            return
+        with open(self.filename, 'rb') as f:
+            if self.mode == LoadMode.MMAP:
+                try:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                except ValueError:
+                    # Empty files cannot be mapped
+                    self.data = b''
+                else:
+                    self.data = memoryview(self._mmap)
+            else:
+                self.data = f.read()
+        self.size = len(self.data)
+
+    def close(self) -> None:
+        """Release the memory mapping or the file descriptor (if any)"""
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+            self._window = b''
+        if isinstance(self.data, memoryview):
+            self.data.release()
+        self.data = b''
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # Views returned by `read` are still alive, the mapping
+                # will be unmapped when the last one is garbage collected
+                pass
+            self._mmap = None
+
+    def read(self, offset: int, length: int) -> bytes | memoryview:
+        """Return `length` bytes at `offset`, the bytes past the end of the file read as zeros"""
+        if self.reads is not None:
+            self.reads.append((offset, length))
+        if self._fd is not None:
+            start = offset - self._window_offset
+            if 0 <= start and start + length <= len(self._window):
+                return self._window[start : start + length]
+            available = os.pread(self._fd, length, offset) if length > 0 else b''
+            return available + b'\x00' * (length - len(available))
+        end = offset + length
+        if end <= len(self.data):
+            return self.data[offset:end]
+        available = self.data[offset:] if offset < len(self.data) else b''
+        return bytes(available) + b'\x00' * (length - len(available))
+
+    def byte_at(self, offset: int) -> int:
+        """Return the byte at `offset` (0 past the end of the file)"""
+        if self._fd is not None or self.reads is not None:
+            return self.read(offset, 1)[0]
+        return self.data[offset] if offset < len(self.data) else 0
+
+    def unpack(self, fmt: str | struct.Struct, offset: int) -> tuple[int, ...]:
+        """Unpack in place, only copying when the struct overlaps the end of the file"""
+        st = fmt if isinstance(fmt, struct.Struct) else struct.Struct(fmt)
+        if offset + st.size <= len(self.data) and self.reads is None:
+            return st.unpack_from(self.data, offset)
+        return st.unpack(self.read(offset, st.size))
+
+    def prefetch(self, offset: int, length: int) -> None:
+        """In header-only mode fetch a whole range with a single pread, later reads
+        falling inside it are served from memory (no-op in the other modes)"""
+        if self._fd is not None:
+            self._window = os.pread(self._fd, length, offset) if length > 0 else b''
+            self._window_offset = offset
+
+    def note(self, message: str) -> None:
+        """Record a note about the file being parsed (also printed when verbose)"""
+        self.notes.append(message)
+        if self.verbose:
+            print(message)
 
     def parse(self) -> bool:
-        with open(self.filename, 'rb') as f:
-            self.data = f.read()
+        self.load()
+        self.notes = []
+        self.phdrs = []
+        self.parsed = False
+        self.prefetch(0, EHDR64_SIZE)
 
         # Check magic number
-        if len(self.data) < 4 or self.data[0:4] != b'\x7fELF':
-            print('Error: Not a valid ELF file (magic number mismatch)')
+        if self.size < 4 or self.read(0, 4) != b'\x7fELF':
+            self.note('Error: Not a valid ELF file (magic number mismatch)')
             return False
 
         # Parse ELF header
@@ -80,104 +528,62 @@ class ElfParser:
 
         # Parse program headers
         self.parse_phdrs()
+        self.segments = SegmentMap(self.phdrs)
+        self.cfg = None
+        self._sections = None
+        self._symbols = None
+        self.parsed = True
 
         return True
 
     def parse_ehdr(self) -> None:
         """Parse the ELF header"""
-        # Pad with zeros if file is too small
-        min_size = 52  # Minimum size for 32-bit ELF header
-        if len(self.data) < min_size:
-            self.data = self.data + b'\x00' * (min_size - len(self.data))
-
-        # EI_CLASS (1 byte at offset 4)
-        ei_class = self.data[4]
-        self.ehdr['ei_class'] = ei_class
-        is_64bit = ei_class == 2
-
-        # EI_DATA (1 byte at offset 5) - endianness
-        ei_data = self.data[5]
-        self.ehdr['ei_data'] = ei_data
-        # Treat 0 or 1 as little-endian (default), 2 as big-endian
-        is_little_endian = ei_data != 2
+        # Pad with zeros if file is too small (virtually, nothing is copied)
+        self.size = max(self.size, EHDR32_SIZE)  # Minimum size for 32-bit ELF header
 
-        # Set endianness for struct
-        endian = '<' if is_little_endian else '>'
+        # EI_CLASS (1 byte at offset 4) and EI_DATA (1 byte at offset 5) select the layout
+        is_64bit = self.byte_at(4) == 2
+        # Treat 0 or 1 as little-endian (default), 2 as big-endian
+        endian = '>' if self.byte_at(5) == 2 else '<'
 
         if is_64bit:
-            # 64-bit ELF header
             # Pad more if needed for 64-bit
-            min_size_64 = 64
-            if len(self.data) < min_size_64:
-                self.data = self.data + b'\x00' * (min_size_64 - len(self.data))
-
-            fmt = endian + 'HHIQQQIHHHHHH'
-            offset = 16
-            unpacked = struct.unpack_from(fmt, self.data, offset)
-
-            self.ehdr['e_type'] = unpacked[0]
-            self.ehdr['e_machine'] = unpacked[1]
-            self.ehdr['e_version'] = unpacked[2]
-            self.ehdr['e_entry'] = unpacked[3]
-            self.ehdr['e_phoff'] = unpacked[4]
-            self.ehdr['e_shoff'] = unpacked[5]
-            self.ehdr['e_flags'] = unpacked[6]
-            self.ehdr['e_ehsize'] = unpacked[7]
-            self.ehdr['e_phentsize'] = unpacked[8]
-            self.ehdr['e_phnum'] = unpacked[9]
-            self.ehdr['e_shentsize'] = unpacked[10]
-            self.ehdr['e_shnum'] = unpacked[11]
-            self.ehdr['e_shstrndx'] = unpacked[12]
+            self.size = max(self.size, EHDR64_SIZE)
+            self.ehdr = Elf64Ehdr._make(self.unpack(EHDR_STRUCTS[True, endian], 0))
         else:
-            # 32-bit ELF header
-            fmt = endian + 'HHIIIIIHHHHHH'
-            offset = 16
-            unpacked = struct.unpack_from(fmt, self.data, offset)
-
-            self.ehdr['e_type'] = unpacked[0]
-            self.ehdr['e_machine'] = unpacked[1]
-            self.ehdr['e_version'] = unpacked[2]
-            self.ehdr['e_entry'] = unpacked[3]
-            self.ehdr['e_phoff'] = unpacked[4]
-            self.ehdr['e_shoff'] = unpacked[5]
-            self.ehdr['e_flags'] = unpacked[6]
-            self.ehdr['e_ehsize'] = unpacked[7]
-            self.ehdr['e_phentsize'] = unpacked[8]
-            self.ehdr['e_phnum'] = unpacked[9]
-            self.ehdr['e_shentsize'] = unpacked[10]
-            self.ehdr['e_shnum'] = unpacked[11]
-            self.ehdr['e_shstrndx'] = unpacked[12]
-
-        # Store ELF info for use in parsing program headers
-        self.ehdr['is_64bit'] = is_64bit
-        self.ehdr['is_little_endian'] = is_little_endian
+            self.ehdr = Elf32Ehdr._make(self.unpack(EHDR_STRUCTS[False, endian], 0))
+
+        # Store endianness for use in parsing program headers
         self.endianness = endian
 
     def parse_phdrs(self) -> None:
         """Parse program headers"""
-        phoff = self.ehdr['e_phoff']
-        phentsize = self.ehdr['e_phentsize']
-        phnum = self.ehdr['e_phnum']
-        is_64bit = self.ehdr['is_64bit']
-        endian = self.endianness
+        phoff = self.ehdr.e_phoff
+        phentsize = self.ehdr.e_phentsize
+        phnum = self.ehdr.e_phnum
+        is_64bit = self.ehdr.is_64bit
+        phdr_struct = PHDR_STRUCTS[is_64bit, self.endianness]
 
-        file_size = len(self.data)
+        file_size = self.size
 
         # Check if we can read any data at the specified offset
         if phoff >= file_size:
-            print(f'\nNote: Program header offset (0x{phoff:x}) is at or beyond file size ({file_size} bytes)')
-            print('No program header data available to parse\n')
+            self.note(f'\nNote: Program header offset (0x{phoff:x}) is at or beyond file size ({file_size} bytes)')
+            self.note('No program header data available to parse\n')
             return
 
         # Calculate how many bytes are available from phoff
         available_bytes = file_size - phoff
 
         if available_bytes < phnum * phentsize:
-            print('\nNote: Limited data available at program header offset')
-            print(f'  Offset: 0x{phoff:x}')
-            print(f'  Available: {available_bytes} bytes')
-            print(f'  Required for {phnum} headers: {phnum * phentsize} bytes')
-            print(f'Will read whatever data exists at offset 0x{phoff:x}\n')
+            self.note('\nNote: Limited data available at program header offset')
+            self.note(f'  Offset: 0x{phoff:x}')
+            self.note(f'  Available: {available_bytes} bytes')
+            self.note(f'  Required for {phnum} headers: {phnum * phentsize} bytes')
+            self.note(f'Will read whatever data exists at offset 0x{phoff:x}\n')
+
+        # Fetch the whole table at once (a single syscall in header-only mode)
+        self.prefetch(phoff, min(phnum * phentsize, available_bytes))
 
         # Parse as many program headers as we can with available data
         for i in range(phnum):
@@ -191,545 +597,547 @@ class ElfParser:
             bytes_needed = phentsize if is_64bit else 32  # Actual struct size
 
             if bytes_available < bytes_needed:
-                print(f'Program header {i} incomplete: only {bytes_available} of {bytes_needed} bytes available\n')
+                self.note(f'Program header {i} incomplete: only {bytes_available} of {bytes_needed} bytes available\n')
                 break
 
-            phdr = {}
-
-            if is_64bit:
-                # 64-bit program header (56 bytes)
-                if bytes_available < 56:
-                    break
-
-                fmt = endian + 'IIQQQQQQ'
-                unpacked = struct.unpack_from(fmt, self.data, offset)
-
-                phdr['p_type'] = unpacked[0]
-                phdr['p_flags'] = unpacked[1]
-                phdr['p_offset'] = unpacked[2]
-                phdr['p_vaddr'] = unpacked[3]
-                phdr['p_paddr'] = unpacked[4]
-                phdr['p_filesz'] = unpacked[5]
-                phdr['p_memsz'] = unpacked[6]
-                phdr['p_align'] = unpacked[7]
-            else:
-                # 32-bit program header (32 bytes)
-                if bytes_available < 32:
-                    break
-
-                fmt = endian + 'IIIIIIII'
-                unpacked = struct.unpack_from(fmt, self.data, offset)
-
-                phdr['p_type'] = unpacked[0]
-                phdr['p_offset'] = unpacked[1]
-                phdr['p_vaddr'] = unpacked[2]
-                phdr['p_paddr'] = unpacked[3]
-                phdr['p_filesz'] = unpacked[4]
-                phdr['p_memsz'] = unpacked[5]
-                phdr['p_flags'] = unpacked[6]
-                phdr['p_align'] = unpacked[7]
-
-            self.phdrs.append(phdr)
-
-    def print_ehdr(self) -> None:
-        """Print ELF header information"""
-        print('\n=== ELF HEADER ===\n')
-        print(f'Magic Number:        {self.data[0:4].decode("ascii")}')
-
-        ei_class = self.ehdr['ei_class']
-        class_name = '64-bit' if ei_class == 2 else '32-bit' if ei_class == 1 else 'Unknown'
-        print(f'EI_CLASS:            {ei_class} ({class_name})')
-
-        ei_data = self.ehdr['ei_data']
-        endian_name = 'Little-endian' if ei_data == 1 else 'Big-endian' if ei_data == 2 else 'Unknown'
-        print(f'EI_DATA:             {ei_data} ({endian_name})')
-
-        ei_version = self.data[6]
-        print(f'EI_VERSION:          {ei_version}')
-
-        ei_osabi = self.data[7]
-        osabi_name = ElfOSABI(ei_osabi).name if ei_osabi in [e.value for e in ElfOSABI] else 'Unknown'
-        print(f'EI_OSABI:            {ei_osabi} ({osabi_name})')
-
-        ei_abiversion = self.data[8]
-        print(f'EI_ABIVERSION:       {ei_abiversion}')
-
-        e_type = self.ehdr['e_type']
-        type_name = ElfType(e_type).name if e_type in [e.value for e in ElfType] else 'Unknown'
-        print(f'e_type:              0x{e_type:04x} ({type_name})')
-
-        e_machine = self.ehdr['e_machine']
-        machine_name = ElfMachine(e_machine).name if e_machine in [e.value for e in ElfMachine] else 'Unknown'
-        print(f'e_machine:           0x{e_machine:04x} ({machine_name})')
-
-        print(f"e_version:           {self.ehdr['e_version']}")
-        print(f"e_entry:             0x{self.ehdr['e_entry']:x}")
-
-        # Explain entry point calculation
-        print('\n  Entry point calculation:')
-        print(f"    Virtual address where execution starts: 0x{self.ehdr['e_entry']:x}")
-        for phdr in self.phdrs:
-            vaddr = phdr['p_vaddr']
-            memsz = phdr['p_memsz']
-            offset = phdr['p_offset']
-
-            # Page-align addresses (OS loads in 4096-byte pages)
-            page_aligned_vaddr = (vaddr // 4096) * 4096
-            page_offset = vaddr - page_aligned_vaddr
-
-            if page_aligned_vaddr <= self.ehdr['e_entry'] < vaddr + memsz:
-                # Calculate file offset accounting for page alignment
-                file_offset = offset - page_offset + (self.ehdr['e_entry'] - page_aligned_vaddr)
-                print(f'    This is in program header at vaddr 0x{vaddr:x}')
-                print(f'    Note: Memory is page-aligned, so segment starts at 0x{page_aligned_vaddr:x}')
-                print('    File offset = p_offset - page_offset + (e_entry - page_aligned_vaddr)')
-                print(
-                    f"                = 0x{offset:x} - 0x{page_offset:x} + (0x{self.ehdr['e_entry']:x} - 0x{page_aligned_vaddr:x})",  # noqa: E501
-                )
-                print(f'                = 0x{file_offset:x} (byte {file_offset} in file)')
-                if 0 <= file_offset < len(self.data):
-                    code_bytes = self.data[file_offset : min(file_offset + 6, len(self.data))]
-                    hex_code = ''.join(f'{b:02X}' for b in code_bytes)
-                    print(f'    Code at entry: {hex_code}')
-                elif file_offset < 0:
-                    print('    Warning: Entry point is before file start (calculated offset is negative)')
+            # 64-bit program header is 56 bytes, 32-bit one is 32 bytes
+            if bytes_available < phdr_struct.size:
                 break
-        print()
-
-        print(f"e_phoff:             {self.ehdr['e_phoff']} (0x{self.ehdr['e_phoff']:x})")
-        print(f"e_shoff:             {self.ehdr['e_shoff']} (0x{self.ehdr['e_shoff']:x})")
-        print(f"e_flags:             0x{self.ehdr['e_flags']:08x}")
-        print(f"e_ehsize:            {self.ehdr['e_ehsize']} bytes")
-        print(f"e_phentsize:         {self.ehdr['e_phentsize']} bytes")
-        print(f"e_phnum:             {self.ehdr['e_phnum']}")
-        print(f"e_shentsize:         {self.ehdr['e_shentsize']} bytes")
-        print(f"e_shnum:             {self.ehdr['e_shnum']}")
-        print(f"e_shstrndx:          {self.ehdr['e_shstrndx']}")
 
-    def print_phdrs(self) -> None:
-        """Print program header information"""
-        print('\n=== PROGRAM HEADERS ===\n')
-        if not self.phdrs:
-            print('No program headers parsed (file may be malformed)\n')
-            return
-
-        for i, phdr in enumerate(self.phdrs):
-            print(f'Program Header {i}:')
-
-            p_type = phdr['p_type']
+            self.phdrs.append(make_phdr(self.unpack(phdr_struct, offset), is_64bit))
+
+    def sections(self) -> list[Shdr]:
+        """Section headers, decoded on first access"""
+        if self._sections is None:
+            self._sections = self.parse_shdrs()
+            self._section_index = {}
+            for shdr in self._sections:
+                self._section_index.setdefault(shdr.name, shdr)
+        return self._sections
+
+    def section(self, name: str) -> Shdr | None:
+        """First section called `name`"""
+        self.sections()
+        return self._section_index.get(name)
+
+    def parse_shdrs(self) -> list[Shdr]:
+        """Parse the section headers and name them from the section header string table"""
+        shoff = self.ehdr.e_shoff
+        shentsize = self.ehdr.e_shentsize
+        shnum = self.ehdr.e_shnum
+        is_64bit = self.ehdr.is_64bit
+        shdr_struct = SHDR_STRUCTS[is_64bit, self.endianness]
+        if shoff == 0:
+            return []
+        if shentsize < shdr_struct.size:
+            self.note(f'Note: e_shentsize ({shentsize}) is smaller than a section header ({shdr_struct.size} bytes)')
+            return []
+        if shnum == 0 and shoff + shdr_struct.size <= self.size:
+            # More sections than SHN_LORESERVE: the count is in sh_size of section 0
+            shnum = self.unpack(shdr_struct, shoff)[5]
+        if shoff + shnum * shentsize > self.size:
+            self.note(f'Note: Section header table (0x{shoff:x}, {shnum} entries) goes past the end of the file')
+            return []
+
+        # Fetch the whole table at once (a single syscall in header-only mode)
+        self.prefetch(shoff, shnum * shentsize)
+        unpacked = [self.unpack(shdr_struct, shoff + i * shentsize) for i in range(shnum)]
+        if not unpacked:
+            return []
+
+        shstrndx = self.ehdr.e_shstrndx
+        if shstrndx == SHN_XINDEX:
+            # The index does not fit in e_shstrndx: it is in sh_link of section 0
+            shstrndx = unpacked[0][6]
+        names = b''
+        if 0 < shstrndx < len(unpacked):
+            names = self.read_table(unpacked[shstrndx][4], unpacked[shstrndx][5], '.shstrtab')
+        return [Shdr(c_string(names, fields[0]), *fields) for fields in unpacked]
+
+    def read_table(self, offset: int, size: int, what: str) -> bytes:
+        """Content of a table referenced by a section header (b'' if not in the file)"""
+        if offset + size > self.size:
+            self.note(f'Note: {what} (0x{offset:x}, {size} bytes) goes past the end of the file')
+            return b''
+        return bytes(self.read(offset, size))
+
+    def symbols(self) -> list[Symbol]:
+        """Symbols of every SHT_SYMTAB/SHT_DYNSYM section, decoded on first access
+        (only the section headers are decoded until then)"""
+        if self._symbols is None:
+            self._symbols = []
+            for shdr in self.sections():
+                if shdr.sh_type in (ShType.SHT_SYMTAB.value, ShType.SHT_DYNSYM.value):
+                    self._symbols.extend(self.parse_symbols(shdr))
+
+            self._symbol_index = {}
+            for symbol in self._symbols:
+                if symbol.name:
+                    self._symbol_index.setdefault(symbol.name, symbol)
+            # Defined symbols sorted by address, the section and file symbols (STT_SECTION,
+            # STT_FILE) do not name code or data
+            self._symbols_by_address = sorted(
+                (
+                    symbol
+                    for symbol in self._symbols
+                    if symbol.name and symbol.st_shndx != SHN_UNDEF and symbol.st_info & 0xF not in (3, 4)
+                ),
+                key=lambda symbol: (symbol.st_value, symbol.st_size),
+            )
+            self._symbol_starts = [symbol.st_value for symbol in self._symbols_by_address]
+        return self._symbols
+
+    def symbol(self, name: str) -> Symbol | None:
+        """First symbol called `name`"""
+        self.symbols()
+        return self._symbol_index.get(name)
+
+    def symbol_at(self, address: int) -> Symbol | None:
+        """Symbol covering `address` (the closest one starting before it)"""
+        self.symbols()
+        i = bisect.bisect_right(self._symbol_starts, address) - 1
+        if i < 0:
+            return None
+        symbol = self._symbols_by_address[i]
+        if address < symbol.end or address == symbol.st_value:
+            return symbol
+        return None
+
+    def parse_symbols(self, shdr: Shdr) -> list[Symbol]:
+        """Decode a symbol table and name its symbols from the linked string table"""
+        is_64bit = self.ehdr.is_64bit
+        sym_struct = SYM_STRUCTS[is_64bit, self.endianness]
+        entsize = shdr.sh_entsize or sym_struct.size
+        if entsize < sym_struct.size:
+            self.note(f'Note: {shdr.name} entries ({entsize} bytes) are smaller than a symbol')
+            return []
+        table = self.read_table(shdr.sh_offset, shdr.sh_size, shdr.name)
+        sections = self.sections()
+        strtab = sections[shdr.sh_link] if shdr.sh_link < len(sections) else None
+        names = self.read_table(strtab.sh_offset, strtab.sh_size, strtab.name) if strtab else b''
+        count = len(table) // entsize
+        if entsize == sym_struct.size:
+            entries = sym_struct.iter_unpack(table[: count * entsize])
+        else:
+            entries = (sym_struct.unpack_from(table, i * entsize) for i in range(count))
+        return [make_symbol(c_string(names, fields[0]), fields, is_64bit) for fields in entries]
+
+    def entry_file_offset(self) -> int | None:
+        """File offset of the entry point (None if it is not loaded from the file)"""
+        file_offset = self.segments.vaddr_to_offset(self.ehdr.e_entry)
+        if file_offset is not None and 0 <= file_offset < self.size:
+            return file_offset
+        return None
+
+    def ehdr_report(self) -> dict[str, Any]:
+        """ELF header fields with their names and the explanation of the entry point"""
+        ei_class = self.ehdr.ei_class
+        ei_data = self.ehdr.ei_data
+        ei_osabi = self.byte_at(7)
+        e_type = self.ehdr.e_type
+        e_machine = self.ehdr.e_machine
+        return {
+            'magic': bytes(self.read(0, 4)).decode('ascii'),
+            **self.ehdr.as_dict(),
+            'class_name': '64-bit' if ei_class == 2 else '32-bit' if ei_class == 1 else 'Unknown',
+            'endian_name': 'Little-endian' if ei_data == 1 else 'Big-endian' if ei_data == 2 else 'Unknown',
+            'ei_version': self.byte_at(6),
+            'ei_osabi': ei_osabi,
+            'osabi_name': ElfOSABI(ei_osabi).name if ei_osabi in [e.value for e in ElfOSABI] else 'Unknown',
+            'ei_abiversion': self.byte_at(8),
+            'type_name': ElfType(e_type).name if e_type in [e.value for e in ElfType] else 'Unknown',
+            'machine_name': ElfMachine(e_machine).name if e_machine in [e.value for e in ElfMachine] else 'Unknown',
+            'entry': self.entry_report(),
+        }
+
+    def entry_report(self) -> dict[str, Any] | None:
+        """How the entry point maps to the file (None if no segment holds it)"""
+        mapping = self.segments.lookup(self.ehdr.e_entry)
+        if mapping is None:
+            return None
+        vaddr = mapping.phdr.p_vaddr
+        # Page-align addresses (OS loads in 4096-byte pages)
+        page_offset = vaddr % PAGE_SIZE
+        # File offset accounting for page alignment (None in the bss)
+        file_offset = mapping.offset_of(self.ehdr.e_entry)
+        code = None
+        if file_offset is not None and 0 <= file_offset < self.size:
+            code = bytes(self.read(file_offset, min(6, self.size - file_offset))).hex()
+        return {
+            'phdr_index': mapping.index,
+            'p_vaddr': vaddr,
+            'p_offset': mapping.phdr.p_offset,
+            'page_offset': page_offset,
+            'page_aligned_vaddr': vaddr - page_offset,
+            'file_offset': file_offset,
+            'code': code,
+        }
+
+    def phdrs_report(self) -> list[dict[str, Any]]:
+        """Program headers with their names and a preview of the data they load"""
+        phdrs = []
+        for phdr in self.phdrs:
+            p_type = phdr.p_type
             type_name = PhType(p_type).name if p_type in [e.value for e in PhType] else f'Unknown(0x{p_type:x})'
-            print(f'  p_type:      0x{p_type:08x} ({type_name})')
-
-            print(f"  p_offset:    {phdr['p_offset']} (0x{phdr['p_offset']:x})")
-            print(f"  p_vaddr:     0x{phdr['p_vaddr']:x}")
-            print(f"  p_paddr:     0x{phdr['p_paddr']:x}")
-            print(f"  p_filesz:    {phdr['p_filesz']} bytes (0x{phdr['p_filesz']:x})")
-            print(f"  p_memsz:     {phdr['p_memsz']} bytes (0x{phdr['p_memsz']:x})")
-
-            p_flags = phdr['p_flags']
+            p_flags = phdr.p_flags
             flags_str = ''
             flags_str += 'R' if p_flags & 4 else '-'
             flags_str += 'W' if p_flags & 2 else '-'
             flags_str += 'X' if p_flags & 1 else '-'
-            print(f'  p_flags:     0x{p_flags:08x} ({flags_str})')
-
-            print(f"  p_align:     {phdr['p_align']} bytes")
-
-            # Show what gets loaded into memory
-            print('\n  Memory mapping:')
-            print(
-                f"    File [0x{phdr['p_offset']:x}:0x{phdr['p_offset'] + phdr['p_filesz']:x}] -> Memory [0x{phdr['p_vaddr']:x}:0x{phdr['p_vaddr'] + phdr['p_memsz']:x}]",  # noqa: E501
+            preview = None
+            available = 0
+            if phdr.p_offset < self.size and phdr.p_filesz > 0:
+                # Show what's actually in the file at this offset
+                available = min(phdr.p_filesz, self.size - phdr.p_offset, 32)
+                preview = bytes(self.read(phdr.p_offset, available)).hex()
+            phdrs.append(
+                {
+                    **phdr.as_dict(),
+                    'type_name': type_name,
+                    'flags_str': flags_str,
+                    'preview': preview,
+                    'preview_truncated': preview is not None and available < phdr.p_filesz,
+                },
             )
+        return phdrs
 
-            # Show what's actually in the file at this offset
-            if phdr['p_offset'] < len(self.data) and phdr['p_filesz'] > 0:
-                available = min(phdr['p_filesz'], len(self.data) - phdr['p_offset'], 32)
-                data_preview = self.data[phdr['p_offset'] : phdr['p_offset'] + available]
-                hex_str = ' '.join(f'{b:02x}' for b in data_preview)
-                if available < phdr['p_filesz']:
-                    hex_str += ' ...'
-                print(f'    File data preview: {hex_str}')
-
-            print()
-
-    def disassemble_at_entry(self, max_instructions: int = 20) -> None:  # noqa: C901
-        """Simple x86 disassembler starting at entry point"""
-        entry = self.ehdr['e_entry']
-
-        # Find which program header contains the entry point
-        code_data = None
-        code_offset = None
-        base_vaddr = None
-        base_offset = None
-
-        for phdr in self.phdrs:
-            vaddr = phdr['p_vaddr']
-            memsz = phdr['p_memsz']
-            offset = phdr['p_offset']
-            filesz = phdr['p_filesz']
-
-            # Page-align addresses (OS loads in 4096-byte pages)
-            page_aligned_vaddr = (vaddr // 4096) * 4096
-            page_offset = vaddr - page_aligned_vaddr
-
-            # The segment actually starts at the page boundary in memory
-            # So addresses from page_aligned_vaddr to vaddr+memsz are valid
-            if page_aligned_vaddr <= entry < vaddr + memsz:
-                # Calculate file offset relative to the segment start
-                # But need to account for page alignment
-                code_offset = offset - page_offset + (entry - page_aligned_vaddr)
-
-                # Make sure we're not going before file start
-                if code_offset < 0:
-                    continue
-
-                base_vaddr = page_aligned_vaddr
-                base_offset = offset - page_offset
-
-                # Load data accounting for page alignment
-                # Start from where the page-aligned segment begins in the file
-                actual_start = max(0, offset - page_offset)
-                end_offset = min(offset + filesz, len(self.data))
-
-                if actual_start < len(self.data):
-                    code_data = self.data[actual_start:end_offset]
-                    break
-
-        if code_data is None or code_offset is None or base_vaddr is None or base_offset is None:
-            print(f'\nCannot disassemble: entry point 0x{entry:x} not found in file\n')
-            return
+    def disassembly_report(self, max_instructions: int = 20) -> dict[str, Any]:
+        """Simple x86 disassembler starting at entry point, following the jumps"""
+        entry = self.ehdr.e_entry
+        report: dict[str, Any] = {'entry': entry, 'in_file': False, 'instructions': [], 'stop': None}
 
-        print(f'\n=== DISASSEMBLY AT ENTRY POINT (0x{entry:x}) ===\n')
+        entry_offset = self.segments.vaddr_to_offset(entry)
+        if entry_offset is None or not 0 <= entry_offset < self.size:
+            return report
+        report['in_file'] = True
 
-        reg_names = ['eax', 'ecx', 'edx', 'ebx', 'esp', 'ebp', 'esi', 'edi']
-        reg8_names = ['al', 'cl', 'dl', 'bl', 'ah', 'ch', 'dh', 'bh']
+        # Fetch the code around the entry point at once (header-only mode)
+        self.prefetch(entry_offset, max_instructions * MAX_INSTRUCTION_SIZE)
 
         # Start at entry point
-        pc = code_offset - base_offset
-        instruction_count = 0
+        addr = entry
         visited = set()  # Track visited addresses to avoid infinite loops
+        instructions = report['instructions']
 
-        def vaddr_to_offset(vaddr: int) -> int | None:
-            """Convert virtual address to offset in code_data"""
-            if base_vaddr <= vaddr < base_vaddr + len(code_data):
-                return vaddr - base_vaddr
-            return None
-
-        while pc < len(code_data) and instruction_count < max_instructions:
-            addr = base_vaddr + pc
-
+        while len(instructions) < max_instructions:
             # Avoid infinite loops
             if addr in visited:
-                print('  (loop detected, stopping)')
+                report['stop'] = 'loop'
                 break
             visited.add(addr)
 
-            opcode = code_data[pc]
-
-            # MOV reg32, imm32 (0xB8 + reg)
-            if 0xB8 <= opcode <= 0xBF:
-                if pc + 4 < len(code_data):
-                    reg = opcode - 0xB8
-                    imm = struct.unpack('<I', code_data[pc + 1 : pc + 5])[0]
-                    print(f'  0x{addr:08x}: B8+{reg:x} {imm:08x}      mov {reg_names[reg]}, 0x{imm:x}')
-                    pc += 5
-                else:
-                    break
-
-            # XCHG eax, reg32 (0x90-0x97)
-            elif 0x90 <= opcode <= 0x97:
-                if opcode == 0x90:
-                    print(f'  0x{addr:08x}: 90                nop')
-                else:
-                    reg = opcode - 0x90
-                    print(f'  0x{addr:08x}: {opcode:02x}                xchg eax, {reg_names[reg]}')
-                pc += 1
-
-            # INT imm8 (0xCD)
-            elif opcode == 0xCD:
-                if pc + 1 < len(code_data):
-                    int_num = code_data[pc + 1]
-                    print(f'  0x{addr:08x}: CD {int_num:02x}             int 0x{int_num:x}')
-                    pc += 2
-                else:
-                    break
-
-            # JMP short (0xEB)
-            elif opcode == 0xEB:
-                if pc + 1 < len(code_data):
-                    offset = struct.unpack('b', bytes([code_data[pc + 1]]))[0]
-                    target = addr + 2 + offset
-                    print(f'  0x{addr:08x}: EB {code_data[pc+1]:02x}             jmp short 0x{target:x} ({offset:+d})')
-                    # Follow the jump
-                    new_pc = vaddr_to_offset(target)
-                    if new_pc is not None and 0 <= new_pc < len(code_data):
-                        pc = new_pc
-                    else:
-                        print(f'  (jump target 0x{target:x} out of bounds)')
-                        break
-                else:
-                    break
-
-            # MOV r/m8, r8 (0x88)
-            elif opcode == 0x88:
-                if pc + 1 < len(code_data):
-                    modrm = code_data[pc + 1]
-                    mod = (modrm >> 6) & 3
-                    reg = (modrm >> 3) & 7
-                    rm = modrm & 7
-                    if mod == 3:  # Register to register
-                        print(f'  0x{addr:08x}: 88 {modrm:02x}             mov {reg8_names[rm]}, {reg8_names[reg]}')
-                        pc += 2
-                    else:
-                        print(f'  0x{addr:08x}: 88 {modrm:02x}             mov [?], {reg8_names[reg]}')
-                        pc += 2
-                else:
-                    break
-
-            # MOV r/m32, r32 (0x89)
-            elif opcode == 0x89:
-                if pc + 1 < len(code_data):
-                    modrm = code_data[pc + 1]
-                    mod = (modrm >> 6) & 3
-                    reg = (modrm >> 3) & 7
-                    rm = modrm & 7
-                    if mod == 3:  # Register to register
-                        print(f'  0x{addr:08x}: 89 {modrm:02x}             mov {reg_names[rm]}, {reg_names[reg]}')
-                        pc += 2
-                    else:
-                        print(f'  0x{addr:08x}: 89 {modrm:02x}             mov [?], {reg_names[reg]}')
-                        pc += 2
-                else:
-                    break
-
-            # MOV r32, r/m32 (0x8B)
-            elif opcode == 0x8B:
-                if pc + 1 < len(code_data):
-                    modrm = code_data[pc + 1]
-                    mod = (modrm >> 6) & 3
-                    reg = (modrm >> 3) & 7
-                    rm = modrm & 7
-                    if mod == 3:  # Register to register
-                        print(f'  0x{addr:08x}: 8B {modrm:02x}             mov {reg_names[reg]}, {reg_names[rm]}')
-                        pc += 2
-                    else:
-                        print(f'  0x{addr:08x}: 8B {modrm:02x}             mov {reg_names[reg]}, [?]')
-                        pc += 2
-                else:
-                    break
-
-            # XCHG r/m32, r32 (0x87)
-            elif opcode == 0x87:
-                if pc + 1 < len(code_data):
-                    modrm = code_data[pc + 1]
-                    mod = (modrm >> 6) & 3
-                    reg = (modrm >> 3) & 7
-                    rm = modrm & 7
-                    if mod == 3:  # Register to register
-                        print(f'  0x{addr:08x}: 87 {modrm:02x}             xchg {reg_names[rm]}, {reg_names[reg]}')
-                        pc += 2
-                    else:
-                        print(f'  0x{addr:08x}: 87 {modrm:02x}             xchg [?], {reg_names[reg]}')
-                        pc += 2
-                else:
-                    break
-
-            # INC reg32 (0x40-0x47)
-            elif 0x40 <= opcode <= 0x47:
-                reg = opcode - 0x40
-                print(f'  0x{addr:08x}: {opcode:02x}                inc {reg_names[reg]}')
-                pc += 1
-
-            # DEC reg32 (0x48-0x4F)
-            elif 0x48 <= opcode <= 0x4F:
-                reg = opcode - 0x48
-                print(f'  0x{addr:08x}: {opcode:02x}                dec {reg_names[reg]}')
-                pc += 1
-
-            # PUSH imm32 (0x68)
-            elif opcode == 0x68:
-                if pc + 4 < len(code_data):
-                    imm = struct.unpack('<I', code_data[pc + 1 : pc + 5])[0]
-                    print(f'  0x{addr:08x}: 68 {imm:08x}      push 0x{imm:x}')
-                    pc += 5
-                else:
-                    break
-
-            # MOV reg8, imm8 (0xB0-0xB7)
-            elif 0xB0 <= opcode <= 0xB7:
-                if pc + 1 < len(code_data):
-                    reg = opcode - 0xB0
-                    imm = code_data[pc + 1]
-                    print(f'  0x{addr:08x}: {opcode:02x} {imm:02x}             mov {reg8_names[reg]}, 0x{imm:x}')
-                    pc += 2
-                else:
-                    break
-
-            # PUSH ES (0x06)
-            elif opcode == 0x06:
-                print(f'  0x{addr:08x}: 06                push es')
-                pc += 1
-
-            # ADC AL, imm8 (0x14)
-            elif opcode == 0x14:
-                if pc + 1 < len(code_data):
-                    imm = code_data[pc + 1]
-                    print(f'  0x{addr:08x}: 14 {imm:02x}             adc al, 0x{imm:x}')
-                    pc += 2
-                else:
-                    break
-
-            # LEAVE (0xC9)
-            elif opcode == 0xC9:
-                print(f'  0x{addr:08x}: C9                leave')
-                pc += 1
-
-            # Shift/Rotate r/m32, imm8 (0xC1)
-            elif opcode == 0xC1:
-                if pc + 2 < len(code_data):
-                    modrm = code_data[pc + 1]
-                    mod = (modrm >> 6) & 3
-                    reg = (modrm >> 3) & 7
-                    rm = modrm & 7
-                    imm = code_data[pc + 2]
-
-                    shift_ops = ['rol', 'ror', 'rcl', 'rcr', 'shl', 'shr', '?', 'sar']
-                    op = shift_ops[reg]
-
-                    if mod == 3:  # Register
-                        print(f'  0x{addr:08x}: C1 {modrm:02x} {imm:02x}          {op} {reg_names[rm]}, {imm}')
-                        pc += 3
-                    else:
-                        print(f'  0x{addr:08x}: C1 {modrm:02x} {imm:02x}          {op} [?], {imm}')
-                        pc += 3
-                else:
-                    break
-
-            # LOOPZ/LOOPE rel8 (0xE1)
-            elif opcode == 0xE1:
-                if pc + 1 < len(code_data):
-                    offset = struct.unpack('b', bytes([code_data[pc + 1]]))[0]
-                    target = addr + 2 + offset
-                    print(f'  0x{addr:08x}: E1 {code_data[pc+1]:02x}             loopz 0x{target:x} ({offset:+d})')
-                    pc += 2
-                else:
+            instruction = self.decode_at(addr)
+            if instruction is None:
+                # Unmapped or truncated by the end of the segment
+                break
+            instructions.append(instruction.as_dict())
+
+            target = instruction.target
+            if instruction.flow == Flow.JUMP and target is not None:
+                # Follow the jump
+                if self.decode_at(target) is None:
+                    report['stop'] = 'jump_out_of_bounds'
+                    report['jump_target'] = target
                     break
+                addr = target
+            else:
+                addr = instruction.next_address
 
-            # OR EAX, imm32 (0x0D)
-            elif opcode == 0x0D:
-                if pc + 4 < len(code_data):
-                    imm = struct.unpack('<I', code_data[pc + 1 : pc + 5])[0]
-                    print(f'  0x{addr:08x}: 0D {imm:08x}      or eax, 0x{imm:x}')
-                    pc += 5
-                else:
-                    break
+        return report
 
-            # TEST EAX, imm32 (0xA9)
-            elif opcode == 0xA9:
-                if pc + 4 < len(code_data):
-                    imm = struct.unpack('<I', code_data[pc + 1 : pc + 5])[0]
-                    print(f'  0x{addr:08x}: A9 {imm:08x}      test eax, 0x{imm:x}')
-                    pc += 5
-                else:
-                    break
+    def sections_report(self) -> list[dict[str, Any]]:
+        """Section headers with their type names and flags"""
+        sections = []
+        for shdr in self.sections():
+            sh_type = shdr.sh_type
+            sh_flags = shdr.sh_flags
+            flags_str = ''
+            flags_str += 'W' if sh_flags & 1 else '-'
+            flags_str += 'A' if sh_flags & 2 else '-'
+            flags_str += 'X' if sh_flags & 4 else '-'
+            sections.append(
+                {
+                    **shdr.as_dict(),
+                    'type_name': ShType(sh_type).name if sh_type in [e.value for e in ShType] else f'0x{sh_type:x}',
+                    'flags_str': flags_str,
+                },
+            )
+        return sections
+
+    def report_builders(
+        self,
+        *,
+        disassembly: bool = True,
+        cfg: bool = False,
+        sections: bool = False,
+    ) -> dict[str, Callable[[], Any]]:
+        """Functions building each section of the report, in the order they are shown"""
+        builders: dict[str, Callable[[], Any]] = {'ehdr': self.ehdr_report, 'phdrs': self.phdrs_report}
+        if sections:
+            builders['sections'] = self.sections_report
+        if cfg:
+            builders['cfg'] = lambda: self.control_flow_graph().as_dict()
+        elif disassembly:
+            builders['disassembly'] = self.disassembly_report
+        return builders
+
+    def report(self, **options: bool) -> Report:
+        """Everything elf_parser shows about the file as structured data (see report.py)"""
+        report: Report = {'file': self.filename, 'notes': self.notes}
+        if not self.parsed:
+            report['error'] = 'not an ELF file'
+            return report
+        for name, build in self.report_builders(**options).items():
+            report[name] = build()
+        return report
+
+    def cached_report(self, cache: ReportCache, **options: bool) -> Report:
+        """`report` through a persistent cache: an unchanged file is not parsed at all.
+        Otherwise the sections of the previous version of the same file are reused
+        when the bytes they were built from did not change, so when only the code
+        changed the headers are not rebuilt."""
+        key = cache.key(file_digest(self.filename), options)
+        entry = cache.get(key)
+        if entry is not None:
+            return {**entry['report'], 'file': self.filename}
+
+        previous = cache.previous(self.filename, options) or {'report': {}, 'depends': {}}
+        # The reads done while parsing are a dependency of every section
+        self.reads = []
+        self.parse()
+        parsed_reads = self.reads
+        report: Report = {'file': self.filename, 'notes': self.notes}
+        depends: dict[str, Any] = {}
+        if not self.parsed:
+            report['error'] = 'not an ELF file'
+        else:
+            for name, build in self.report_builders(**options).items():
+                reused = previous['depends'].get(name)
+                if reused is not None and self.ranges_digest(reused['ranges']) == reused['digest']:
+                    report[name] = previous['report'][name]
+                    self.notes.extend(reused['notes'])
+                    depends[name] = reused
+                    continue
+                self.reads = list(parsed_reads)
+                notes_before = len(self.notes)
+                report[name] = build()
+                ranges = merge_ranges(self.reads)
+                self.reads = None
+                depends[name] = {
+                    'ranges': ranges,
+                    'digest': self.ranges_digest(ranges),
+                    'notes': self.notes[notes_before:],
+                }
+        self.reads = None
+        cache.put(key, {'report': report, 'depends': depends}, self.filename, options)
+        return report
+
+    def ranges_digest(self, ranges: list[list[int]]) -> str:
+        """Digest of the size of the file and of the bytes of `ranges`"""
+        reads, self.reads = self.reads, None
+        digest = hashlib.sha256(str(self.size).encode())
+        for offset, length in ranges:
+            digest.update(self.read(offset, length))
+        self.reads = reads
+        return digest.hexdigest()
 
-            # Two-byte instructions (0x0F prefix)
-            elif opcode == 0x0F:
-                if pc + 1 < len(code_data):
-                    opcode2 = code_data[pc + 1]
-
-                    # BSWAP reg32 (0x0F C8-CF)
-                    if 0xC8 <= opcode2 <= 0xCF:
-                        reg = opcode2 - 0xC8
-                        print(f'  0x{addr:08x}: 0F {opcode2:02x}             bswap {reg_names[reg]}')
-                        pc += 2
-
-                    # MOVZX r32, r/m8 (0x0F B6)
-                    elif opcode2 == 0xB6:
-                        if pc + 2 < len(code_data):
-                            modrm = code_data[pc + 2]
-                            mod = (modrm >> 6) & 3
-                            reg = (modrm >> 3) & 7
-                            rm = modrm & 7
-                            if mod == 3:
-                                print(
-                                    f'  0x{addr:08x}: 0F B6 {modrm:02x}          movzx {reg_names[reg]}, {reg8_names[rm]}',  # noqa: E501
-                                )
-                            else:
-                                print(f'  0x{addr:08x}: 0F B6 {modrm:02x}          movzx {reg_names[reg]}, [?]')
-                            pc += 3
-                        else:
-                            break
-
-                    # MOVSX r32, r/m8 (0x0F BE)
-                    elif opcode2 == 0xBE:
-                        if pc + 2 < len(code_data):
-                            modrm = code_data[pc + 2]
-                            mod = (modrm >> 6) & 3
-                            reg = (modrm >> 3) & 7
-                            rm = modrm & 7
-                            if mod == 3:
-                                print(
-                                    f'  0x{addr:08x}: 0F BE {modrm:02x}          movsx {reg_names[reg]}, {reg8_names[rm]}',  # noqa: E501
-                                )
-                            else:
-                                print(f'  0x{addr:08x}: 0F BE {modrm:02x}          movsx {reg_names[reg]}, [?]')
-                            pc += 3
-                        else:
-                            break
-
-                    # IMUL r32, r/m32 (0x0F AF)
-                    elif opcode2 == 0xAF:
-                        if pc + 2 < len(code_data):
-                            modrm = code_data[pc + 2]
-                            mod = (modrm >> 6) & 3
-                            reg = (modrm >> 3) & 7
-                            rm = modrm & 7
-                            if mod == 3:
-                                print(
-                                    f'  0x{addr:08x}: 0F AF {modrm:02x}          imul {reg_names[reg]}, {reg_names[rm]}',  # noqa: E501
-                                )
-                            else:
-                                print(f'  0x{addr:08x}: 0F AF {modrm:02x}          imul {reg_names[reg]}, [?]')
-                            pc += 3
-                        else:
-                            break
-
-                    else:
-                        print(f'  0x{addr:08x}: 0F {opcode2:02x}             <unknown 0F opcode>')
-                        pc += 2
-                else:
-                    break
+    def print_ehdr(self) -> None:
+        """Print ELF header information"""
+        with ReportWriter(sys.stdout) as out:
+            render_ehdr(self.ehdr_report(), out)
 
-            # Unknown instruction
+    def print_phdrs(self) -> None:
+        """Print program header information"""
+        with ReportWriter(sys.stdout) as out:
+            render_phdrs(self.phdrs_report(), out)
+
+    def disassemble_at_entry(self, max_instructions: int = 20) -> None:
+        """Print the disassembly at the entry point"""
+        with ReportWriter(sys.stdout) as out:
+            render_disassembly(self.disassembly_report(max_instructions), out)
+
+    def control_flow_graph(self, entries: Iterable[int] = ()) -> ControlFlowGraph:
+        """Recursive traversal from the entry point (and the extra `entries`). The
+        graph is kept so later calls only decode the blocks not reached yet."""
+        if self.cfg is None:
+            self.cfg = ControlFlowGraph(self.decode_at)
+            self.cfg.add_entry(self.ehdr.e_entry)
+        for entry in entries:
+            self.cfg.add_entry(entry)
+        return self.cfg
+
+    def print_cfg(self) -> None:
+        """Print the basic blocks reachable from the entry point"""
+        with ReportWriter(sys.stdout) as out:
+            render_cfg(self.ehdr.e_entry, self.control_flow_graph().as_dict(), out)
+
+    def decode_at(self, vaddr: int) -> Instruction | None:
+        """Decode the instruction loaded at `vaddr` (None when it is not backed by the file)"""
+        mapping = self.segments.lookup(vaddr)
+        if mapping is None:
+            return None
+        offset = mapping.offset_of(vaddr)
+        if offset is None or offset < 0:
+            return None
+        # Do not decode past the file backed part of the segment nor past the file
+        available = min(mapping.file_end - vaddr, self.size - offset, MAX_INSTRUCTION_SIZE)
+        if available <= 0:
+            return None
+        return decode(self.read(offset, available), 0, vaddr)
+
+
+def scan_file(filename: str, mode: LoadMode = LoadMode.PREAD) -> str:
+    """Parse one file of a corpus and summarise it as a compact JSON line"""
+    result: dict[str, object] = {'file': filename}
+    try:
+        with ElfParser(filename, mode=mode, verbose=False) as parser:
+            if parser.parse():
+                result['ehdr'] = parser.ehdr.as_dict()
+                result['phdrs'] = [phdr.as_dict() for phdr in parser.phdrs]
+                result['entry_offset'] = parser.entry_file_offset()
             else:
-                print(f'  0x{addr:08x}: {opcode:02x}                <unknown>')
-                pc += 1
-
-            instruction_count += 1
-
-        print()
+                result['error'] = 'not an ELF file'
+    except (OSError, struct.error) as e:
+        result['error'] = str(e)
+    return json.dumps(result, separators=(',', ':'))
+
+
+def iter_corpus(paths: Iterable[str]) -> Iterator[str]:
+    """Yield the files of a corpus, walking the directories lazily"""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _dirs, files in os.walk(path):
+                for name in files:
+                    yield os.path.join(root, name)
+        else:
+            yield path
+
+
+def scan_files(filenames: list[str], mode: LoadMode = LoadMode.PREAD) -> list[str]:
+    """Worker side of `scan_corpus`: scan a batch of files"""
+    return [scan_file(filename, mode) for filename in filenames]
+
+
+def scan_corpus(
+    paths: Iterable[str],
+    *,
+    mode: LoadMode = LoadMode.PREAD,
+    jobs: int | None = None,
+    batch_size: int = 64,
+) -> Iterator[str]:
+    """Parse every file of a corpus in a process pool and yield the JSON lines as
+    the workers finish. Files are sent to the workers in batches (to amortize the
+    IPC) and only a bounded number of batches are in flight at any time so that
+    the memory does not grow with the size of the corpus."""
+    jobs = jobs or os.cpu_count() or 1
+    max_pending = jobs * 2
+    files = iter_corpus(paths)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending: set[Future[list[str]]] = set()
+        while batch := list(itertools.islice(files, batch_size)):
+            pending.add(executor.submit(scan_files, batch, mode))
+            if len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield from future.result()
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+def read_file_list(list_file: str) -> Iterator[str]:
+    """Yield the paths listed one per line in `list_file` ('-' for stdin)"""
+    with sys.stdin if list_file == '-' else open(list_file) as f:
+        for line in f:
+            if line := line.strip():
+                yield line
 
 
 def main() -> None:
-    if len(sys.argv) == 1:
-        sys.argv.append('quinpy81')
-
-    if len(sys.argv) != 2:
-        print('Usage: python3 elf_parser.py <elf_file>')
-        sys.exit(1)
-
-    filename = sys.argv[1]
-
-    parser = ElfParser(filename)
-
-    if not parser.parse():
+    argparser = argparse.ArgumentParser(description='Explain the headers of a (possibly handcrafted) ELF file')
+    argparser.add_argument('elf_files', nargs='*', default=['quinpy81'], metavar='elf_file')
+    mode_group = argparser.add_mutually_exclusive_group()
+    mode_group.add_argument(
+        '--mmap',
+        dest='mode',
+        action='store_const',
+        const=LoadMode.MMAP,
+        help='map the file in memory instead of reading it (for huge files)',
+    )
+    mode_group.add_argument(
+        '--header-only',
+        dest='mode',
+        action='store_const',
+        const=LoadMode.PREAD,
+        help='only fetch the headers with positioned reads, segments are read on demand (for remote files)',
+    )
+    argparser.add_argument(
+        '--corpus',
+        nargs='+',
+        metavar='PATH',
+        help='scan these files/directories with a process pool and print one JSON line per file',
+    )
+    argparser.add_argument(
+        '--files-from',
+        metavar='LIST',
+        help='scan the files listed (one per line) in LIST (- for stdin), same output as --corpus',
+    )
+    argparser.add_argument('--sections', action='store_true', help='also show the section headers')
+    argparser.add_argument(
+        '--cache',
+        nargs='?',
+        const=default_cache_dir(),
+        metavar='DIR',
+        help=f'reuse the reports of unchanged files and sections from a cache (default: {default_cache_dir()})',
+    )
+    argparser.add_argument('--cache-size', type=int, default=64, metavar='MiB', help='size of the cache (default: 64)')
+    argparser.add_argument(
+        '--format',
+        choices=tuple(RENDERERS),
+        default='text',
+        help='render the reports as text, one JSON line per file or CSV rows (file, field, value)',
+    )
+    argparser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes')
+    argparser.add_argument(
+        '--cfg',
+        choices=('text', 'dot', 'json'),
+        help='recursive traversal disassembly: basic blocks instead of the linear listing (text) '
+        'or only the control flow graph (dot/json)',
+    )
+    argparser.set_defaults(mode=None)
+    args = argparser.parse_args()
+
+    if args.corpus or args.files_from:
+        paths = itertools.chain(args.corpus or [], read_file_list(args.files_from) if args.files_from else [])
+        # Only the headers are needed so by default do not read the whole files
+        for line in scan_corpus(paths, mode=args.mode or LoadMode.PREAD, jobs=args.jobs):
+            sys.stdout.write(line + '\n')
+        return
+
+    render = RENDERERS[args.format]
+    cache = ReportCache(args.cache, args.cache_size << 20) if args.cache else None
+    failed = False
+    with ReportWriter(sys.stdout) as out:
+        if args.format == 'csv' and not args.cfg:
+            out.write(CSV_HEADER)
+        for elf_file in args.elf_files:
+            with ElfParser(elf_file, mode=args.mode or LoadMode.READ, verbose=False) as parser:
+                if cache is not None and args.cfg not in ('dot', 'json'):
+                    report = parser.cached_report(cache, cfg=args.cfg == 'text', sections=args.sections)
+                    failed |= 'error' in report
+                    render(report, out)
+                    continue
+                parsed = parser.parse()
+                failed |= not parsed
+                if parsed and args.cfg in ('dot', 'json'):
+                    cfg = parser.control_flow_graph()
+                    out.line(cfg.to_dot() if args.cfg == 'dot' else cfg.to_json())
+                    continue
+                render(parser.report(cfg=args.cfg == 'text', sections=args.sections), out)
+    if failed:
         sys.exit(1)
 
-    parser.print_ehdr()
-    parser.print_phdrs()
-    parser.disassemble_at_entry()
-
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,930 @@
+#!/usr/bin/env python3
+"""In-process i386 micro-emulator to check quinindrome candidates without exec.
+
+The ELF is loaded the way binfmt_elf (compat ia32) would: the same header checks
+(magic, e_type, e_machine, e_phentsize, e_phnum, PT_LOAD sanity), the PT_LOAD
+segments are mapped page by page with `SegmentMap` and every register but esp
+starts at 0. The instructions are decoded with `x86_decoder` and `int 0x80`
+implements write/exit, which is all a quine needs.
+"""
+
+import argparse
+import struct
+import sys
+from collections.abc import Callable
+from functools import lru_cache
+from typing import NamedTuple
+
+from elf_parser import (
+    EHDR_STRUCTS,
+    PAGE_SIZE,
+    PHDR_STRUCTS,
+    Elf32Ehdr,
+    PhType,
+    SegmentMap,
+    make_phdr,
+)
+from x86_decoder import MAX_INSTRUCTION_SIZE, Instruction, decode
+
+MASK32 = 0xFFFFFFFF
+TASK_SIZE = 0xFFFFE000  # IA32 process on a 64-bit kernel
+MMAP_MIN_ADDR = 0x10000  # Default vm.mmap_min_addr, the kernel maps nothing below
+STACK_TOP = TASK_SIZE
+STACK_SIZE = 0x20000
+SYS_EXIT = 1
+SYS_READ = 3
+SYS_WRITE = 4
+SYS_EXIT_GROUP = 252
+EFAULT = 14
+ENOSYS = 38
+# Segment selectors of a 32-bit process on x86_64
+SEGMENT_SELECTORS = {0x06: 0x2B, 0x0E: 0x23, 0x16: 0x2B, 0x1E: 0x2B}
+# Overrides of the flat segments change nothing, the other prefixes are not emulated
+FLAT_SEGMENT_PREFIXES = frozenset((0x26, 0x2E, 0x36, 0x3E))
+PARITY = tuple(bin(i).count('1') % 2 == 0 for i in range(256))
+U32 = struct.Struct('<I')
+
+
+@lru_cache(maxsize=1 << 16)
+def decode_window(code: bytes, address: int) -> Instruction | None:
+    """Decode the instruction at the start of `code`. Cached across runs: candidates
+    mostly share their code and an Instruction is immutable"""
+    return decode(code, 0, address)
+
+
+class LoadError(Exception):
+    """The kernel would refuse to execute the file (execve fails)"""
+
+
+class Fault(Exception):
+    """The process is killed by a signal"""
+
+    def __init__(self, signal: str, address: int, reason: str) -> None:
+        super().__init__(f'{signal} at 0x{address:x}: {reason}')
+        self.signal = signal
+
+
+class RunResult(NamedTuple):
+    exit_code: int | None  # None when the process did not exit by itself
+    stdout: bytes
+    steps: int
+    fault: str | None = None
+
+
+class Verdict(NamedTuple):
+    size: int
+    palindrome: bool
+    quine: bool
+    exit_code: int | None
+    steps: int
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.palindrome and self.quine and self.exit_code == 0
+
+
+def load(data: bytes) -> tuple[Elf32Ehdr, SegmentMap]:
+    """Validate the headers like load_elf_binary and build the address space"""
+    # The kernel reads the first bytes of the file in a zeroed buffer
+    header = data[:64].ljust(64, b'\x00')
+    if header[:4] != b'\x7fELF':
+        raise LoadError('not an ELF file (magic number mismatch)')
+    # EI_CLASS and EI_DATA are not checked: an i386 header is always 32-bit little-endian
+    ehdr = Elf32Ehdr._make(EHDR_STRUCTS[False, '<'].unpack_from(header))
+    if ehdr.e_type == 3:
+        raise LoadError('ET_DYN is not supported by the emulator')
+    if ehdr.e_type != 2:
+        raise LoadError(f'e_type 0x{ehdr.e_type:x} is neither ET_EXEC nor ET_DYN')
+    if ehdr.e_machine not in (3, 6):
+        raise LoadError(f'e_machine 0x{ehdr.e_machine:x} is not EM_386/EM_486')
+    if ehdr.e_phentsize != 32:
+        raise LoadError(f'e_phentsize is {ehdr.e_phentsize} instead of 32')
+    if not 1 <= ehdr.e_phnum <= 65536 // 32:
+        raise LoadError(f'invalid e_phnum {ehdr.e_phnum}')
+    phdr_struct = PHDR_STRUCTS[False, '<']
+    if ehdr.e_phoff + ehdr.e_phnum * 32 > len(data):
+        raise LoadError('program headers past the end of the file')
+    phdrs = [
+        make_phdr(phdr_struct.unpack_from(data, ehdr.e_phoff + i * 32), False) for i in range(ehdr.e_phnum)
+    ]
+    for phdr in phdrs:
+        if phdr.p_type == PhType.PT_INTERP.value:
+            raise LoadError('PT_INTERP is not supported by the emulator')
+        if phdr.p_type != PhType.PT_LOAD.value:
+            continue
+        if phdr.p_filesz > phdr.p_memsz:
+            raise LoadError('p_filesz > p_memsz')
+        if phdr.p_vaddr > TASK_SIZE or phdr.p_memsz > TASK_SIZE or TASK_SIZE - phdr.p_memsz < phdr.p_vaddr:
+            raise LoadError('segment outside of the user address space')
+        if phdr.p_memsz and phdr.p_vaddr // PAGE_SIZE * PAGE_SIZE < MMAP_MIN_ADDR:
+            raise LoadError(f'segment mapped below vm.mmap_min_addr (0x{MMAP_MIN_ADDR:x})')
+        if (phdr.p_offset - phdr.p_vaddr) % PAGE_SIZE != 0:
+            raise LoadError('p_offset and p_vaddr are not congruent modulo the page size')
+    return ehdr, SegmentMap(phdrs)
+
+
+class Emulator:
+    def __init__(self, data: bytes, *, max_steps: int = 10_000, trace: bool = False) -> None:
+        self.data = data
+        self.ehdr, self.segments = load(data)
+        self.max_steps = max_steps
+        self.trace = trace
+        self.regs = [0] * 8
+        self.regs[4] = STACK_TOP - 0x100
+        self.eip = self.ehdr.e_entry
+        self.cf = self.zf = self.sf = self.of = self.pf = self.df = False
+        self.stdout = bytearray()
+        self.exit_code: int | None = None
+        # page number -> (content, readable, writable, executable)
+        self.pages: dict[int, tuple[bytearray, bool, bool, bool]] = {}
+        # Decoded instructions of the run, dropped when a page holding code is written
+        self.decoded: dict[int, Instruction] = {}
+        self.code_pages: set[int] = set()
+        self.write32(self.regs[4], 1)  # argc
+
+    # --- Memory ---
+
+    def page(self, address: int, write: bool = False, execute: bool = False) -> bytearray:
+        number = address // PAGE_SIZE
+        page = self.pages.get(number)
+        if page is None:
+            page = self.map_page(number, address)
+            self.pages[number] = page
+        content, readable, writable, executable = page
+        if not (write or execute or readable):
+            raise Fault('SIGSEGV', self.eip, f'read from unreadable page 0x{address:x}')
+        if write and not writable:
+            raise Fault('SIGSEGV', self.eip, f'write to read-only page 0x{address:x}')
+        if execute and not executable:
+            raise Fault('SIGSEGV', self.eip, f'execute from non executable page 0x{address:x}')
+        return content
+
+    def map_page(self, number: int, address: int) -> tuple[bytearray, bool, bool, bool]:
+        start = number * PAGE_SIZE
+        if STACK_TOP - STACK_SIZE <= start < STACK_TOP:
+            return bytearray(PAGE_SIZE), True, True, True
+        mapping = self.segments.lookup(start)
+        if mapping is None:
+            raise Fault('SIGSEGV', self.eip, f'access to unmapped address 0x{address:x}')
+        content = bytearray(PAGE_SIZE)
+        backed = min(mapping.file_end, start + PAGE_SIZE) - start
+        if backed <= 0:
+            # The bss pages past the file are mapped read-write through brk
+            return content, True, True, True
+        offset = mapping.file_start + (start - mapping.start)
+        if offset >= -(-len(self.data) // PAGE_SIZE) * PAGE_SIZE:
+            raise Fault('SIGBUS', self.eip, f'access to 0x{address:x} past the end of the file')
+        chunk = self.data[max(offset, 0) : offset + backed]
+        content[max(-offset, 0) : max(-offset, 0) + len(chunk)] = chunk
+        flags = mapping.phdr.p_flags
+        # x86 pages cannot be write-only, and without PT_GNU_STACK i386 binaries get
+        # READ_IMPLIES_EXEC
+        return content, bool(flags & 6), bool(flags & 2), bool(flags & 5)
+
+    def read8(self, address: int) -> int:
+        address &= MASK32
+        return self.page(address)[address % PAGE_SIZE]
+
+    def read32(self, address: int) -> int:
+        address &= MASK32
+        offset = address % PAGE_SIZE
+        if offset <= PAGE_SIZE - 4:
+            return U32.unpack_from(self.page(address), offset)[0]
+        return int.from_bytes(bytes(self.read8(address + i) for i in range(4)), 'little')
+
+    def write8(self, address: int, value: int) -> None:
+        address &= MASK32
+        self.page(address, write=True)[address % PAGE_SIZE] = value & 0xFF
+        if address // PAGE_SIZE in self.code_pages:
+            self.decoded.clear()
+
+    def write32(self, address: int, value: int) -> None:
+        address &= MASK32
+        offset = address % PAGE_SIZE
+        if offset <= PAGE_SIZE - 4:
+            U32.pack_into(self.page(address, write=True), offset, value & MASK32)
+            if address // PAGE_SIZE in self.code_pages:
+                self.decoded.clear()
+        else:
+            for i, byte in enumerate((value & MASK32).to_bytes(4, 'little')):
+                self.write8(address + i, byte)
+
+    def read_bytes(self, address: int, length: int) -> bytes:
+        """Read up to `length` bytes, stopping at the first unmapped or unreadable page"""
+        out = bytearray()
+        while len(out) < length:
+            try:
+                page = self.page(address)
+            except Fault:
+                break
+            offset = address % PAGE_SIZE
+            chunk = page[offset : offset + length - len(out)]
+            out += chunk
+            address = (address + len(chunk)) & MASK32
+        return bytes(out)
+
+    def fetch(self) -> Instruction:
+        instruction = self.decoded.get(self.eip)
+        if instruction is not None:
+            return instruction
+        page = self.page(self.eip, execute=True)
+        offset = self.eip % PAGE_SIZE
+        code = bytes(page[offset : offset + MAX_INSTRUCTION_SIZE])
+        number = self.eip // PAGE_SIZE
+        self.code_pages.add(number)
+        if len(code) < MAX_INSTRUCTION_SIZE:
+            # The instruction may continue on the next page
+            try:
+                code += self.page(self.eip + len(code), execute=True)[: MAX_INSTRUCTION_SIZE - len(code)]
+                self.code_pages.add(number + 1)
+            except Fault:
+                pass
+        instruction = decode_window(code, self.eip)
+        if instruction is None:
+            raise Fault('SIGSEGV', self.eip, 'instruction crosses into an unmapped page')
+        self.decoded[self.eip] = instruction
+        return instruction
+
+    # --- Operands ---
+
+    def get_reg8(self, reg: int) -> int:
+        return (self.regs[reg - 4] >> 8) & 0xFF if reg >= 4 else self.regs[reg] & 0xFF
+
+    def set_reg8(self, reg: int, value: int) -> None:
+        if reg >= 4:
+            self.regs[reg - 4] = (self.regs[reg - 4] & 0xFFFF00FF) | ((value & 0xFF) << 8)
+        else:
+            self.regs[reg] = (self.regs[reg] & 0xFFFFFF00) | (value & 0xFF)
+
+    def address_of(self, ins: Instruction) -> int:
+        if ins.rm == 4:
+            base = ins.sib & 7
+            index = (ins.sib >> 3) & 7
+            address = 0 if base == 5 and ins.mod == 0 else self.regs[base]
+            if index != 4:
+                address += self.regs[index] << (ins.sib >> 6)
+        elif ins.mod == 0 and ins.rm == 5:
+            address = 0
+        else:
+            address = self.regs[ins.rm]
+        return (address + ins.disp) & MASK32
+
+    def get_rm(self, ins: Instruction, bits: int) -> int:
+        if ins.mod == 3:
+            return self.regs[ins.rm] if bits == 32 else self.get_reg8(ins.rm)
+        address = self.address_of(ins)
+        return self.read32(address) if bits == 32 else self.read8(address)
+
+    def set_rm(self, ins: Instruction, bits: int, value: int) -> None:
+        if ins.mod == 3:
+            if bits == 32:
+                self.regs[ins.rm] = value & MASK32
+            else:
+                self.set_reg8(ins.rm, value)
+            return
+        address = self.address_of(ins)
+        if bits == 32:
+            self.write32(address, value)
+        else:
+            self.write8(address, value)
+
+    def get_reg(self, reg: int, bits: int) -> int:
+        return self.regs[reg] if bits == 32 else self.get_reg8(reg)
+
+    def set_reg(self, reg: int, bits: int, value: int) -> None:
+        if bits == 32:
+            self.regs[reg] = value & MASK32
+        else:
+            self.set_reg8(reg, value)
+
+    def push(self, value: int) -> None:
+        self.regs[4] = (self.regs[4] - 4) & MASK32
+        self.write32(self.regs[4], value)
+
+    def pop(self) -> int:
+        value = self.read32(self.regs[4])
+        self.regs[4] = (self.regs[4] + 4) & MASK32
+        return value
+
+    # --- Flags ---
+
+    def set_result_flags(self, result: int, bits: int) -> None:
+        self.zf = result == 0
+        self.sf = bool(result >> (bits - 1))
+        self.pf = PARITY[result & 0xFF]
+
+    def alu(self, op: int, a: int, b: int, bits: int) -> int | None:
+        """add, or, adc, sbb, and, sub, xor, cmp (in the opcode order). Returns the
+        result to store or None for cmp"""
+        mask = MASK32 if bits == 32 else 0xFF
+        sign = 1 << (bits - 1)
+        b &= mask
+        if op in (0, 2):  # add, adc
+            full = a + b + (op == 2 and self.cf)
+            result = full & mask
+            self.cf = full > mask
+            self.of = bool((a ^ result) & (b ^ result) & sign)
+        elif op in (3, 5, 7):  # sbb, sub, cmp
+            full = a - b - (op == 3 and self.cf)
+            result = full & mask
+            self.cf = full < 0
+            self.of = bool((a ^ b) & (a ^ result) & sign)
+        else:  # or, and, xor
+            result = a | b if op == 1 else a & b if op == 4 else a ^ b
+            self.cf = self.of = False
+        self.set_result_flags(result, bits)
+        return None if op == 7 else result
+
+    def condition(self, cc: int) -> bool:
+        kind = cc >> 1
+        if kind == 0:
+            value = self.of
+        elif kind == 1:
+            value = self.cf
+        elif kind == 2:
+            value = self.zf
+        elif kind == 3:
+            value = self.cf or self.zf
+        elif kind == 4:
+            value = self.sf
+        elif kind == 5:
+            value = self.pf
+        elif kind == 6:
+            value = self.sf != self.of
+        else:
+            value = self.zf or self.sf != self.of
+        return value != bool(cc & 1)
+
+    def eflags(self) -> int:
+        return (
+            0x202
+            | self.cf
+            | self.pf << 2
+            | self.zf << 6
+            | self.sf << 7
+            | self.df << 10
+            | self.of << 11
+        )  # fmt: skip
+
+    def set_eflags(self, value: int) -> None:
+        self.cf = bool(value & 1)
+        self.pf = bool(value & 4)
+        self.zf = bool(value & 0x40)
+        self.sf = bool(value & 0x80)
+        self.df = bool(value & 0x400)
+        self.of = bool(value & 0x800)
+
+    # --- Execution ---
+
+    def run(self) -> RunResult:
+        steps = 0
+        fault = None
+        try:
+            while self.exit_code is None:
+                if steps >= self.max_steps:
+                    fault = f'timeout after {steps} instructions'
+                    break
+                ins = self.fetch()
+                if self.trace:
+                    print(f'  {ins}')
+                steps += 1
+                next_eip = ins.next_address
+                self.eip, eip = next_eip, self.eip
+                try:
+                    handler_of(ins)(self, ins)
+                except KeyError:
+                    raise Fault('SIGILL', eip, f'unsupported instruction {ins.text}') from None
+                except Fault:
+                    self.eip = eip
+                    raise
+        except Fault as f:
+            fault = str(f)
+        return RunResult(self.exit_code, bytes(self.stdout), steps, fault)
+
+    def syscall(self) -> None:
+        number = self.regs[0]
+        ebx, ecx, edx = self.regs[3], self.regs[1], self.regs[2]
+        if number in (SYS_EXIT, SYS_EXIT_GROUP):
+            self.exit_code = ebx & 0xFF
+            return
+        if number == SYS_WRITE:
+            data = self.read_bytes(ecx, edx)
+            if edx and not data:
+                self.regs[0] = -EFAULT & MASK32
+                return
+            if ebx == 1:
+                self.stdout += data
+            self.regs[0] = len(data)
+            return
+        if number == SYS_READ:
+            self.regs[0] = 0  # EOF on stdin
+            return
+        self.regs[0] = -ENOSYS & MASK32
+
+
+def shift(emu: Emulator, op: int, value: int, count: int, bits: int) -> int:
+    """rol, ror, rcl, rcr, shl, shr, sal, sar (ModRM.reg order)"""
+    mask = MASK32 if bits == 32 else 0xFF
+    count &= 0x1F
+    if count == 0:
+        return value
+    msb = bits - 1
+    if op == 0:  # rol
+        count %= bits
+        result = ((value << count) | (value >> (bits - count))) & mask
+        emu.cf = bool(result & 1)
+        emu.of = bool(result >> msb) != emu.cf
+    elif op == 1:  # ror
+        count %= bits
+        result = ((value >> count) | (value << (bits - count))) & mask
+        emu.cf = bool(result >> msb)
+        emu.of = bool(result >> msb) != bool((result >> (msb - 1)) & 1)
+    elif op in (2, 3):  # rcl, rcr: rotate through the carry flag
+        result = value
+        for _ in range(count % (bits + 1)):
+            if op == 2:
+                carry = result >> msb
+                result = ((result << 1) | emu.cf) & mask
+            else:
+                carry = result & 1
+                result = (result >> 1) | (emu.cf << msb)
+            emu.cf = bool(carry)
+        emu.of = bool(result >> msb) != emu.cf if op == 2 else bool(result >> msb) != bool((result >> (msb - 1)) & 1)
+    elif op in (4, 6):  # shl, sal
+        result = (value << count) & mask
+        emu.cf = bool((value >> (bits - count)) & 1) if count <= bits else False
+        emu.of = bool(result >> msb) != emu.cf
+        emu.set_result_flags(result, bits)
+    elif op == 5:  # shr
+        result = value >> count
+        emu.cf = bool((value >> (count - 1)) & 1)
+        emu.of = bool(value >> msb)
+        emu.set_result_flags(result, bits)
+    else:  # sar
+        signed = value - (1 << bits) if value >> msb else value
+        result = (signed >> count) & mask
+        emu.cf = bool((signed >> (count - 1)) & 1)
+        emu.of = False
+        emu.set_result_flags(result, bits)
+    return result
+
+
+def alu_rm_reg(emu: Emulator, ins: Instruction) -> None:
+    op, form = ins.opcode >> 3, ins.opcode & 7
+    bits = 8 if form & 1 == 0 else 32
+    if form < 2:
+        result = emu.alu(op, emu.get_rm(ins, bits), emu.get_reg(ins.reg, bits), bits)
+        if result is not None:
+            emu.set_rm(ins, bits, result)
+    elif form < 4:
+        result = emu.alu(op, emu.get_reg(ins.reg, bits), emu.get_rm(ins, bits), bits)
+        if result is not None:
+            emu.set_reg(ins.reg, bits, result)
+    else:
+        result = emu.alu(op, emu.get_reg(0, bits), ins.imm or 0, bits)
+        if result is not None:
+            emu.set_reg(0, bits, result)
+
+
+def alu_group(emu: Emulator, ins: Instruction) -> None:
+    bits = 8 if ins.opcode == 0x80 else 32
+    result = emu.alu(ins.reg, emu.get_rm(ins, bits), ins.imm or 0, bits)
+    if result is not None:
+        emu.set_rm(ins, bits, result)
+
+
+def inc_dec(emu: Emulator, value: int, delta: int, bits: int) -> int:
+    cf = emu.cf
+    result = emu.alu(0 if delta > 0 else 5, value, 1, bits)
+    emu.cf = cf  # inc/dec preserve the carry flag
+    return result or 0
+
+
+def inc_reg(emu: Emulator, ins: Instruction) -> None:
+    emu.regs[ins.reg] = inc_dec(emu, emu.regs[ins.reg], 1 if ins.opcode < 0x48 else -1, 32)
+
+
+def group_shift(emu: Emulator, ins: Instruction) -> None:
+    bits = 8 if ins.opcode in (0xC0, 0xD0, 0xD2) else 32
+    if ins.opcode in (0xC0, 0xC1):
+        count = ins.imm or 0
+    elif ins.opcode in (0xD0, 0xD1):
+        count = 1
+    else:
+        count = emu.regs[1] & 0xFF
+    emu.set_rm(ins, bits, shift(emu, ins.reg, emu.get_rm(ins, bits), count, bits))
+
+
+def group_unary(emu: Emulator, ins: Instruction) -> None:
+    """test, not, neg, mul, imul, div, idiv"""
+    bits = 8 if ins.opcode == 0xF6 else 32
+    mask = MASK32 if bits == 32 else 0xFF
+    value = emu.get_rm(ins, bits)
+    op = ins.reg
+    if op < 2:
+        emu.alu(4, value, ins.imm or 0, bits)
+    elif op == 2:
+        emu.set_rm(ins, bits, ~value)
+    elif op == 3:
+        result = emu.alu(5, 0, value, bits) or 0
+        emu.set_rm(ins, bits, result)
+        emu.cf = value != 0
+    elif op in (4, 5):
+        a = emu.get_reg(0, bits)
+        if op == 5:
+            a, value = to_signed(a, bits), to_signed(value, bits)
+        product = a * value
+        low, high = product & mask, (product >> bits) & mask
+        if bits == 32:
+            emu.regs[0], emu.regs[2] = low, high
+        else:
+            emu.regs[0] = (emu.regs[0] & 0xFFFF0000) | (high << 8) | low
+        emu.cf = emu.of = (high != 0) if op == 4 else (to_signed(low, bits) != product)
+    else:
+        if value == 0:
+            raise Fault('SIGFPE', emu.eip, 'division by zero')
+        if bits == 32:
+            dividend = (emu.regs[2] << 32) | emu.regs[0]
+        else:
+            dividend = emu.regs[0] & 0xFFFF
+        if op == 7:
+            dividend, value = to_signed(dividend, bits * 2), to_signed(value, bits)
+            quotient = abs(dividend) // abs(value) * (1 if (dividend < 0) == (value < 0) else -1)
+            remainder = dividend - quotient * value
+        else:
+            quotient, remainder = divmod(dividend, value)
+        low = -(1 << (bits - 1)) if op == 7 else 0
+        if not low <= quotient <= low + mask:
+            raise Fault('SIGFPE', emu.eip, 'division overflow')
+        if bits == 32:
+            emu.regs[0], emu.regs[2] = quotient & mask, remainder & mask
+        else:
+            emu.regs[0] = (emu.regs[0] & 0xFFFF0000) | ((remainder & mask) << 8) | (quotient & mask)
+
+
+def to_signed(value: int, bits: int) -> int:
+    return value - (1 << bits) if value >> (bits - 1) else value
+
+
+def group_inc_dec(emu: Emulator, ins: Instruction) -> None:
+    bits = 8 if ins.opcode == 0xFE else 32
+    if ins.reg < 2:
+        emu.set_rm(ins, bits, inc_dec(emu, emu.get_rm(ins, bits), 1 if ins.reg == 0 else -1, bits))
+    elif ins.reg == 2:
+        target = emu.get_rm(ins, 32)
+        emu.push(emu.eip)
+        emu.eip = target
+    elif ins.reg == 4:
+        emu.eip = emu.get_rm(ins, 32)
+    elif ins.reg == 6:
+        emu.push(emu.get_rm(ins, 32))
+    else:
+        raise Fault('SIGILL', emu.eip, f'invalid instruction {ins.text}')
+
+
+def interrupt(emu: Emulator, ins: Instruction) -> None:
+    if ins.imm != 0x80:
+        raise Fault('SIGSEGV', emu.eip, f'int 0x{ins.imm or 0:x} is not allowed in user mode')
+    emu.syscall()
+
+
+def jump_if(condition: Callable[[Emulator, Instruction], bool]) -> Callable[[Emulator, Instruction], None]:
+    def handler(emu: Emulator, ins: Instruction) -> None:
+        if condition(emu, ins):
+            emu.eip = ins.target or 0
+
+    return handler
+
+
+def loop(emu: Emulator, ins: Instruction) -> None:
+    if ins.opcode == 0xE3:  # jecxz does not touch ecx
+        taken = emu.regs[1] == 0
+    else:
+        emu.regs[1] = (emu.regs[1] - 1) & MASK32
+        taken = emu.regs[1] != 0
+        if ins.opcode == 0xE0:
+            taken = taken and not emu.zf
+        elif ins.opcode == 0xE1:
+            taken = taken and emu.zf
+    if taken:
+        emu.eip = ins.target or 0
+
+
+def string_op(emu: Emulator, ins: Instruction) -> None:
+    """movs, cmps, stos, lods and scas (without rep prefix)"""
+    bits = 8 if ins.opcode & 1 == 0 else 32
+    step = (-1 if emu.df else 1) * (bits // 8)
+    read = emu.read8 if bits == 8 else emu.read32
+    if ins.opcode in (0xA6, 0xA7):
+        emu.alu(7, read(emu.regs[6]), read(emu.regs[7]), bits)
+        emu.regs[6] = (emu.regs[6] + step) & MASK32
+        emu.regs[7] = (emu.regs[7] + step) & MASK32
+    elif ins.opcode in (0xAE, 0xAF):
+        emu.alu(7, emu.get_reg(0, bits), read(emu.regs[7]), bits)
+        emu.regs[7] = (emu.regs[7] + step) & MASK32
+    elif ins.opcode in (0xA4, 0xA5):
+        emu_write = emu.write8 if bits == 8 else emu.write32
+        emu_write(emu.regs[7], emu.read8(emu.regs[6]) if bits == 8 else emu.read32(emu.regs[6]))
+        emu.regs[6] = (emu.regs[6] + step) & MASK32
+        emu.regs[7] = (emu.regs[7] + step) & MASK32
+    elif ins.opcode in (0xAA, 0xAB):
+        if bits == 8:
+            emu.write8(emu.regs[7], emu.regs[0])
+        else:
+            emu.write32(emu.regs[7], emu.regs[0])
+        emu.regs[7] = (emu.regs[7] + step) & MASK32
+    else:
+        emu.set_reg(0, bits, emu.read8(emu.regs[6]) if bits == 8 else emu.read32(emu.regs[6]))
+        emu.regs[6] = (emu.regs[6] + step) & MASK32
+
+
+def privileged(emu: Emulator, ins: Instruction) -> None:
+    raise Fault('SIGSEGV', emu.eip, f'privileged instruction {ins.text}')
+
+
+def breakpoint_trap(emu: Emulator, ins: Instruction) -> None:
+    raise Fault('SIGTRAP', emu.eip, 'int3')
+
+
+def set_flag(name: str, value: bool | None) -> Callable[[Emulator, Instruction], None]:
+    def handler(emu: Emulator, ins: Instruction) -> None:
+        setattr(emu, name, not getattr(emu, name) if value is None else value)
+
+    return handler
+
+
+def xchg(emu: Emulator, ins: Instruction) -> None:
+    bits = 8 if ins.opcode == 0x86 else 32
+    value = emu.get_rm(ins, bits)
+    emu.set_rm(ins, bits, emu.get_reg(ins.reg, bits))
+    emu.set_reg(ins.reg, bits, value)
+
+
+def xchg_eax(emu: Emulator, ins: Instruction) -> None:
+    emu.regs[0], emu.regs[ins.reg] = emu.regs[ins.reg], emu.regs[0]
+
+
+def mov(emu: Emulator, ins: Instruction) -> None:
+    bits = 8 if ins.opcode & 1 == 0 else 32
+    if ins.opcode < 0x8A:
+        emu.set_rm(ins, bits, emu.get_reg(ins.reg, bits))
+    else:
+        emu.set_reg(ins.reg, bits, emu.get_rm(ins, bits))
+
+
+def mov_moffs(emu: Emulator, ins: Instruction) -> None:
+    address = ins.imm or 0
+    if ins.opcode == 0xA0:
+        emu.set_reg8(0, emu.read8(address))
+    elif ins.opcode == 0xA1:
+        emu.regs[0] = emu.read32(address)
+    elif ins.opcode == 0xA2:
+        emu.write8(address, emu.regs[0])
+    else:
+        emu.write32(address, emu.regs[0])
+
+
+def test_rm_reg(emu: Emulator, ins: Instruction) -> None:
+    bits = 8 if ins.opcode == 0x84 else 32
+    emu.alu(4, emu.get_rm(ins, bits), emu.get_reg(ins.reg, bits), bits)
+
+
+def imul_imm(emu: Emulator, ins: Instruction) -> None:
+    product = to_signed(emu.get_rm(ins, 32), 32) * (ins.imm if ins.opcode == 0x6B else to_signed(ins.imm or 0, 32))
+    emu.regs[ins.reg] = product & MASK32
+    emu.cf = emu.of = to_signed(product & MASK32, 32) != product
+
+
+def imul_reg(emu: Emulator, ins: Instruction) -> None:
+    product = to_signed(emu.regs[ins.reg], 32) * to_signed(emu.get_rm(ins, 32), 32)
+    emu.regs[ins.reg] = product & MASK32
+    emu.cf = emu.of = to_signed(product & MASK32, 32) != product
+
+
+def movx(emu: Emulator, ins: Instruction) -> None:
+    """movzx / movsx from a byte or a word"""
+    if ins.opcode in (0x0FB6, 0x0FBE):
+        value, bits = emu.get_rm(ins, 8), 8
+    else:
+        value, bits = emu.get_rm(ins, 32) & 0xFFFF, 16
+    emu.regs[ins.reg] = (to_signed(value, bits) if ins.opcode >= 0x0FBE else value) & MASK32
+
+
+def pushad(emu: Emulator, ins: Instruction) -> None:
+    esp = emu.regs[4]
+    for reg in range(8):
+        emu.push(esp if reg == 4 else emu.regs[reg])
+
+
+def popad(emu: Emulator, ins: Instruction) -> None:
+    for reg in reversed(range(8)):
+        value = emu.pop()
+        if reg != 4:
+            emu.regs[reg] = value
+
+
+def ret(emu: Emulator, ins: Instruction) -> None:
+    emu.eip = emu.pop()
+    emu.regs[4] = (emu.regs[4] + (ins.imm or 0)) & MASK32
+
+
+def call(emu: Emulator, ins: Instruction) -> None:
+    emu.push(emu.eip)
+    emu.eip = ins.target or 0
+
+
+def leave(emu: Emulator, ins: Instruction) -> None:
+    emu.regs[4] = emu.regs[5]
+    emu.regs[5] = emu.pop()
+
+
+def cdq(emu: Emulator, ins: Instruction) -> None:
+    emu.regs[2] = MASK32 if emu.regs[0] >> 31 else 0
+
+
+def cwde(emu: Emulator, ins: Instruction) -> None:
+    emu.regs[0] = to_signed(emu.regs[0] & 0xFFFF, 16) & MASK32
+
+
+def bswap(emu: Emulator, ins: Instruction) -> None:
+    emu.regs[ins.reg] = int.from_bytes(emu.regs[ins.reg].to_bytes(4, 'little'), 'big')
+
+
+def setcc(emu: Emulator, ins: Instruction) -> None:
+    emu.set_rm(ins, 8, emu.condition(ins.opcode & 0xF))
+
+
+def lahf(emu: Emulator, ins: Instruction) -> None:
+    emu.set_reg8(4, emu.eflags() & 0xFF)
+
+
+def sahf(emu: Emulator, ins: Instruction) -> None:
+    emu.set_eflags((emu.eflags() & ~0xFF) | emu.get_reg8(4))
+
+
+def nop(emu: Emulator, ins: Instruction) -> None:
+    pass
+
+
+HANDLERS: dict[int, Callable[[Emulator, Instruction], None]] = {}
+for _op in range(8):
+    for _form in range(6):
+        HANDLERS[_op * 8 + _form] = alu_rm_reg
+for _opcode, _selector in SEGMENT_SELECTORS.items():
+    HANDLERS[_opcode] = lambda emu, ins, selector=_selector: emu.push(selector)
+    if _opcode != 0x0E:
+        HANDLERS[_opcode + 1] = lambda emu, ins: emu.pop() and None
+for _reg in range(8):
+    HANDLERS[0x40 + _reg] = inc_reg
+    HANDLERS[0x48 + _reg] = inc_reg
+    HANDLERS[0x50 + _reg] = lambda emu, ins: emu.push(emu.regs[ins.reg])
+    HANDLERS[0x58 + _reg] = lambda emu, ins: emu.regs.__setitem__(ins.reg, emu.pop())
+    HANDLERS[0x90 + _reg] = xchg_eax
+    HANDLERS[0xB0 + _reg] = lambda emu, ins: emu.set_reg8(ins.reg, ins.imm or 0)
+    HANDLERS[0xB8 + _reg] = lambda emu, ins: emu.regs.__setitem__(ins.reg, ins.imm or 0)
+    HANDLERS[0x0FC8 + _reg] = bswap
+for _cc in range(16):
+    HANDLERS[0x70 + _cc] = jump_if(lambda emu, ins: emu.condition(ins.opcode & 0xF))
+    HANDLERS[0x0F80 + _cc] = jump_if(lambda emu, ins: emu.condition(ins.opcode & 0xF))
+    HANDLERS[0x0F90 + _cc] = setcc
+HANDLERS.update(
+    {
+        0x60: pushad,
+        0x61: popad,
+        0x68: lambda emu, ins: emu.push(ins.imm or 0),
+        0x69: imul_imm,
+        0x6A: lambda emu, ins: emu.push((ins.imm or 0) & MASK32),
+        0x6B: imul_imm,
+        0x80: alu_group,
+        0x81: alu_group,
+        0x83: alu_group,
+        0x84: test_rm_reg,
+        0x85: test_rm_reg,
+        0x86: xchg,
+        0x87: xchg,
+        0x88: mov,
+        0x89: mov,
+        0x8A: mov,
+        0x8B: mov,
+        0x8D: lambda emu, ins: emu.regs.__setitem__(ins.reg, emu.address_of(ins)),
+        0x8F: lambda emu, ins: emu.set_rm(ins, 32, emu.pop()),
+        0x90: nop,
+        0x98: cwde,
+        0x99: cdq,
+        0x9C: lambda emu, ins: emu.push(emu.eflags()),
+        0x9D: lambda emu, ins: emu.set_eflags(emu.pop()),
+        0x9E: sahf,
+        0x9F: lahf,
+        0xA0: mov_moffs,
+        0xA1: mov_moffs,
+        0xA2: mov_moffs,
+        0xA3: mov_moffs,
+        0xA4: string_op,
+        0xA5: string_op,
+        0xA6: string_op,
+        0xA7: string_op,
+        0xA8: lambda emu, ins: emu.alu(4, emu.get_reg8(0), ins.imm or 0, 8) and None,
+        0xA9: lambda emu, ins: emu.alu(4, emu.regs[0], ins.imm or 0, 32) and None,
+        0xAA: string_op,
+        0xAB: string_op,
+        0xAC: string_op,
+        0xAD: string_op,
+        0xAE: string_op,
+        0xAF: string_op,
+        0xC0: group_shift,
+        0xC1: group_shift,
+        0xC2: ret,
+        0xC3: ret,
+        0xC6: lambda emu, ins: emu.set_rm(ins, 8, ins.imm or 0),
+        0xC7: lambda emu, ins: emu.set_rm(ins, 32, ins.imm or 0),
+        0xC9: leave,
+        0xCC: breakpoint_trap,
+        0xCD: interrupt,
+        0xD0: group_shift,
+        0xD1: group_shift,
+        0xD2: group_shift,
+        0xD3: group_shift,
+        0xE0: loop,
+        0xE1: loop,
+        0xE2: loop,
+        0xE3: loop,
+        0xE8: call,
+        0xE9: jump_if(lambda emu, ins: True),
+        0xEB: jump_if(lambda emu, ins: True),
+        0xF4: privileged,
+        0xF5: set_flag('cf', None),
+        0xF6: group_unary,
+        0xF7: group_unary,
+        0xF8: set_flag('cf', False),
+        0xF9: set_flag('cf', True),
+        0xFA: privileged,
+        0xFB: privileged,
+        0xFC: set_flag('df', False),
+        0xFD: set_flag('df', True),
+        0xFE: group_inc_dec,
+        0xFF: group_inc_dec,
+        0x0F1F: nop,
+        0x0FAF: imul_reg,
+        0x0FB6: movx,
+        0x0FB7: movx,
+        0x0FBE: movx,
+        0x0FBF: movx,
+    },
+)
+
+
+def handler_of(ins: Instruction) -> Callable[[Emulator, Instruction], None]:
+    """The handler executing `ins` (KeyError when the emulator does not know it)"""
+    if not FLAT_SEGMENT_PREFIXES.issuperset(ins.prefixes):
+        raise KeyError(ins.prefixes)
+    return HANDLERS[ins.opcode]
+
+
+def run(data: bytes, *, max_steps: int = 10_000, trace: bool = False) -> RunResult:
+    """Execute an ELF image and collect what it writes on stdout"""
+    return Emulator(data, max_steps=max_steps, trace=trace).run()
+
+
+def verify(data: bytes, *, max_steps: int = 10_000) -> Verdict:
+    """Same checks as test.sh: byte-wise palindrome, quine and exit code 0"""
+    palindrome = data == data[::-1]
+    try:
+        result = run(data, max_steps=max_steps)
+    except LoadError as e:
+        return Verdict(len(data), palindrome, False, None, 0, f'execve failed: {e}')
+    return Verdict(len(data), palindrome, result.stdout == data, result.exit_code, result.steps, result.fault)
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Check quinindrome candidates without executing them')
+    argparser.add_argument('files', nargs='+')
+    argparser.add_argument('--trace', action='store_true', help='print the executed instructions')
+    argparser.add_argument('--max-steps', type=int, default=10_000)
+    args = argparser.parse_args()
+
+    all_ok = True
+    for filename in args.files:
+        with open(filename, 'rb') as f:
+            data = f.read()
+        if args.trace:
+            print(f'=== TRACE OF {filename} ===')
+            try:
+                run(data, max_steps=args.max_steps, trace=True)
+            except LoadError as e:
+                print(f'  execve failed: {e}')
+        verdict = verify(data, max_steps=args.max_steps)
+        all_ok &= verdict.ok
+        print(f'{filename}:')
+        if verdict.error:
+            print(f'[-] {verdict.error}')
+        print(f'[{"+" if verdict.palindrome else "-"}] palindrome: {verdict.palindrome}')
+        print(f'[{"+" if verdict.quine else "-"}] quine: {verdict.quine}')
+        print(f'[{"+" if verdict.exit_code == 0 else "-"}] exit code: {verdict.exit_code}')
+        if verdict.ok:
+            print(f'[+] Your score: {verdict.size}')
+    sys.exit(0 if all_ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""Declarative templates of the headers laid in the quinindrome.
+
+A template is a size and fields. A field is fixed (a value, written with the
+endianness of the field), a placeholder group (one character per nibble in file
+order, hex digits standing for the nibbles that are fixed) or free. The bytes no
+field covers are free ('?'). `HeaderTemplate.pattern` writes the mask string of a
+template, some fields being overridden, and `HeaderTemplate.mask` compiles it into
+the `NibbleMask` the search works on.
+
+The placeholders of the quinindrome templates tie the fields together: e_entry and
+p_vaddr share bits 8-31 (IJKLMN), p_offset and p_vaddr bits 0-7 and 12-15 (GHI, the
+nibbles are in file order), and e_phoff is free (OPQRSTUV) until the search sets it.
+"""
+
+from typing import Literal, NamedTuple
+
+from nibble_mask import WILDCARD, NibbleMask
+
+
+class Field(NamedTuple):
+    name: str
+    offset: int  # Bytes from the start of the header
+    width: int  # Bytes
+    value: int | None = None  # Fixed value
+    placeholders: str = ''  # Placeholder group, one character per nibble in file order
+    endianness: Literal['little', 'big'] = 'little'
+
+    @property
+    def nibble_offset(self) -> int:
+        return 2 * self.offset
+
+    def encode(self, value: int) -> str:
+        """The nibbles of `value` in file order"""
+        return value.to_bytes(self.width, self.endianness).hex().upper()
+
+    def nibble_shifts(self) -> list[int]:
+        """Bit shifts of the nibbles of a value, in file order"""
+        byte_shifts = [8 * i for i in range(self.width)]
+        if self.endianness == 'big':
+            byte_shifts.reverse()
+        return [shift + 4 * (1 - nibble) for shift in byte_shifts for nibble in range(2)]
+
+    def pattern(self, override: str | int | None = None) -> str:
+        """The nibbles of the field: `override` (a pattern or a value), else its value,
+        its placeholders or wildcards"""
+        if isinstance(override, int):
+            return self.encode(override)
+        pattern = override or (
+            self.encode(self.value) if self.value is not None else self.placeholders or WILDCARD * 2 * self.width
+        )
+        if len(pattern) != 2 * self.width:
+            raise ValueError(f'{self.name} is {2 * self.width} nibbles wide, not {len(pattern)} ({pattern!r})')
+        return pattern
+
+
+class HeaderTemplate(NamedTuple):
+    name: str
+    size: int  # Bytes
+    fields: tuple[Field, ...]
+
+    def field(self, name: str) -> Field:
+        for field in self.fields:
+            if field.name == name:
+                return field
+        raise ValueError(f'{self.name} has no field {name!r}')
+
+    def pattern(self, **overrides: str | int) -> str:
+        """The mask string, the fields in `overrides` being replaced by a pattern or a value
+        (an empty pattern keeps the field of the template)"""
+        for name in overrides:
+            self.field(name)
+        nibbles = [WILDCARD] * 2 * self.size
+        covered = [False] * self.size
+        for field in self.fields:
+            if field.offset < 0 or field.offset + field.width > self.size:
+                raise ValueError(f'{field.name} does not fit in the {self.size} bytes of {self.name}')
+            if any(covered[field.offset : field.offset + field.width]):
+                raise ValueError(f'{field.name} overlaps another field of {self.name}')
+            covered[field.offset : field.offset + field.width] = [True] * field.width
+            nibbles[field.nibble_offset : field.nibble_offset + 2 * field.width] = field.pattern(
+                overrides.get(field.name)
+            )
+        return ''.join(nibbles)
+
+    def mask(self, **overrides: str | int) -> NibbleMask:
+        return NibbleMask.from_str(self.pattern(**overrides))
+
+    def read(self, s: str, name: str, offset: int = 0) -> str:
+        """The nibbles of a field in the mask string `s`, the header starting at nibble `offset`"""
+        field = self.field(name)
+        start = offset + field.nibble_offset
+        return s[start : start + 2 * field.width]
+
+
+# Only the fields the loader checks, or that the search ties together, are set
+ELF32_HEADER = HeaderTemplate(
+    'elf32',
+    48,  # e_shnum and e_shstrndx are free, the template stops before them
+    (
+        Field('ei_mag', 0, 4, 0x7F454C46, endianness='big'),
+        Field('e_type', 16, 2, 2),  # ET_EXEC
+        Field('e_machine', 18, 2, 3),  # EM_386
+        Field('e_entry', 24, 4, placeholders='04IJKLMN'),
+        Field('e_phoff', 28, 4, placeholders='OPQRSTUV'),
+        Field('e_phentsize', 42, 2, 0x20),
+        Field('e_phnum', 44, 2, 1),
+    ),
+)
+PHDR32 = HeaderTemplate(
+    'phdr32',
+    32,
+    (
+        Field('p_type', 0, 4, 1),  # PT_LOAD
+        Field('p_offset', 4, 4, placeholders='GHI00000'),
+        Field('p_vaddr', 8, 4, placeholders='GHIJKLMN'),
+        # Free, but the loader checks them
+        Field('p_filesz', 16, 4),
+        Field('p_memsz', 20, 4),
+        Field('p_flags', 24, 4),
+    ),
+)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""Branch and bound search of the smallest quinindrome layout.
+
+A layout is the size of the palindrome, the file offset of the entry point, the
+offset of the program header (e_phoff) and optionally the org (the address of the
+first byte of the file, which makes e_entry and p_vaddr concrete). The search tree
+is explored size first (so the first size with a layout is the smallest one), then
+e_phoff, then entry. A whole subtree is cut as soon as its masks conflict (the
+e_phoff nodes lay the program header with any entry byte), its entry byte is no
+longer free, or the upper bound of its free bytes cannot hold the payload or beat
+the best layout of the size.
+
+Unlike `symmetries.search` the ELF header is padded with wildcards, so the sizes are
+not limited by the length of the header template.
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+from typing import Any, NamedTuple
+
+from header_templates import Field
+from nibble_mask import NibbleMask, is_placeholder
+from symmetries import (
+    E_ENTRY,
+    E_PHOFF,
+    ELF_HEADER,
+    PROGRAM_HEADER,
+    Symmetry,
+    close,
+    e_phoff_pattern,
+    elf_nibble_mask,
+    first_half_wildcards,
+    get_palindrome,
+    pe_nibble_mask,
+    pe_offsets,
+    print_symmetry,
+    refined_score_bound,
+    usable_score,
+    valid_intersection,
+)
+
+MAX_ENTRY = 0x100  # e_entry only sets the low byte of the entry point
+
+
+class Layout(NamedTuple):
+    size: int  # Bytes, the axis of the palindrome
+    entry: int  # File offset of the entry point
+    e_phoff: int
+    org: int | None  # None when the placeholders of e_entry and p_vaddr are left free
+    symmetry: Symmetry
+
+    @property
+    def free(self) -> int:
+        """Usable bytes of the mask"""
+        return self.symmetry.score // 2
+
+    def fields(self) -> dict[str, str]:
+        """The address fields as they are in the mask (the templates of the layouts pin
+        I, which `reconstruct_placeholders` does not know)"""
+        elf = self.symmetry.elf
+        phdr = 2 * self.e_phoff
+        return {
+            'e_entry': ELF_HEADER.read(elf, 'e_entry'),
+            'p_offset': PROGRAM_HEADER.read(elf, 'p_offset', phdr),
+            'p_vadd': PROGRAM_HEADER.read(elf, 'p_vaddr', phdr),
+        }
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'size': self.size,
+            'entry': self.entry,
+            'e_phoff': self.e_phoff,
+            'org': self.org,
+            'free': self.free,
+            **self.symmetry.as_dict(),
+            'reconstructed': self.fields(),
+        }
+
+
+def header_fields(entry: int | None, org: int | None) -> tuple[dict[str, str], dict[str, str]]:
+    """Fields of the ELF and program header templates for an entry point at file offset
+    `entry` (None: any). I is 0, so that e_entry - p_vaddr + p_offset is `entry`."""
+    e_entry = ELF_HEADER.field('e_entry')
+    pinned = {'I': '0'}
+    if org is not None:
+        # The org sets the placeholders of the upper bytes of e_entry (and so of p_vaddr)
+        digits = zip(e_entry.placeholders, e_entry.encode(org), strict=True)
+        pinned.update((char, digit) for char, digit in digits if is_placeholder(char))
+
+    def pin(field: Field) -> str:
+        return ''.join(pinned.get(char, char) for char in field.placeholders)
+
+    entry_byte = '??' if entry is None else f'{entry:02X}'
+    return {'e_entry': entry_byte + pin(e_entry)[2:]}, {
+        'p_offset': pin(PROGRAM_HEADER.field('p_offset')),
+        'p_vadd': pin(PROGRAM_HEADER.field('p_vaddr')),
+    }
+
+
+def closed_elf_mask(size: int, elf_fields: dict[str, str]) -> tuple[NibbleMask | None, dict[str, str]]:
+    """The ELF header with `elf_fields`, padded with wildcards and made a palindrome of `size` bytes"""
+    elf = elf_nibble_mask(**elf_fields)
+    if 2 * size > elf.size:
+        elf += NibbleMask.from_str('?' * (2 * size - elf.size))
+    return valid_intersection(get_palindrome(elf, size), elf)
+
+
+def is_free_byte(mask: NibbleMask, offset: int) -> bool:
+    return mask.window(2 * offset, 2).wildcard_bits == 0xFF
+
+
+def size_lower_bound(need: int) -> int:
+    """Smallest size whose first half could hold `need` free bytes next to the ELF
+    header (admissible: the palindrome and the program header only take more room)"""
+    elf = elf_nibble_mask()
+    letters = len(elf.placeholders() | pe_nibble_mask().placeholders())
+    size = elf.size // 2  # Smaller palindromes cannot hold the header
+    while (size - elf.window(0, min(size, elf.size)).known.bit_count() // 4 + letters) // 2 < need:
+        size += 1
+    return size
+
+
+def smallest_layout(
+    need: int,
+    *,
+    min_size: int = 0,
+    max_size: int = 256,
+    org: int | None = None,
+    stats: Counter[str] | None = None,
+) -> Layout | None:
+    """The layout of the smallest size below `max_size` with at least `need` free bytes,
+    the one with the most free bytes among those of that size (None if there are none).
+    `stats` counts the nodes visited and pruned at each level."""
+    if org is not None and org % 0x10000:
+        raise ValueError(f'org {org:#x} is not a multiple of 0x10000, which the header template needs')
+    stats = Counter() if stats is None else stats
+    elf_fields, pe_fields = header_fields(None, org)
+    for size in range(max(min_size, size_lower_bound(need)), max_size):
+        stats['size'] += 1
+        best: Layout | None = None
+        general, res0 = closed_elf_mask(size, elf_fields)
+        if general is None or refined_score_bound(general) // 2 < need:
+            stats['size pruned'] += 1
+            continue
+        # Each node refines the closed mask of its parent with its own field only
+        for offset in pe_offsets(size):
+            # The bounds only decrease down the tree, so a node whose bound cannot
+            # beat the best layout of the size is cut with its subtree
+            stats['e_phoff'] += 1
+            e_phoff = NibbleMask.from_str(e_phoff_pattern(offset))
+            with_phoff, res1 = close(general, [(E_PHOFF, e_phoff)])
+            if with_phoff is None or refined_score_bound(with_phoff) // 2 < need:
+                stats['e_phoff pruned'] += 1
+                continue
+            # Whatever the entry, the program header has to fit
+            any_entry, res2 = valid_intersection(with_phoff, pe_nibble_mask(**pe_fields), offset)
+            floor = need if best is None else best.free + 1
+            if any_entry is None or (first_half_wildcards(any_entry) + len(any_entry.placeholders())) // 2 < floor:
+                stats['e_phoff pruned'] += 1
+                continue
+            for entry in range(min(size, MAX_ENTRY)):
+                if not is_free_byte(any_entry, entry):
+                    continue
+                stats['entry'] += 1
+                mask, res3 = close(any_entry, [(E_ENTRY, NibbleMask.from_str(f'{entry:02X}'))])
+                if mask is None or not is_free_byte(mask, entry):
+                    stats['entry pruned'] += 1
+                    continue
+                resolutions = {**res0, **res1, **res2, **res3}
+                symmetry = Symmetry(size, offset, str(mask), resolutions, usable_score(mask))
+                if symmetry.score // 2 >= (need if best is None else best.free + 1):
+                    stats['layout'] += 1
+                    best = Layout(size, entry, offset // 2, org, symmetry)
+        if best is not None:
+            return best
+    return None
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Find the smallest quinindrome layout with enough free bytes')
+    argparser.add_argument('need', type=int, help='free bytes the payload needs')
+    argparser.add_argument('--min-size', type=int, default=0)
+    argparser.add_argument('--max-size', type=int, default=256, help='excluded')
+    argparser.add_argument('--org', type=lambda s: int(s, 0), help='load address, e.g. 0x0D900000 (default: free)')
+    argparser.add_argument('--jsonl', action='store_true', help='print the layout as a JSON line')
+    args = argparser.parse_args()
+
+    stats: Counter[str] = Counter()
+    try:
+        layout = smallest_layout(args.need, min_size=args.min_size, max_size=args.max_size, org=args.org, stats=stats)
+    except ValueError as e:
+        argparser.error(str(e))
+    print(', '.join(f'{count} {name}' for name, count in stats.items()), file=sys.stderr)
+    if layout is None:
+        print(f'No layout below {args.max_size} bytes with {args.need} free bytes', file=sys.stderr)
+        sys.exit(1)
+    if args.jsonl:
+        print(json.dumps(layout.as_dict()))
+    else:
+        print(f'Layout of {layout.size} bytes: entry {layout.entry}, e_phoff {layout.e_phoff}, free {layout.free}')
+        print(f'  - Fields: {layout.fields()}')
+        print_symmetry(layout.symmetry)
+
+
+if __name__ == '__main__':
+    main()
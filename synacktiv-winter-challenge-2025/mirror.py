@@ -1,13 +1,170 @@
 #!/usr/bin/env python3
+"""Build and check byte-wise palindromes.
 
-with open('quiny', 'rb') as f:
-    data = f.read()
+The mirrored image is streamed: the data is written as is, then its reversed
+copy in fixed-size chunks, so building it only ever holds one reversed chunk in
+memory (the inputs are mmapped). The axis of the palindrome is either 'odd'
+(the last byte of the data is the middle of the image, which is what the
+quinindromes use) or 'even' (the data is followed by its whole reverse).
+"""
 
-# Create the full palindrome: Data + Reverse(Data)
-palindrome = data + data[:-1][::-1]
+import argparse
+import mmap
+import os
+import shutil
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager, suppress
+from typing import BinaryIO
 
-# Save the final executable
-with open('quinindrome', 'wb') as f:
-    f.write(palindrome)
+CHUNK_SIZE = 1 << 16
+AXES = ('odd', 'even')
 
-print(f'Created quinindrome! Size: {len(palindrome)} bytes')
+
+def mirrored_size(size: int, axis: str = 'odd') -> int:
+    if axis not in AXES:
+        raise ValueError(f'unknown axis {axis!r} (expected one of {", ".join(AXES)})')
+    return 2 * size - 1 if axis == 'odd' and size else 2 * size
+
+
+def reversed_chunks(data: bytes | memoryview, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+    """The reverse of `data`, `chunk_size` bytes at a time"""
+    view = memoryview(data)
+    end = len(view)
+    while end > 0:
+        start = max(0, end - chunk_size)
+        yield view[start:end].tobytes()[::-1]
+        end = start
+
+
+def write_mirrored(
+    data: bytes | memoryview,
+    out: BinaryIO,
+    axis: str = 'odd',
+    chunk_size: int = CHUNK_SIZE,
+) -> int:
+    """Write the palindrome built from `data` to `out`, return its size"""
+    size = mirrored_size(len(data), axis)
+    view = memoryview(data)
+    out.write(view)
+    # With an odd axis the last byte is not repeated
+    for chunk in reversed_chunks(view[:-1] if axis == 'odd' else view, chunk_size):
+        out.write(chunk)
+    return size
+
+
+def mirror(data: bytes, axis: str = 'odd') -> bytes:
+    """Create the full palindrome: Data + Reverse(Data), the last byte is the axis by default"""
+    mirrored_size(len(data), axis)  # Check the axis
+    return data + (data[:-1] if axis == 'odd' else data)[::-1]
+
+
+def first_mismatch(data: bytes | memoryview, chunk_size: int = CHUNK_SIZE) -> int | None:
+    """Offset of the first byte that differs from its mirror (None for a palindrome).
+
+    Both halves are compared one chunk at a time from the outside in, stopping at
+    the first chunk that differs."""
+    view = memoryview(data)
+    size = len(view)
+    half = size // 2
+    for offset in range(0, half, chunk_size):
+        length = min(chunk_size, half - offset)
+        front = view[offset : offset + length]
+        back = view[size - offset - length : size - offset].tobytes()[::-1]
+        if front != back:
+            return offset + next(i for i in range(length) if front[i] != back[i])
+    return None
+
+
+def is_palindrome(data: bytes | memoryview, chunk_size: int = CHUNK_SIZE) -> bool:
+    return first_mismatch(data, chunk_size) is None
+
+
+@contextmanager
+def mapped(filename: str) -> Iterator[memoryview]:
+    """Read-only view of a whole file, through mmap (empty files cannot be mapped)"""
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield memoryview(b'')
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+            yield view
+
+
+def mirror_file(source: str, destination: str, axis: str = 'odd', chunk_size: int = CHUNK_SIZE) -> int:
+    """Write the palindrome built from the file `source` to `destination`, return its size.
+
+    The palindrome goes to a temporary file next to `destination` that then replaces
+    it: truncating `destination` in place would pull the mapped source from under
+    the mmap when both are the same file."""
+    directory, name = os.path.split(os.path.abspath(destination))
+    temporary = os.path.join(directory, f'.{name}.{os.getpid()}.tmp')
+    try:
+        with mapped(source) as data, open(temporary, 'xb') as out:
+            size = write_mirrored(data, out, axis, chunk_size)
+        if os.path.exists(destination):
+            shutil.copymode(destination, temporary)
+        os.replace(temporary, destination)
+    except BaseException:
+        with suppress(FileNotFoundError):
+            os.remove(temporary)
+        raise
+    return size
+
+
+def check_file(filename: str, chunk_size: int = CHUNK_SIZE) -> int | None:
+    """Offset of the first byte of the file that differs from its mirror (None for a palindrome)"""
+    with mapped(filename) as data:
+        return first_mismatch(data, chunk_size)
+
+
+def output_path(source: str, out_dir: str) -> str:
+    return os.path.join(out_dir, f'{os.path.splitext(os.path.basename(source))[0]}.quinindrome')
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Mirror files into palindromes, or check that files are ones')
+    argparser.add_argument('inputs', nargs='*', default=['quiny'], help='default: quiny')
+    argparser.add_argument('-o', '--output', help='output of a single input (default: quinindrome)')
+    argparser.add_argument('--out-dir', help='write each input to <out-dir>/<stem>.quinindrome')
+    argparser.add_argument('--axis', choices=AXES, default='odd', help='odd: the last byte is the middle')
+    argparser.add_argument('--check', action='store_true', help='only check that the inputs are palindromes')
+    argparser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = argparser.parse_args()
+    if args.chunk_size <= 0:
+        argparser.error('--chunk-size must be positive')
+    if args.output and len(args.inputs) > 1:
+        argparser.error('--output needs a single input, use --out-dir')
+
+    if args.out_dir and not args.check:
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    failed = False
+    for source in args.inputs:
+        try:
+            if args.check:
+                mismatch = check_file(source, args.chunk_size)
+                if mismatch is None:
+                    print(f'{source}: palindrome')
+                else:
+                    print(f'{source}: not a palindrome (byte {mismatch} differs from its mirror)')
+                    failed = True
+                continue
+            if args.out_dir is None and len(args.inputs) == 1:
+                destination = args.output or 'quinindrome'
+            else:
+                destination = output_path(source, args.out_dir or '.')
+            size = mirror_file(source, destination, args.axis, args.chunk_size)
+        except OSError as e:
+            print(f'{source}: {e}', file=sys.stderr)
+            failed = True
+            continue
+        if len(args.inputs) == 1:
+            print(f'Created {destination}! Size: {size} bytes')
+        else:
+            print(f'{source} -> {destination}: {size} bytes')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
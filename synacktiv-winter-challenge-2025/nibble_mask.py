@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""Bit-packed hex masks for the symmetry search of symmetries.py.
+
+A mask is a string of nibbles, each one a known hex digit, a '?' wildcard or a
+placeholder (any other character, e.g. the G..Z/@ letters of the header
+templates: all the occurrences of a placeholder stand for the same unknown
+nibble). `NibbleMask` holds them as Python ints with 4 bits per nibble, the
+first nibble being the most significant one:
+- `known` has 0xF on the known nibbles and `value` their digits,
+- the placeholders are numbered (`placeholder_id`) and their ids are bit-sliced
+  over `planes`: plane j has 0xF on the nibbles whose id has its bit j set.
+Slicing, concatenating, reversing the byte order or intersecting two masks is
+then a fixed number of operations on whole ints, whatever the length of the
+mask and the number of placeholders, instead of rebuilding strings one
+character at a time.
+"""
+
+from collections.abc import Callable, Iterator
+from typing import Any
+
+HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+WILDCARD = '?'
+ID_BITS = 6  # Up to 63 distinct placeholders
+
+# Placeholder characters by id (0 is "no placeholder")
+PLACEHOLDERS: list[str] = ['']
+PLACEHOLDER_IDS: dict[str, int] = {}
+
+
+def placeholder_id(char: str) -> int:
+    """Id of a placeholder character, allocated on first use"""
+    pid = PLACEHOLDER_IDS.get(char)
+    if pid is None:
+        if not is_placeholder(char) or len(char) != 1:
+            raise ValueError(f'{char!r} cannot be a placeholder')
+        pid = len(PLACEHOLDERS)
+        if pid >= 1 << ID_BITS:
+            raise ValueError(f'more than {(1 << ID_BITS) - 1} placeholders')
+        PLACEHOLDERS.append(char)
+        PLACEHOLDER_IDS[char] = pid
+    return pid
+
+
+def is_placeholder(char: str) -> bool:
+    return char not in HEX_DIGITS and char != WILDCARD
+
+
+class TranslationTable(dict):
+    """`str.translate` table filled on demand with `replacement(char)`"""
+
+    def __init__(self, replacement: Callable[[str], str]) -> None:
+        super().__init__()
+        self.replacement = replacement
+
+    def __missing__(self, code: int) -> str:
+        self[code] = self.replacement(chr(code))
+        return self[code]
+
+
+def plane_table(j: int) -> TranslationTable:
+    """'F' for the placeholders whose id has its bit j set"""
+    return TranslationTable(lambda char: 'F' if is_placeholder(char) and placeholder_id(char) >> j & 1 else '0')
+
+
+KNOWN_TABLE = TranslationTable(lambda char: 'F' if char in HEX_DIGITS else '0')
+VALUE_TABLE = TranslationTable(lambda char: char if char in HEX_DIGITS else '0')
+PLANE_TABLES = [plane_table(j) for j in range(ID_BITS)]
+
+
+def nibble_positions(bits: int, size: int) -> Iterator[int]:
+    """Indexes (from the start of a mask of `size` nibbles) of the nibbles set in `bits`, in increasing order"""
+    while bits:
+        nibble = (bits.bit_length() - 1) // 4
+        yield size - 1 - nibble
+        bits &= (1 << 4 * nibble) - 1
+
+
+class NibbleMask:
+    """Hex mask of `size` nibbles (see the module docstring), meant to be immutable"""
+
+    __slots__ = ('known', 'planes', 'size', 'value')
+
+    def __init__(self, size: int, known: int = 0, value: int = 0, planes: tuple[int, ...] = (0,) * ID_BITS) -> None:
+        self.size = size
+        self.known = known
+        self.value = value
+        self.planes = planes
+
+    @classmethod
+    def from_str(cls, s: str) -> 'NibbleMask':
+        if not s:
+            return cls(0)
+        known = int(s.translate(KNOWN_TABLE), 16)
+        value = int(s.translate(VALUE_TABLE), 16)
+        return cls(len(s), known, value, tuple(int(s.translate(table), 16) for table in PLANE_TABLES))
+
+    def __str__(self) -> str:
+        if not self.size:
+            return ''
+        chars = list(f'{self.value:0{self.size}X}')
+        for i in nibble_positions(self.wildcard_bits, self.size):
+            chars[i] = WILDCARD
+        holes = self.hole_bits
+        if holes:
+            # The ids of all the nibbles at once, their low and high bits in two hex strings
+            repeat = self.full // 0xF
+            low = high = 0
+            for j, plane in enumerate(self.planes):
+                if j < 4:
+                    low |= (plane & repeat) << j
+                else:
+                    high |= (plane & repeat) << j - 4
+            low_ids, high_ids = f'{low:0{self.size}X}', f'{high:0{self.size}X}'
+            for i in nibble_positions(holes, self.size):
+                chars[i] = PLACEHOLDERS[int(low_ids[i], 16) | int(high_ids[i], 16) << 4]
+        return ''.join(chars)
+
+    def __repr__(self) -> str:
+        return f'NibbleMask({str(self)!r})'
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, NibbleMask):
+            return NotImplemented
+        return (self.size, self.known, self.value, self.planes) == (other.size, other.known, other.value, other.planes)
+
+    def __hash__(self) -> int:
+        return hash((self.size, self.known, self.value, self.planes))
+
+    def __add__(self, other: 'NibbleMask') -> 'NibbleMask':
+        """Concatenation"""
+        shift = 4 * other.size
+        return NibbleMask(
+            self.size + other.size,
+            self.known << shift | other.known,
+            self.value << shift | other.value,
+            tuple(plane << shift | other_plane for plane, other_plane in zip(self.planes, other.planes, strict=True)),
+        )
+
+    @property
+    def full(self) -> int:
+        """0xF on every nibble"""
+        return (1 << 4 * self.size) - 1
+
+    @property
+    def hole_bits(self) -> int:
+        """0xF on the nibbles holding a placeholder"""
+        bits = 0
+        for plane in self.planes:
+            bits |= plane
+        return bits
+
+    def placeholder_bits(self, pid: int) -> int:
+        """0xF on the nibbles holding the placeholder `pid`"""
+        bits = self.hole_bits
+        for j, plane in enumerate(self.planes):
+            bits &= plane if pid >> j & 1 else ~plane
+        return bits
+
+    def id_at(self, i: int) -> int:
+        """Placeholder id of nibble `i` (0 when it is not a placeholder)"""
+        nibble = 4 * (self.size - 1 - i)
+        return sum(1 << j for j, plane in enumerate(self.planes) if plane >> nibble & 1)
+
+    def char_at(self, i: int) -> str:
+        nibble = 4 * (self.size - 1 - i)
+        if self.known >> nibble & 1:
+            return f'{self.value >> nibble & 0xF:X}'
+        pid = self.id_at(i)
+        return PLACEHOLDERS[pid] if pid else WILDCARD
+
+    @property
+    def wildcard_bits(self) -> int:
+        """0xF on the nibbles holding a wildcard"""
+        return self.full & ~(self.known | self.hole_bits)
+
+    def placeholders(self) -> set[str]:
+        """The distinct placeholders, peeled one class of nibbles at a time"""
+        chars = set()
+        holes = self.hole_bits
+        while holes:
+            pid = self.id_at(self.size - 1 - (holes.bit_length() - 1) // 4)
+            chars.add(PLACEHOLDERS[pid])
+            holes &= ~self.placeholder_bits(pid)
+        return chars
+
+    def window(self, offset: int, length: int) -> 'NibbleMask':
+        """The `length` nibbles starting at nibble `offset`"""
+        if offset < 0 or length < 0 or offset + length > self.size:
+            raise ValueError(f'nibbles [{offset}:{offset + length}] are not in a mask of {self.size} nibbles')
+        shift = 4 * (self.size - offset - length)
+        bits = (1 << 4 * length) - 1
+        return NibbleMask(
+            length,
+            self.known >> shift & bits,
+            self.value >> shift & bits,
+            tuple(plane >> shift & bits for plane in self.planes),
+        )
+
+    def byte_reversed(self) -> 'NibbleMask':
+        """The bytes in reverse order (the two nibbles of a byte stay in order)"""
+        if self.size % 2:
+            raise ValueError(f'a mask of {self.size} nibbles does not hold whole bytes')
+        length = self.size // 2
+        return NibbleMask(
+            self.size,
+            int.from_bytes(self.known.to_bytes(length, 'big'), 'little'),
+            int.from_bytes(self.value.to_bytes(length, 'big'), 'little'),
+            tuple(int.from_bytes(plane.to_bytes(length, 'big'), 'little') for plane in self.planes),
+        )
+
+    def substitute(self, substitutions: dict[str, str]) -> 'NibbleMask':
+        """Replace the placeholders by hex digits or other placeholders (the targets are
+        not substituted again)"""
+        known, value, planes = self.known, self.value, list(self.planes)
+        repeat = self.full // 0xF  # 0x1 on every nibble
+        moved = []
+        for char, target in substitutions.items():
+            bits = self.placeholder_bits(placeholder_id(char))
+            if not bits:
+                continue
+            for j in range(ID_BITS):
+                planes[j] &= ~bits
+            if target in HEX_DIGITS:
+                known |= bits
+                value |= bits & int(target, 16) * repeat
+            else:
+                moved.append((bits, placeholder_id(target)))
+        for bits, pid in moved:
+            for j in range(ID_BITS):
+                if pid >> j & 1:
+                    planes[j] |= bits
+        return NibbleMask(self.size, known, value, tuple(planes))
+
+    def first_nibble(self, char: str) -> int | None:
+        """Index of the first nibble holding the placeholder `char` (None when it is absent)"""
+        pid = PLACEHOLDER_IDS.get(char)
+        bits = self.placeholder_bits(pid) if pid else 0
+        return self.size - 1 - (bits.bit_length() - 1) // 4 if bits else None
+
+    def placed(self, offset: int, size: int) -> 'NibbleMask':
+        """This mask laid at nibble `offset` of a mask of `size` nibbles (wildcards elsewhere)"""
+        if offset < 0 or offset + self.size > size:
+            raise ValueError(f'a mask of {self.size} nibbles does not fit at {offset} in {size} nibbles')
+        shift = 4 * (size - offset - self.size)
+        return NibbleMask(
+            size,
+            self.known << shift,
+            self.value << shift,
+            tuple(plane << shift for plane in self.planes),
+        )
+
+    def merge(self, other: 'NibbleMask', classes: 'PlaceholderClasses') -> 'NibbleMask | None':
+        """Intersection with a mask of the same size: the wildcards take the nibble of
+        `other`, and the placeholders meeting a digit or another placeholder are
+        bound or merged in `classes` (they are not substituted here). None when two
+        different digits meet, or a placeholder meets two different digits."""
+        if self.size != other.size:
+            raise ValueError(f'cannot merge masks of {self.size} and {other.size} nibbles')
+        if (self.value ^ other.value) & self.known & other.known:
+            return None
+
+        # Nibbles where a placeholder meets a digit or a different placeholder
+        holes, other_holes = self.hole_bits, other.hole_bits
+        different = 0
+        for plane, other_plane in zip(self.planes, other.planes, strict=True):
+            different |= plane ^ other_plane
+        clashes = (holes & other.known) | (other_holes & self.known) | (holes & other_holes & different)
+        for i in nibble_positions(clashes, self.size):
+            char, other_char = self.char_at(i), other.char_at(i)
+            if char in HEX_DIGITS:
+                ok = classes.bind(other_char, char)
+            elif other_char in HEX_DIGITS:
+                ok = classes.bind(char, other_char)
+            else:
+                ok = classes.union(char, other_char)
+            if not ok:
+                return None
+
+        free = self.full & ~(self.known | holes)
+        return NibbleMask(
+            self.size,
+            self.known | other.known & free,
+            self.value | other.value & free,
+            tuple(plane | other_plane & free for plane, other_plane in zip(self.planes, other.planes, strict=True)),
+        )
+
+
+class PlaceholderClasses:
+    """Equivalence classes of placeholders: a union-find with path compression and
+    union by size, each class being possibly bound to a hex digit.
+
+    An unbound class is named after its member with the lowest `priority`."""
+
+    def __init__(self, priority: Callable[[str], Any] | None = None) -> None:
+        self.parent: dict[str, str] = {}
+        self.size: dict[str, int] = {}
+        self.digit: dict[str, str] = {}  # Root -> digit of its class
+        self.name: dict[str, str] = {}  # Root -> name of its class
+        self.priority = priority or (lambda char: char)
+
+    @classmethod
+    def from_resolutions(cls, resolutions: dict[str, str]) -> 'PlaceholderClasses':
+        """Classes of resolutions (placeholder -> digit or placeholder), chains included,
+        named after the placeholders that are not resolved"""
+        classes = cls(lambda char: char in resolutions)
+        for char, target in resolutions.items():
+            if target in HEX_DIGITS:
+                classes.bind(char, target)
+            else:
+                classes.union(target, char)
+        return classes
+
+    def add(self, char: str) -> None:
+        if char not in self.parent:
+            self.parent[char] = char
+            self.size[char] = 1
+            self.name[char] = char
+
+    def find(self, char: str) -> str:
+        self.add(char)
+        root = char
+        while self.parent[root] != root:
+            root = self.parent[root]
+        while self.parent[char] != root:
+            self.parent[char], char = root, self.parent[char]
+        return root
+
+    def union(self, a: str, b: str) -> bool:
+        """Merge the classes of `a` and `b`, False when they are bound to different digits"""
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return True
+        digit_a, digit_b = self.digit.get(root_a), self.digit.get(root_b)
+        if digit_a is not None and digit_b is not None and digit_a != digit_b:
+            return False
+        if self.size[root_a] < self.size[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        self.size[root_a] += self.size[root_b]
+        self.name[root_a] = min(self.name[root_a], self.name.pop(root_b), key=self.priority)
+        digit = self.digit.pop(root_b, None)
+        if digit is not None:
+            self.digit[root_a] = digit
+        return True
+
+    def bind(self, char: str, digit: str) -> bool:
+        """Bind the class of `char` to `digit`, False when it is bound to another one"""
+        root = self.find(char)
+        digit = digit.upper()
+        bound = self.digit.setdefault(root, digit)
+        return bound == digit
+
+    def resolve(self, char: str) -> str:
+        """Digit of the class of `char`, or its name when it is not bound"""
+        root = self.find(char)
+        return self.digit.get(root, self.name[root])
+
+    def resolutions(self) -> dict[str, str]:
+        """Placeholder -> digit or placeholder, for the placeholders that do not stand for themselves"""
+        resolved = {char: self.resolve(char) for char in self.parent}
+        return {char: target for char, target in resolved.items() if target != char}
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""Persistent, content-addressed cache for the elf_parser reports.
+
+Entries are keyed by the SHA-256 of the file bytes and of the report options,
+stored as one JSON file each and evicted least recently used first (the mtime of
+an entry is bumped on every hit) once the cache grows past `max_bytes`. Each
+entry also records which byte ranges of the file every report section read, so
+`ElfParser.cached_report` can reuse the sections of the previous version of a
+file whose bytes did not change (e.g. the headers when only the code changed).
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from collections.abc import Iterable
+from typing import Any
+
+CACHE_VERSION = 1  # Bump when the layout of the reports changes
+CHUNK_SIZE = 1 << 20
+
+
+def default_cache_dir() -> str:
+    return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'quinindrome')
+
+
+def file_digest(filename: str) -> str:
+    """SHA-256 of the content of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def merge_ranges(ranges: Iterable[tuple[int, int]]) -> list[list[int]]:
+    """Sorted, coalesced [offset, length] ranges"""
+    merged: list[list[int]] = []
+    for offset, length in sorted(ranges):
+        if length <= 0:
+            continue
+        if merged and offset <= merged[-1][0] + merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], offset + length - merged[-1][0])
+        else:
+            merged.append([offset, length])
+    return merged
+
+
+class ReportCache:
+    def __init__(self, directory: str | None = None, max_bytes: int = 64 << 20) -> None:
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(os.path.join(self.directory, 'paths'), exist_ok=True)
+
+    @staticmethod
+    def key(digest: str, options: dict[str, Any]) -> str:
+        options_digest = hashlib.sha256(
+            json.dumps([CACHE_VERSION, options], sort_keys=True).encode(),
+        ).hexdigest()
+        return f'{digest}-{options_digest[:16]}'
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.directory, f'{key}.json')
+
+    def path_pointer(self, filename: str, options: dict[str, Any]) -> str:
+        """File holding the key of the last entry stored for `filename`"""
+        path_digest = hashlib.sha256(os.path.realpath(filename).encode()).hexdigest()
+        return os.path.join(self.directory, 'paths', self.key(path_digest, options))
+
+    def get(self, key: str) -> dict[str, Any] | None:
+        path = self.entry_path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)  # Most recently used
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry
+
+    def previous(self, filename: str, options: dict[str, Any]) -> dict[str, Any] | None:
+        """Last entry stored for `filename` (for partial reuse when it changed)"""
+        try:
+            with open(self.path_pointer(filename, options)) as f:
+                key = f.read().strip()
+        except OSError:
+            return None
+        try:
+            with open(self.entry_path(key)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, entry: dict[str, Any], filename: str, options: dict[str, Any]) -> None:
+        self.write_atomic(self.entry_path(key), json.dumps(entry, separators=(',', ':')))
+        self.write_atomic(self.path_pointer(filename, options), key)
+        self.evict()
+
+    def write_atomic(self, path: str, content: str) -> None:
+        """Concurrent runs never see a partially written entry"""
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def evict(self) -> None:
+        """Remove the least recently used entries and path pointers until the cache fits
+        in max_bytes"""
+        entries = []
+        total = 0
+        for dir_entry in self.files():
+            stat = dir_entry.stat()
+            entries.append((stat.st_mtime, stat.st_size, dir_entry.path))
+            total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _mtime, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def files(self) -> list[os.DirEntry[str]]:
+        """The entries and the path pointers (not the temporary files being written)"""
+        files = []
+        for directory in (self.directory, os.path.join(self.directory, 'paths')):
+            with os.scandir(directory) as it:
+                files += [e for e in it if e.is_file() and not e.name.endswith('.tmp')]
+        return files
+
+    def clear(self) -> None:
+        for directory in (self.directory, os.path.join(self.directory, 'paths')):
+            with os.scandir(directory) as it:
+                for dir_entry in it:
+                    if dir_entry.is_file():
+                        os.remove(dir_entry.path)
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Inspect or clear the elf_parser report cache')
+    argparser.add_argument('--cache-dir', default=None, help=f'default: {default_cache_dir()}')
+    argparser.add_argument('--clear', action='store_true', help='remove every entry')
+    args = argparser.parse_args()
+
+    cache = ReportCache(args.cache_dir)
+    if args.clear:
+        cache.clear()
+    with os.scandir(cache.directory) as it:
+        sizes = [e.stat().st_size for e in it if e.is_file() and e.name.endswith('.json')]
+    print(f'{cache.directory}: {len(sizes)} entries, {sum(sizes)} bytes (max {cache.max_bytes})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""Rendering of the reports built by `ElfParser.report`.
+
+A report is plain structured data (dicts, lists, ints and strings) so it can be
+rendered as the human readable text of elf_parser, as one JSON line per file or
+as CSV rows (file, field, value). Everything goes through a `ReportWriter` that
+hands the text to the stream in large chunks instead of one write per line.
+"""
+
+import csv
+import json
+from collections.abc import Callable, Iterator
+from types import TracebackType
+from typing import Any, TextIO
+
+Report = dict[str, Any]
+
+
+class ReportWriter:
+    """Accumulate the rendered text and write it to `stream` in large chunks"""
+
+    def __init__(self, stream: TextIO, buffer_size: int = 1 << 16) -> None:
+        self.stream = stream
+        self.buffer_size = buffer_size
+        self.parts: list[str] = []
+        self.pending = 0
+
+    def __enter__(self) -> 'ReportWriter':
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.flush()
+
+    def write(self, text: str) -> int:
+        self.parts.append(text)
+        self.pending += len(text)
+        if self.pending >= self.buffer_size:
+            self.flush()
+        return len(text)
+
+    def line(self, text: str = '') -> None:
+        self.write(text + '\n')
+
+    def flush(self) -> None:
+        if self.parts:
+            self.stream.write(''.join(self.parts))
+            self.parts.clear()
+            self.pending = 0
+        self.stream.flush()
+
+
+def format_instruction(instruction: dict[str, Any]) -> str:
+    """Same layout as `str(Instruction)`, from the dict of `Instruction.as_dict`"""
+    raw = bytes.fromhex(instruction['bytes']).hex(' ')
+    return f'0x{instruction["address"]:08x}: {raw:<17} {instruction["text"]}'
+
+
+def cfg_lines(cfg: dict[str, Any]) -> Iterator[str]:
+    """Text listing of the basic blocks of `ControlFlowGraph.as_dict`"""
+    unresolved = set(cfg['unresolved'])
+    for block in cfg['blocks']:
+        yield f'  block 0x{block["start"]:x}:'
+        for instruction in block['instructions']:
+            yield f'    {format_instruction(instruction)}'
+        for edge in block['successors']:
+            note = ' (not in file)' if edge['target'] in unresolved else ''
+            yield f'    -> 0x{edge["target"]:x} ({edge["kind"]}){note}'
+        yield ''
+
+
+def render_ehdr(ehdr: dict[str, Any], out: ReportWriter) -> None:
+    out.line('\n=== ELF HEADER ===\n')
+    out.line(f'Magic Number:        {ehdr["magic"]}')
+    out.line(f'EI_CLASS:            {ehdr["ei_class"]} ({ehdr["class_name"]})')
+    out.line(f'EI_DATA:             {ehdr["ei_data"]} ({ehdr["endian_name"]})')
+    out.line(f'EI_VERSION:          {ehdr["ei_version"]}')
+    out.line(f'EI_OSABI:            {ehdr["ei_osabi"]} ({ehdr["osabi_name"]})')
+    out.line(f'EI_ABIVERSION:       {ehdr["ei_abiversion"]}')
+    out.line(f'e_type:              0x{ehdr["e_type"]:04x} ({ehdr["type_name"]})')
+    out.line(f'e_machine:           0x{ehdr["e_machine"]:04x} ({ehdr["machine_name"]})')
+    out.line(f'e_version:           {ehdr["e_version"]}')
+    out.line(f'e_entry:             0x{ehdr["e_entry"]:x}')
+
+    # Explain entry point calculation
+    out.line('\n  Entry point calculation:')
+    out.line(f'    Virtual address where execution starts: 0x{ehdr["e_entry"]:x}')
+    entry = ehdr['entry']
+    if entry is not None:
+        file_offset = entry['file_offset']
+        if file_offset is None:
+            out.line(f'    This is in the bss of program header {entry["phdr_index"]} at vaddr 0x{entry["p_vaddr"]:x}')
+        else:
+            out.line(f'    This is in program header at vaddr 0x{entry["p_vaddr"]:x}')
+            out.line(f'    Note: Memory is page-aligned, so segment starts at 0x{entry["page_aligned_vaddr"]:x}')
+            out.line('    File offset = p_offset - page_offset + (e_entry - page_aligned_vaddr)')
+            out.line(
+                f'                = 0x{entry["p_offset"]:x} - 0x{entry["page_offset"]:x} + (0x{ehdr["e_entry"]:x} - 0x{entry["page_aligned_vaddr"]:x})',  # noqa: E501
+            )
+            out.line(f'                = 0x{file_offset:x} (byte {file_offset} in file)')
+            if entry['code'] is not None:
+                out.line(f'    Code at entry: {entry["code"].upper()}')
+            elif file_offset < 0:
+                out.line('    Warning: Entry point is before file start (calculated offset is negative)')
+    out.line()
+
+    out.line(f'e_phoff:             {ehdr["e_phoff"]} (0x{ehdr["e_phoff"]:x})')
+    out.line(f'e_shoff:             {ehdr["e_shoff"]} (0x{ehdr["e_shoff"]:x})')
+    out.line(f'e_flags:             0x{ehdr["e_flags"]:08x}')
+    out.line(f'e_ehsize:            {ehdr["e_ehsize"]} bytes')
+    out.line(f'e_phentsize:         {ehdr["e_phentsize"]} bytes')
+    out.line(f'e_phnum:             {ehdr["e_phnum"]}')
+    out.line(f'e_shentsize:         {ehdr["e_shentsize"]} bytes')
+    out.line(f'e_shnum:             {ehdr["e_shnum"]}')
+    out.line(f'e_shstrndx:          {ehdr["e_shstrndx"]}')
+
+
+def render_phdrs(phdrs: list[dict[str, Any]], out: ReportWriter) -> None:
+    out.line('\n=== PROGRAM HEADERS ===\n')
+    if not phdrs:
+        out.line('No program headers parsed (file may be malformed)\n')
+        return
+
+    for i, phdr in enumerate(phdrs):
+        out.line(f'Program Header {i}:')
+        out.line(f'  p_type:      0x{phdr["p_type"]:08x} ({phdr["type_name"]})')
+        out.line(f'  p_offset:    {phdr["p_offset"]} (0x{phdr["p_offset"]:x})')
+        out.line(f'  p_vaddr:     0x{phdr["p_vaddr"]:x}')
+        out.line(f'  p_paddr:     0x{phdr["p_paddr"]:x}')
+        out.line(f'  p_filesz:    {phdr["p_filesz"]} bytes (0x{phdr["p_filesz"]:x})')
+        out.line(f'  p_memsz:     {phdr["p_memsz"]} bytes (0x{phdr["p_memsz"]:x})')
+        out.line(f'  p_flags:     0x{phdr["p_flags"]:08x} ({phdr["flags_str"]})')
+        out.line(f'  p_align:     {phdr["p_align"]} bytes')
+
+        # Show what gets loaded into memory
+        out.line('\n  Memory mapping:')
+        out.line(
+            f'    File [0x{phdr["p_offset"]:x}:0x{phdr["p_offset"] + phdr["p_filesz"]:x}] -> Memory [0x{phdr["p_vaddr"]:x}:0x{phdr["p_vaddr"] + phdr["p_memsz"]:x}]',  # noqa: E501
+        )
+        if phdr['preview'] is not None:
+            hex_str = bytes.fromhex(phdr['preview']).hex(' ')
+            if phdr['preview_truncated']:
+                hex_str += ' ...'
+            out.line(f'    File data preview: {hex_str}')
+        out.line()
+
+
+def render_sections(sections: list[dict[str, Any]], out: ReportWriter) -> None:
+    out.line('\n=== SECTION HEADERS ===\n')
+    if not sections:
+        out.line('No section headers\n')
+        return
+    out.line('  [Nr] Name               Type             Address          Offset   Size     Flags')
+    for i, section in enumerate(sections):
+        out.line(
+            f'  [{i:2}] {section["name"]:<18.18} {section["type_name"]:<16.16} {section["sh_addr"]:016x} '
+            f'{section["sh_offset"]:08x} {section["sh_size"]:08x} {section["flags_str"]}',
+        )
+    out.line()
+
+
+def render_disassembly(disassembly: dict[str, Any], out: ReportWriter) -> None:
+    entry = disassembly['entry']
+    if not disassembly['in_file']:
+        out.line(f'\nCannot disassemble: entry point 0x{entry:x} not found in file\n')
+        return
+    out.line(f'\n=== DISASSEMBLY AT ENTRY POINT (0x{entry:x}) ===\n')
+    for instruction in disassembly['instructions']:
+        out.line(f'  {format_instruction(instruction)}')
+    if disassembly['stop'] == 'loop':
+        out.line('  (loop detected, stopping)')
+    elif disassembly['stop'] == 'jump_out_of_bounds':
+        out.line(f'  (jump target 0x{disassembly["jump_target"]:x} out of bounds)')
+    out.line()
+
+
+def render_cfg(entry: int, cfg: dict[str, Any], out: ReportWriter) -> None:
+    out.line(f'\n=== CONTROL FLOW GRAPH FROM ENTRY POINT (0x{entry:x}) ===\n')
+    if not cfg['blocks']:
+        out.line(f'Cannot disassemble: entry point 0x{entry:x} not found in file\n')
+        return
+    out.line('\n'.join(cfg_lines(cfg)))
+
+
+def render_text(report: Report, out: ReportWriter) -> None:
+    for note in report['notes']:
+        out.line(note)
+    if 'error' in report:
+        return
+    render_ehdr(report['ehdr'], out)
+    render_phdrs(report['phdrs'], out)
+    if 'sections' in report:
+        render_sections(report['sections'], out)
+    if 'cfg' in report:
+        render_cfg(report['ehdr']['e_entry'], report['cfg'], out)
+    elif 'disassembly' in report:
+        render_disassembly(report['disassembly'], out)
+
+
+def render_json(report: Report, out: ReportWriter) -> None:
+    out.line(json.dumps(report, separators=(',', ':')))
+
+
+def flatten(value: Any, path: str = '') -> Iterator[tuple[str, Any]]:
+    """(dotted path, scalar) pairs of a nested report, e.g. ('phdrs.0.p_vaddr', 4096)"""
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f'{path}.{key}' if path else key)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            yield from flatten(item, f'{path}.{i}')
+    else:
+        yield path, value
+
+
+def render_csv(report: Report, out: ReportWriter) -> None:
+    writer = csv.writer(out, lineterminator='\n')
+    filename = report['file']
+    writer.writerows(
+        (filename, path, '' if value is None else value) for path, value in flatten(report) if path != 'file'
+    )
+
+
+CSV_HEADER = 'file,field,value\n'
+
+RENDERERS: dict[str, Callable[[Report, ReportWriter], None]] = {
+    'text': render_text,
+    'json': render_json,
+    'csv': render_csv,
+}
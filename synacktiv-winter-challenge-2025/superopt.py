@@ -0,0 +1,538 @@
+#!/usr/bin/env python3
+"""Superoptimizer filling the free bytes of a quinindrome layout with i386 code.
+
+The file is the mask of a layout (`layouts.py --jsonl`, with an org): its free bytes
+('??') can hold code, the other ones are fixed (the placeholders left are 0, which
+maps the file at the org). The code starts at the entry with every register at 0
+and has to call write(1, org, size) then exit(0), like quiny95.asm.
+
+A node of the search is the program counter, the machine state (registers, flags
+and the values pushed), the syscalls already done and, until the code is past the
+free bytes of the loader fields, the bytes it put in them. The code only moves
+forward in the first half of the file (the second half is its mirror), so the
+other bytes behind the program counter are never read again and a node determines
+all that follows.
+At a free byte the candidates are the short encodings that bring a register of the
+next syscall closer to its value (the immediates are solved for the value, or for
+a value a shift turns into it), the one byte exchanges with eax, `int 0x80`, the
+short jumps to the next free runs and the instructions whose immediate swallows
+the fixed bytes that follow (`test eax, imm32` over e_phentsize and e_phnum). At
+a fixed byte the instruction is forced (its free bytes are 0). The instructions
+are executed with the handlers of the emulator on a `Machine` without memory.
+
+The search deepens the number of free bytes used. `failed` keeps for each node
+the largest budget that was not enough, and a node is cut when the lower bound of
+the bytes it still needs is above its budget or above the free bytes left. The
+files found are checked with `emulator.verify` (the loader reads some free bytes,
+p_filesz for instance), the first one that passes is the shortest layout.
+"""
+
+import argparse
+import json
+import sys
+from collections import Counter
+from collections.abc import Callable, Iterator, Sequence
+from functools import cache, lru_cache
+from typing import Any, NamedTuple
+
+from emulator import (
+    MASK32,
+    STACK_TOP,
+    SYS_EXIT,
+    SYS_WRITE,
+    Emulator,
+    Fault,
+    LoadError,
+    decode_window,
+    handler_of,
+    verify,
+)
+from header_templates import ELF32_HEADER, PHDR32
+from nibble_mask import HEX_DIGITS
+from x86_decoder import MAX_INSTRUCTION_SIZE, Flow, Instruction
+
+FREE_BYTE = '??'
+# Tried in order for the free bytes the code does not use, the first ones set PF_R in a free p_flags
+FILL_BYTES = (0x05, 0xFF, 0x00)
+LOADER_FIELDS = ('p_filesz', 'p_memsz', 'p_flags')  # Free fields the loader checks
+INT_0X80 = b'\xcd\x80'
+MAX_FAILED = 1 << 20  # Nodes `failed` remembers, the oldest are forgotten first
+# Opcodes whose immediate can swallow fixed bytes without touching a register
+IMM8_ABSORBERS = (0xA8, 0x3C)  # test al, imm8 / cmp al, imm8
+IMM32_ABSORBERS = (0xA9, 0x3D)  # test eax, imm32 / cmp eax, imm32
+# ModRM.reg of the 0x83 group, the immediate that turns a value into another and the operation
+ALU_SOLVERS: tuple[tuple[int, Callable[[int, int], int], Callable[[int, int], int]], ...] = (
+    (0, lambda v, value: value - v, lambda v, imm: v + imm),  # add
+    (1, lambda v, value: value & ~v, lambda v, imm: v | imm),  # or
+    (4, lambda v, value: value | ~v, lambda v, imm: v & imm),  # and
+    (5, lambda v, value: v - value, lambda v, imm: v - imm),  # sub
+    (6, lambda v, value: v ^ value, lambda v, imm: v ^ imm),  # xor
+)
+ESP = 4
+
+
+class State(NamedTuple):
+    regs: tuple[int, ...]
+    flags: int  # eflags
+    stack: tuple[int, ...]  # Values pushed (the top is the last one)
+
+
+# Like the emulator: every register is 0 but esp, and argc (1) is on top of the stack
+INITIAL_STATE = State(tuple(STACK_TOP - 0x100 if reg == ESP else 0 for reg in range(8)), 0x202, (1,))
+
+
+class Syscall(NamedTuple):
+    name: str
+    registers: tuple[tuple[int, int, int], ...]  # (register, value, mask) the call needs
+
+    def wrong(self, regs: Sequence[int]) -> list[tuple[int, int, int]]:
+        return [(reg, value, mask) for reg, value, mask in self.registers if regs[reg] & mask != value]
+
+
+def quine_syscalls(org: int, size: int) -> tuple[Syscall, ...]:
+    return (
+        Syscall('write', ((0, SYS_WRITE, MASK32), (3, 1, MASK32), (1, org, MASK32), (2, size, MASK32))),
+        Syscall('exit', ((0, SYS_EXIT, MASK32), (3, 0, 0xFF))),  # The exit code is the low byte of ebx
+    )
+
+
+class Machine(Emulator):
+    """The registers, flags and stack of an `Emulator` without memory: the instructions
+    that read or write memory fault, push and pop use `stack`"""
+
+    def __init__(self, state: State, address: int) -> None:
+        self.regs = list(state.regs)
+        self.set_eflags(state.flags)
+        self.stack = list(state.stack)
+        self.eip = address
+        self.exit_code = None
+        self.calls: list[tuple[int, ...]] = []  # Registers at each syscall
+
+    def state(self) -> State:
+        return State(tuple(self.regs), self.eflags(), tuple(self.stack))
+
+    def page(self, address: int, write: bool = False, execute: bool = False) -> bytearray:
+        raise Fault('SIGSEGV', self.eip, f'memory access at 0x{address:x}')
+
+    def push(self, value: int) -> None:
+        self.regs[ESP] = (self.regs[ESP] - 4) & MASK32
+        self.stack.append(value & MASK32)
+
+    def pop(self) -> int:
+        if not self.stack:
+            raise Fault('SIGSEGV', self.eip, 'pop past the values pushed')
+        self.regs[ESP] = (self.regs[ESP] + 4) & MASK32
+        return self.stack.pop()
+
+    def syscall(self) -> None:
+        # The search only goes on when the call is the expected one, which succeeds
+        self.calls.append(tuple(self.regs))
+        if self.regs[0] == SYS_WRITE:
+            self.regs[0] = self.regs[2]
+        elif self.regs[0] == SYS_EXIT:
+            self.exit_code = self.regs[3] & 0xFF
+
+
+def execute(state: State, ins: Instruction) -> Machine | None:
+    """The machine after `ins` (None when it faults or the emulator does not know it)"""
+    machine = Machine(state, ins.next_address)
+    try:
+        handler_of(ins)(machine, ins)
+    except (KeyError, Fault):
+        return None
+    return machine
+
+
+def fits_imm8(value: int) -> bool:
+    """`value` is a sign-extended byte"""
+    return value < 0x80 or value >= MASK32 - 0x7F
+
+
+@cache
+def stages(value: int, mask: int) -> tuple[tuple[int, int], ...]:
+    """The (value, mask) a register can go through on its way to `value`: the value
+    itself and the values a left shift turns into it"""
+    shifted = [(value >> k, MASK32) for k in range(1, 32) if value >> k and (value >> k) << k == value]
+    return ((value, mask), *shifted)
+
+
+def setters(reg: int, regs: tuple[int, ...], top: int | None, value: int, mask: int) -> Iterator[bytes]:
+    """Encodings that set `reg` to `value` (compared under `mask`), `top` being the top of the stack"""
+    v = regs[reg]
+    d = (value - v) & mask
+    if d in (1, 2):
+        yield bytes([0x40 + reg])  # inc
+    if d in (mask, mask - 1):
+        yield bytes([0x48 + reg])  # dec
+    if reg == 2 and (MASK32 if regs[0] >> 31 else 0) & mask == value:
+        yield b'\x99'  # cdq
+    if top is not None and top & mask == value:
+        yield bytes([0x58 + reg])  # pop
+    for src in range(8):
+        if src not in (reg, ESP) and regs[src] & mask == value:
+            yield bytes([0x50 + src])  # push src, for a pop
+            yield bytes([0x89, 0xC0 | src << 3 | reg])  # mov reg, src
+    if value & mask == 0:
+        yield bytes([0x31, 0xC0 | reg << 3 | reg])  # xor reg, reg
+    if reg < ESP:
+        if (v ^ value) & mask & ~0xFF == 0:
+            yield bytes([0xB0 + reg, value & 0xFF])  # mov r8 (low byte), imm8
+        if (v ^ value) & mask & ~0xFF00 == 0:
+            yield bytes([0xB4 + reg, value >> 8 & 0xFF])  # mov r8 (high byte), imm8
+    if fits_imm8(value):
+        yield bytes([0x6A, value & 0xFF])  # push imm8, for a pop
+    for op, solve, apply in ALU_SOLVERS:
+        imm = solve(v, value) & MASK32
+        if fits_imm8(imm) and apply(v, imm) & mask == value:
+            yield bytes([0x83, 0xC0 | op << 3 | reg, imm & 0xFF])
+    for k in range(1, 32):
+        for ext, result in ((4, v << k & MASK32), (5, v >> k)):  # shl, shr
+            if result & mask == value:
+                yield bytes([0xD1, 0xC0 | ext << 3 | reg]) if k == 1 else bytes([0xC1, 0xC0 | ext << 3 | reg, k])
+    yield bytes([0xB8 + reg]) + value.to_bytes(4, 'little')  # mov reg, imm32
+
+
+@lru_cache(maxsize=1 << 16)
+def setter_codes(regs: tuple[int, ...], top: int | None, reg: int, value: int, mask: int) -> frozenset[bytes]:
+    """The `setters` of `reg` for each of the stages of `value` it is not at"""
+    return frozenset(
+        code
+        for stage, stage_mask in stages(value, mask)
+        if regs[reg] & stage_mask != stage
+        for code in setters(reg, regs, top, stage, stage_mask)
+    )
+
+
+@lru_cache(maxsize=1 << 16)
+def reach_cost(v: int, value: int, mask: int) -> int:
+    """Bytes the encodings of `setters` need at least to turn `v` into `value` (compared
+    under `mask`) in one register"""
+    if v & mask == value:
+        return 0
+    d = (value - v) & mask
+    if d in (1, mask):
+        return 1
+    if (
+        d in (2, mask - 1)
+        or value == 0
+        or (v ^ value) & mask & ~0xFF == 0
+        or (v ^ value) & mask & ~0xFF00 == 0
+        or (v << 1 & MASK32) & mask == value
+        or (v >> 1) & mask == value
+    ):
+        return 2
+    immediates = ((solve(v, value) & MASK32, apply) for _, solve, apply in ALU_SOLVERS)
+    if (
+        fits_imm8(value)  # push imm8, pop
+        or any(fits_imm8(imm) and apply(v, imm) & mask == value for imm, apply in immediates)
+        or any((v << k & MASK32) & mask == value or (v >> k) & mask == value for k in range(2, 32))
+    ):
+        return 3
+    cost = 5  # mov reg, imm32
+    for stage, stage_mask in stages(value, mask)[1:]:
+        shift = 2 if (stage << 1) & mask == value else 3
+        cost = min(cost, reach_cost(v, stage, stage_mask) + shift)
+    return cost
+
+
+@lru_cache(maxsize=1 << 16)
+def register_bound(regs: tuple[int, ...], top: int | None, reg: int, value: int, mask: int) -> int:
+    """Half bytes needed at least to set `reg` to `value`: in place (`reach_cost`), with an
+    ALU operation on another register (2 bytes), or in another register then moved (half
+    of a one byte xchg) or from the top of the stack (a pop)"""
+    v = regs[reg]
+    halves = 2 * reach_cost(v, value, mask)
+    if reg == 2 and value in (0, mask):
+        halves = min(halves, 2)  # cdq
+    for src, u in enumerate(regs):
+        if src not in (reg, ESP):
+            halves = min(halves, 1 + 2 * reach_cost(u, value, mask))
+            if halves > 4 and any(apply(v, u) & mask == value for _, _, apply in ALU_SOLVERS):
+                halves = 4
+    if top is not None:
+        halves = min(halves, 2 + 2 * reach_cost(top, value, mask))
+    return halves
+
+
+def maps_file(image: bytes, org: int, entry: int) -> bool:
+    """The kernel loads `image` with all of it mapped at `org` and the entry executable"""
+    try:
+        emulator = Emulator(image)
+        emulator.page(org + entry, execute=True)
+    except (LoadError, Fault):
+        return False
+    return emulator.read_bytes(org, len(image)) == image
+
+
+class Step(NamedTuple):
+    pc: int  # File offset of the instruction
+    instruction: Instruction
+    forced: bool  # Decoded from fixed bytes
+
+
+class Program(NamedTuple):
+    size: int  # Free bytes the code uses
+    steps: tuple[Step, ...]
+    image: bytes  # The whole file
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            'size': self.size,
+            'code': [{'pc': step.pc, 'forced': step.forced, **step.instruction.as_dict()} for step in self.steps],
+            'image': self.image.hex(),
+        }
+
+
+class Superoptimizer:
+    def __init__(self, mask: str, org: int, entry: int, stats: Counter[str] | None = None) -> None:
+        self.size = len(mask) // 2
+        self.org = org
+        self.entry = entry
+        self.stats = Counter() if stats is None else stats
+        # The placeholders left and the wildcards of partly fixed bytes are 0
+        pairs = [mask[i : i + 2] for i in range(0, len(mask), 2)]
+        self.fixed: list[int | None] = [
+            None if pair == FREE_BYTE else int(''.join(c if c in HEX_DIGITS else '0' for c in pair), 16)
+            for pair in pairs
+        ]
+        self.code_end = (self.size + 1) // 2  # The code stays in the first half
+        self.syscalls = quine_syscalls(org, self.size)
+        self.failed: dict[tuple[Any, ...], int] = {}
+        self.rejected: set[bytes] = set()
+
+        # The loader fields are decided (by the code or the fill) once the code is past
+        # the last of their free bytes (or of their mirrors)
+        e_phoff = ELF32_HEADER.field('e_phoff')
+        phdr = int.from_bytes(bytes(self.fixed[e_phoff.offset + i] or 0 for i in range(e_phoff.width)), 'little')
+        self.loader_bytes = [
+            i
+            for field in map(PHDR32.field, LOADER_FIELDS)
+            for i in range(phdr + field.offset, min(phdr + field.offset + field.width, self.size))
+            if self.fixed[i] is None
+        ]
+        self.loaded_at = max((min(i, self.size - 1 - i) + 1 for i in self.loader_bytes), default=0)
+        self.maps_file: dict[bytes, bool] = {}  # By the loader bytes
+
+        # Free bytes from each offset on, the registers the forced instructions from
+        # each offset on can write, and whether a fixed `int 0x80` is still ahead
+        self.free_after = [0] * (self.code_end + 1)
+        self.forced_writes = [0] * (self.code_end + 1)
+        self.int_ahead = [False] * (self.code_end + 1)
+        probe = State(tuple(0x1111111 * (reg + 1) for reg in range(8)), 0x202, (0x5A5A5A5A,) * 8)
+        for pc in reversed(range(self.code_end)):
+            self.free_after[pc] = self.free_after[pc + 1] + (self.fixed[pc] is None)
+            self.forced_writes[pc] = self.forced_writes[pc + 1]
+            self.int_ahead[pc] = self.int_ahead[pc + 1]
+            if self.fixed[pc] is None:
+                continue
+            ins = self.forced(pc)
+            machine = None if ins is None else execute(probe, ins)
+            if machine is not None:
+                self.forced_writes[pc] |= sum(1 << reg for reg in range(8) if machine.regs[reg] != probe.regs[reg])
+                self.int_ahead[pc] |= ins.raw == INT_0X80
+
+    def window(self, pc: int) -> bytes:
+        return bytes(self.fixed[i] or 0 for i in range(pc, min(pc + MAX_INSTRUCTION_SIZE, self.size)))
+
+    def forced(self, pc: int) -> Instruction | None:
+        return decode_window(self.window(pc), self.org + pc)
+
+    def free_bytes(self, pc: int, length: int) -> int:
+        return sum(self.fixed[i] is None for i in range(pc, pc + length))
+
+    def cost(self, pc: int, code: bytes) -> int | None:
+        """Free bytes `code` takes at `pc` (None when it does not fit)"""
+        if pc + len(code) > self.code_end:
+            return None
+        cost = 0
+        for i, byte in enumerate(code):
+            fixed = self.fixed[pc + i]
+            if fixed is None:
+                cost += 1
+            elif fixed != byte:
+                return None
+        return cost
+
+    def lower_bound(self, pc: int, state: State, phase: int) -> int:
+        """Free bytes the code still needs at least: the registers of the syscall (but the
+        ones a fixed instruction ahead could write, for free) and an `int 0x80` for each
+        syscall left unless a fixed one is ahead"""
+        top = state.stack[-1] if state.stack else None
+        halves = sum(
+            register_bound(state.regs, top, reg, value, mask)
+            for reg, value, mask in self.syscalls[phase].wrong(state.regs)
+            if not self.forced_writes[pc] >> reg & 1
+        )
+        return (halves + 1) // 2 + (0 if self.int_ahead[pc] else 2 * (len(self.syscalls) - phase))
+
+    def candidates(self, pc: int, state: State, phase: int) -> Iterator[bytes]:
+        """Encodings to try at the free byte `pc`, shortest first"""
+        found: set[bytes] = set()
+        wrong = self.syscalls[phase].wrong(state.regs)
+        if not wrong:
+            found.add(INT_0X80)
+        for reg in range(8):
+            if reg != ESP:
+                found.add(bytes([0x90 + reg]))  # xchg eax, reg (nop for eax)
+        top = state.stack[-1] if state.stack else None
+        for reg, value, mask in wrong:
+            found |= setter_codes(state.regs, top, reg, value, mask)
+        # Short jumps to the free runs ahead
+        for target in range(pc + 3, min(self.code_end, pc + 2 + 0x80)):
+            if self.fixed[target] is None and self.fixed[target - 1] is not None:
+                found.add(bytes([0xEB, target - pc - 2]))
+        if pc + 1 < self.code_end and self.fixed[pc + 1] is not None:
+            found.add(bytes([0xEB, self.fixed[pc + 1]]))
+        # Immediates over the fixed bytes that follow
+        following = bytes(self.fixed[i] or 0 for i in range(pc + 1, min(pc + 5, self.size)))
+        if any(self.fixed[i] is not None for i in range(pc + 1, min(pc + 5, self.size))):
+            found.update(bytes([opcode]) + following[:4] for opcode in IMM32_ABSORBERS)
+        if pc + 1 < self.size and self.fixed[pc + 1] is not None:
+            found.update(bytes([opcode]) + following[:1] for opcode in IMM8_ABSORBERS)
+        return iter(sorted(found, key=lambda code: (len(code), code)))
+
+    def successors(self, pc: int, state: State, phase: int) -> Iterator[tuple[int, Step, int, State, int]]:
+        """(cost, step, pc, state, phase) after each instruction that can run at `pc`"""
+        if self.fixed[pc] is None:
+            encodings: Iterator[bytes | None] = self.candidates(pc, state, phase)
+        else:
+            encodings = iter([None])
+        for code in encodings:
+            if code is None:
+                ins = self.forced(pc)
+                cost = 0 if ins is None else self.free_bytes(pc, ins.length)
+            else:
+                fit = self.cost(pc, code)
+                ins = None if fit is None else decode_window(code, self.org + pc)
+                cost = fit or 0
+            if ins is None or ins.flow in (Flow.INVALID, Flow.HALT) or pc + ins.length > self.code_end:
+                continue
+            machine = execute(state, ins)
+            if machine is None:
+                continue
+            next_phase = phase
+            for regs in machine.calls:
+                if next_phase == len(self.syscalls) or self.syscalls[next_phase].wrong(regs):
+                    break
+                next_phase += 1
+            else:
+                next_pc = machine.eip - self.org
+                if next_phase == len(self.syscalls) or pc < next_pc < self.code_end:
+                    yield cost, Step(pc, ins, code is None), next_pc, machine.state(), next_phase
+
+    def programs(self, pc: int, state: State, phase: int, budget: int, steps: list[Step]) -> Iterator[list[Step]]:
+        """The programs from the node that use `budget` free bytes at most"""
+        budget = min(budget, self.free_after[pc])
+        # Before the loader fields are decided, what follows also depends on the bytes the
+        # code put in them
+        key = (pc, state, phase, self.placed_loader_bytes(steps) if pc < self.loaded_at else ())
+        if self.failed.get(key, -1) >= budget:
+            self.stats['memoized'] += 1
+            return
+        self.stats['node'] += 1
+        if self.lower_bound(pc, state, phase) > budget:
+            self.stats['pruned'] += 1
+            return
+        found = False
+        for cost, step, next_pc, next_state, next_phase in self.successors(pc, state, phase):
+            if cost > budget:
+                continue
+            steps.append(step)
+            if next_phase == len(self.syscalls):
+                found = True
+                yield steps
+            elif pc < self.loaded_at <= next_pc and not self.loads(steps):
+                self.stats['not loaded'] += 1
+            else:
+                for program in self.programs(next_pc, next_state, next_phase, budget - cost, steps):
+                    found = True
+                    yield program
+            steps.pop()
+        if not found:
+            self.fail(key, budget)
+
+    def fail(self, key: tuple[Any, ...], budget: int) -> None:
+        """Remember that `budget` is not enough for the node `key`"""
+        self.failed.pop(key, None)
+        self.failed[key] = budget
+        if len(self.failed) > MAX_FAILED:
+            del self.failed[next(iter(self.failed))]
+
+    def placed_loader_bytes(self, steps: Sequence[Step]) -> tuple[int | None, ...]:
+        """The bytes the code of `steps` puts in the free loader bytes (None for the ones it
+        leaves to the fill)"""
+        placed = {step.pc + i: byte for step in steps for i, byte in enumerate(step.instruction.raw)}
+        return tuple(placed.get(min(i, self.size - 1 - i)) for i in self.loader_bytes)
+
+    def loads(self, steps: Sequence[Step]) -> bool:
+        placed = self.placed_loader_bytes(steps)
+        for fill in FILL_BYTES:
+            fields = bytes(fill if byte is None else byte for byte in placed)
+            if fields not in self.maps_file:
+                self.maps_file[fields] = maps_file(self.image(steps, fill), self.org, self.entry)
+            if self.maps_file[fields]:
+                return True
+        return False
+
+    def image(self, steps: Sequence[Step], fill: int) -> bytes:
+        """The palindrome with the code of `steps`, the other free bytes set to `fill`"""
+        image = bytearray(fill if byte is None else byte for byte in self.fixed)
+        for step in steps:
+            for i, byte in enumerate(step.instruction.raw):
+                image[step.pc + i] = image[self.size - 1 - step.pc - i] = byte
+        return bytes(image)
+
+    def solve(self, max_bytes: int | None = None) -> Program | None:
+        """The program using the fewest free bytes whose file passes the emulator"""
+        max_bytes = self.free_after[self.entry] if max_bytes is None else max_bytes
+        for budget in range(self.lower_bound(self.entry, INITIAL_STATE, 0), max_bytes + 1):
+            self.stats['budget'] += 1
+            for steps in self.programs(self.entry, INITIAL_STATE, 0, budget, []):
+                for fill in FILL_BYTES:
+                    image = self.image(steps, fill)
+                    if image in self.rejected:
+                        continue
+                    if verify(image).ok:
+                        used = sum(self.free_bytes(step.pc, step.instruction.length) for step in steps)
+                        return Program(used, tuple(steps), image)
+                    self.stats['rejected'] += 1
+                    self.rejected.add(image)
+        return None
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Fill the free bytes of a layout with the shortest quine code')
+    argparser.add_argument('layout', help="a JSON line of `layouts.py --jsonl --org ...` ('-' for stdin)")
+    argparser.add_argument('--max-bytes', type=int, help='free bytes the code may use (default: all)')
+    argparser.add_argument('--out', help='write the file found there')
+    argparser.add_argument('--jsonl', action='store_true', help='print the program as a JSON line')
+    args = argparser.parse_args()
+
+    if args.layout == '-':
+        line = sys.stdin.readline()
+    else:
+        with open(args.layout) as f:
+            line = f.readline()
+    layout = json.loads(line)
+    if layout.get('org') is None:
+        argparser.error('the layout has no org (run layouts.py with --org)')
+
+    stats: Counter[str] = Counter()
+    program = Superoptimizer(layout['elf'], layout['org'], layout['entry'], stats).solve(args.max_bytes)
+    print(', '.join(f'{count} {name}' for name, count in stats.items()), file=sys.stderr)
+    if program is None:
+        print('No program fits the free bytes of the layout', file=sys.stderr)
+        sys.exit(1)
+    if args.out:
+        with open(args.out, 'wb') as f:
+            f.write(program.image)
+    if args.jsonl:
+        print(json.dumps(program.as_dict()))
+        return
+    print(f'{program.size} free bytes of code in a {len(program.image)} bytes file:')
+    for step in program.steps:
+        print(f'  [{step.pc:3}] {step.instruction.raw.hex(" "):<17} {step.instruction.text}{"  (fixed)" * step.forced}')
+
+
+if __name__ == '__main__':
+    main()
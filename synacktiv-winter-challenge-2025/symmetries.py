@@ -1,3 +1,32 @@
+#!/usr/bin/env python3
+"""Search the layouts where the ELF header and the program header of the quinindrome
+overlap in a byte palindrome.
+
+`search` fans the (axis, program header offset) units out over a process pool,
+`python symmetries.py` prints the symmetries found with a high enough score, or
+only the best ones (`TopK`), possibly as JSON lines.
+"""
+
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sys
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from functools import cache, lru_cache
+from typing import Any, NamedTuple, TextIO
+
+from header_templates import ELF32_HEADER, PHDR32
+from nibble_mask import (
+    HEX_DIGITS,
+    WILDCARD,
+    NibbleMask,
+    PlaceholderClasses,
+    is_placeholder,
+)
+
 # ELF_MASK = """\
 # 7F454C46????????????????????????\
 # 0200 0300????????XXXXXXXXXXXXXXXX\
@@ -9,45 +38,55 @@
 # """
 
 
-def get_elf_mask(
-    *,
-    e_entry: str = '04IJKLMN',
-    e_phoff: str = 'OPQRSTUV',
-    e_type: str = '0200',
-    e_machine: str = '0300',
-) -> str:
-    return f"""\
-7F454C46????????????????????????\
-{e_type}{e_machine}????????{e_entry}{e_phoff}\
-????????????????????20000100????\
-"""
+# The templates the search lays
+ELF_HEADER = ELF32_HEADER
+PROGRAM_HEADER = PHDR32
 
 
+@cache
+def get_elf_mask(**fields: str) -> str:
+    return ELF_HEADER.pattern(**fields)
+
+
+@cache
 def get_pe_mask(*, p_offset: str = '', p_vadd: str = '') -> str:
-    if p_offset == '':
-        p_offset = 'GHI00000'
-    if p_vadd == '':
-        p_vadd = 'GHIJKLMN'
-    return f"""\
-01000000{p_offset}{p_vadd}????????\
-????????????????????????????????\
-"""
+    return PROGRAM_HEADER.pattern(p_offset=p_offset, p_vaddr=p_vadd)
+
+
+def e_phoff_pattern(offset: int) -> str:
+    """The e_phoff field of a program header at nibble `offset`"""
+    return ELF_HEADER.field('e_phoff').encode(offset // 2)
+
+
+E_ENTRY = ELF_HEADER.field('e_entry').nibble_offset  # Nibble offsets of the fields in the ELF header
+E_PHOFF = ELF_HEADER.field('e_phoff').nibble_offset
+
+
+# The masks only depend on their fields (and the palindromes on the mask and the
+# axis), so each one is built once per process whatever the number of axes and
+# offsets searched. The results are shared: they must not be modified.
+
+
+@cache
+def elf_nibble_mask(**fields: str) -> NibbleMask:
+    return NibbleMask.from_str(get_elf_mask(**fields))
+
+
+@cache
+def pe_nibble_mask(**fields: str) -> NibbleMask:
+    return NibbleMask.from_str(get_pe_mask(**fields))
 
 
 def reconstruct_placeholders(resolutions: dict[str, str]) -> dict[str, str]:
-    e_entry = '04IJKLMN'
-    e_phoff = 'OPQRSTUV'
-    p_vadd = 'GHIJKLMN'
-    p_offset = 'GHI00000'
-    for key, value in resolutions.items():
-        if key in e_entry:
-            e_entry = e_entry.replace(key, value)
-        if key in e_phoff:
-            e_phoff = e_phoff.replace(key, value)
-        if key in p_offset:
-            p_offset = p_offset.replace(key, value)
-        if key in p_vadd:
-            p_vadd = p_vadd.replace(key, value)
+    classes = PlaceholderClasses.from_resolutions(resolutions)
+
+    def resolve(field: str) -> str:
+        return ''.join(classes.resolve(char) if char in resolutions else char for char in field)
+
+    e_entry = resolve(ELF_HEADER.field('e_entry').placeholders)
+    # e_phoff = resolve(ELF_HEADER.field('e_phoff').placeholders)
+    p_vadd = resolve(PROGRAM_HEADER.field('p_vaddr').placeholders)
+    p_offset = resolve(PROGRAM_HEADER.field('p_offset').placeholders)
     return {
         'e_entry': e_entry,
         # "e_phoff": e_phoff,
@@ -62,16 +101,6 @@ def delete_placeholder_chars(s: str) -> str:
     return s
 
 
-def revert_byte_order(hex_str: str) -> str:
-    """Reverse byte order: read bytes from end to start, like the shell script"""
-    result = ''
-    i = len(hex_str) - 2
-    while i >= 0:
-        result += hex_str[i : i + 2]
-        i -= 2
-    return result
-
-
 def get_e_entry_from_org(org: int) -> int:
     return org + 0x14
 
@@ -85,107 +114,241 @@ def int_to_hex_le(value: int, length: int) -> str:
     return shift_endianness(hex_str)
 
 
-def valid_intersection(mask1: str, mask2: str, offset: int = 0) -> tuple[str, dict[str, str]]:  # noqa: C901
-    resolutions: dict[str, str] = {}
-    if mask1[offset : len(mask2) + offset] == mask2:
+def close(mask: NibbleMask, fields: Iterable[tuple[int, NibbleMask]]) -> tuple[NibbleMask | None, dict[str, str]]:
+    """Propagate the constraints on `mask` to their fixed point: the `fields` laid at
+    their nibble offsets, each nibble equal to its mirror (a byte palindrome) and the
+    occurrences of a placeholder equal to each other.
+
+    All the equalities between placeholders and digits go to one union-find, so the
+    fields are merged one after the other, then the mask with its mirror, and the
+    placeholders are substituted once at the end: each nibble is visited once per
+    field and once for its mirror, however many placeholders are left. Returns the
+    mask (a placeholder is replaced by its digit or by the name of its class) and the
+    resolutions, (None, {}) when two digits conflict."""
+    laid = [field.placed(offset, mask.size) for offset, field in fields]
+
+    def priority(char: str) -> tuple[int, int]:
+        # Name the classes after the placeholders of mask, the one appearing last first
+        # (the names the substitutions level by level used to give)
+        first = mask.first_nibble(char)
+        if first is not None:
+            return 0, -first
+        return 1, min((f for field in laid if (f := field.first_nibble(char)) is not None), default=0)
+
+    classes = PlaceholderClasses(priority)
+    merged = mask
+    for field in laid:
+        step = merged.merge(field, classes)
+        if step is None:
+            return None, {}
+        merged = step
+    symmetric = merged.merge(merged.byte_reversed(), classes)
+    if symmetric is None:
+        return None, {}
+    resolutions = classes.resolutions()
+    return symmetric.substitute(resolutions), resolutions
+
+
+def valid_intersection(
+    mask1: NibbleMask,
+    mask2: NibbleMask,
+    offset: int = 0,
+) -> tuple[NibbleMask | None, dict[str, str]]:
+    """Intersection of mask1 with mask2 laid at nibble `offset`, made a byte palindrome
+    (see `close`)"""
+    if mask1.window(offset, mask2.size) == mask2:
         return mask1, {}
-    intersection = mask1[:offset]
-    undetermined_char = False
-    for i in range(len(mask2)):
-        if mask1[i + offset] == ' ':
-            continue
-        if mask1[i + offset] == '?':
-            undetermined_char = True
-            intersection += mask2[i]
-            continue
-        if mask2[i] == '?':
-            undetermined_char = True
-            intersection += mask1[i + offset]
-            continue
-        if mask1[i + offset] == mask2[i]:
-            intersection += mask1[i + offset]
-            continue
-        if mask1[i + offset] != mask2[i]:
-            undetermined_char = True
-            if not is_hex_string(mask1[i + offset]) or not is_hex_string(mask2[i]):
-                # print(f"Non-hex character mismatch at offset {i + offset}: '{mask1[i + offset]}' != '{mask2[i]}'")
-                if not is_hex_string(mask2[i]):
-                    wrong_char = mask2[i]
-                    goood_char = mask1[i + offset]
-                    resolutions[wrong_char] = goood_char
-                    intersection += wrong_char
-                    intersection = intersection.replace(wrong_char, goood_char)
-                    mask2 = mask2.replace(wrong_char, goood_char)
-                    mask1 = mask1.replace(wrong_char, goood_char)
-                    continue
-                if not is_hex_string(mask1[i + offset]):
-                    wrong_char = mask1[i + offset]
-                    goood_char = mask2[i]
-                    resolutions[wrong_char] = goood_char
-                    intersection += wrong_char
-                    intersection = intersection.replace(wrong_char, goood_char)
-                    mask1 = mask1.replace(wrong_char, goood_char)
-                    mask2 = mask2.replace(wrong_char, goood_char)
-                    continue
-            return '', {}
-    if undetermined_char:
-        sol, res = valid_intersection(intersection + mask1[len(mask2) + offset :], revert_byte_order(mask1), 0)
-    else:
-        sol = intersection
-        res = {}
-    if sol != '':
-        if len(resolutions) != 0:
-            # print(f"Resolutions applied: {resolutions}")
-            pass
-        res.update(resolutions)
-        return sol, res
-    return '', {}
-
-
-def is_hex_string(s: str) -> bool:
-    try:
-        int(s, 16)
-        return True
-    except ValueError:
-        return False
+    return close(mask1, [(offset, mask2)])
 
 
-def get_palindrome(s: str, axis: int = -1) -> str:
+@lru_cache(maxsize=1 << 14)
+def get_palindrome(s: NibbleMask, axis: int = -1) -> NibbleMask:
+    """Byte palindrome of `axis` bytes built from the start of `s` (the middle byte
+    is not repeated when `axis` is odd)"""
     if axis == -1:
-        axis = len(s) // 2 * 2
-    r = s[: axis // 2 * 2]
+        axis = s.size // 2 * 2
+    half = s.window(0, axis // 2 * 2)
+    r = half
     if axis % 2 != 0:
-        r += s[axis - 1 : axis + 1]
-    r += revert_byte_order(s[: axis // 2 * 2])
-    return r
+        r += s.window(axis - 1, 2)
+    return r + half.byte_reversed()
+
+
+class Symmetry(NamedTuple):
+    axis: int  # Size of the palindrome in bytes
+    offset: int  # Nibble offset of the program header
+    elf: str
+    resolutions: dict[str, str]
+    score: int  # `is_usable` score of the mask
+
+    def as_dict(self) -> dict[str, Any]:
+        """JSON friendly view, with the offset and the usable bytes in bytes"""
+        return {
+            'axis': self.axis,
+            'offset': self.offset // 2,
+            'score': self.score,
+            'usable_bytes': self.score // 2,
+            'elf': self.elf,
+            'resolutions': self.resolutions,
+            'reconstructed': reconstruct_placeholders(self.resolutions),
+        }
+
+
+@cache
+def axis_intersection(axis: int) -> tuple[NibbleMask | None, dict[str, str]]:
+    """The ELF header template made a palindrome of `axis` bytes"""
+    elf_mask = elf_nibble_mask()
+    return valid_intersection(get_palindrome(elf_mask, axis), elf_mask)
+
+
+def pe_offsets(axis: int) -> range:
+    """Nibble offsets of the program header in a palindrome of `axis` bytes (none when
+    it cannot even hold the ELF header)"""
+    if 2 * axis < len(get_elf_mask()):
+        return range(0)
+    return range(0, 2 * axis - len(get_pe_mask()) + 1, 2)
+
+
+class AxisState:
+    """Incremental constraint state of an axis: the fields of an offset are added to the
+    closed mask of the axis, then retracted.
+
+    Each nibble of the mask is a variable: its digit, the class of its placeholder or,
+    for a wildcard, the pair it forms with its mirror (the mask is a palindrome, so the
+    mirror equalities are folded in). The fields bind and unite the variables in a
+    union-find without path compression, each link being pushed on a trail that
+    `undo` pops back to a mark. Checking an offset then costs the nibbles of its
+    fields, and stops at the first conflict."""
+
+    def __init__(self, mask: NibbleMask) -> None:
+        # Variables 0..15 are the digits, always roots
+        self.parent: list[int] = list(range(16))
+        self.weight: list[int] = [1] * 16
+        self.trail: list[int] = []  # Variables linked to a root, in order
+        named: dict[str, int] = {}  # Placeholder, or '?' and the first nibble of a pair -> variable
+        self.variables: list[int] = []  # Nibble -> variable
+        for i, char in enumerate(str(mask)):
+            if char in HEX_DIGITS:
+                self.variables.append(int(char, 16))
+                continue
+            # A wildcard and its mirror share their variable
+            key = char if char != WILDCARD else f'?{min(i, mask.size - 2 - i // 2 * 2 + i % 2)}'
+            if key not in named:
+                named[key] = self.new_variable()
+            self.variables.append(named[key])
+        self.named = named
+        self.fields: dict[str, list[tuple[int, int, int]]] = {}
+
+    def new_variable(self) -> int:
+        self.parent.append(len(self.parent))
+        self.weight.append(1)
+        return len(self.parent) - 1
+
+    def find(self, variable: int) -> int:
+        while self.parent[variable] != variable:
+            variable = self.parent[variable]
+        return variable
+
+    def unite(self, a: int, b: int) -> bool:
+        """False when two different digits meet"""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return True
+        if a < 16 and b < 16:
+            return False
+        # A digit stays the root of its class, otherwise union by size
+        if b < 16 or (a >= 16 and self.weight[a] < self.weight[b]):
+            a, b = b, a
+        self.parent[b] = a
+        self.weight[a] += self.weight[b]
+        self.trail.append(b)
+        return True
+
+    def undo(self, mark: int) -> None:
+        """Retract the links made since `len(self.trail)` was `mark`"""
+        while len(self.trail) > mark:
+            b = self.trail.pop()
+            self.weight[self.parent[b]] -= self.weight[b]
+            self.parent[b] = b
+
+    def lay(self, offset: int, field: str) -> bool:
+        """Add the field (a mask string) at nibble `offset`, False on a conflict (the
+        links made are left on the trail). A placeholder of the field is the one of
+        the mask with the same name, unless it is bound to a digit (`close` would have
+        substituted it away), else a variable of the field string."""
+        if field not in self.fields:
+            letters: dict[str, int] = {}
+            for char in field:
+                if is_placeholder(char) and char not in letters:
+                    letters[char] = self.new_variable()
+            compiled = [
+                (i, int(char, 16) if char in HEX_DIGITS else letters[char], self.named.get(char, -1))
+                for i, char in enumerate(field)
+                if char != WILDCARD
+            ]
+            # The digits first: they are the likeliest to conflict
+            self.fields[field] = sorted(compiled, key=lambda entry: entry[1] >= 16)
+        # Resolved before laying anything, like the names of the mask `close` would see
+        compiled = [
+            (i, named if named >= 0 and self.find(named) >= 16 else variable)
+            for i, variable, named in self.fields[field]
+        ]
+        variables = self.variables
+        return all(self.unite(variables[offset + i], variable) for i, variable in compiled)
+
+    def feasible(self, offset: int) -> bool:
+        """Whether the program header fits at nibble `offset` (e_phoff set accordingly)"""
+        mark = len(self.trail)
+        try:
+            return self.lay(E_PHOFF, e_phoff_pattern(offset)) and self.lay(offset, get_pe_mask())
+        finally:
+            self.undo(mark)
+
+
+@cache
+def axis_state(axis: int) -> AxisState | None:
+    inter, _ = axis_intersection(axis)
+    return None if inter is None else AxisState(inter)
+
+
+def check_offset(axis: int, offset: int, res0: dict[str, str]) -> Symmetry | None:
+    """Lay the program header at `offset` in the palindrome (`res0` are the resolutions of
+    `axis_intersection`)"""
+    elf_mask_with_offset = elf_nibble_mask(e_phoff=e_phoff_pattern(offset))
+    new_mask0, res1 = valid_intersection(
+        get_palindrome(elf_mask_with_offset, axis),
+        elf_mask_with_offset,
+    )
+    res1.update(res0)
+    if new_mask0 is None:
+        return None
+    new_mask1, res2 = valid_intersection(new_mask0, pe_nibble_mask(), offset)
+    res2.update(res1)
+    if new_mask1 is None:
+        return None
+    return Symmetry(axis, offset, str(new_mask1), res2, usable_score(new_mask1))
 
 
 def check_symmetry(axis: int) -> dict[int, tuple[str, dict[str, str]]]:
     valid_p_shifts: dict[int, tuple[str, dict[str, str]]] = {}
-    resulting = get_palindrome(get_elf_mask(), axis)
-    _inter, res0 = valid_intersection(resulting, get_elf_mask())
-    if _inter != '':
-        for i in range(0, len(_inter) - len(get_pe_mask()) + 1, 2):
-            elf_mask_with_offset = get_elf_mask(e_phoff=int_to_hex_le(i // 2, 4))
-            new_mask0, res1 = valid_intersection(
-                get_palindrome(elf_mask_with_offset, axis),
-                elf_mask_with_offset,
-            )
-            res1.update(res0)
-            if new_mask0 == '':
+    _inter, res0 = axis_intersection(axis)
+    state = axis_state(axis)
+    if state is not None:
+        for i in pe_offsets(axis):
+            if not state.feasible(i):
                 continue
-            new_mask1, res2 = valid_intersection(new_mask0, get_pe_mask(), i)
-            if i % 10 == 0:
-                pass
-            res2.update(res1)
-            if new_mask1 != '':
-                valid_p_shifts[i] = (new_mask1, res2)
+            symmetry = check_offset(axis, i, res0)
+            if symmetry is not None:
+                valid_p_shifts[i] = (symmetry.elf, symmetry.resolutions)
     return valid_p_shifts
 
 
+USABLE_PLACEHOLDERS = frozenset('GHIKLMNOPQRSTUVWXYZ&~()*+-./,:;')  # J is excluded
+
+
 def is_usable(s: str) -> int:
     count = 0
-    for i in 'GHIKLMNOPQRSTUVWXYZ&~()*+-./,:;':  # J is excluded
+    for i in USABLE_PLACEHOLDERS:
         if i in s:
             count += 1
     for i in s[: len(s) // 2]:
@@ -194,32 +357,235 @@ def is_usable(s: str) -> int:
     return count
 
 
-for i in range(len(get_elf_mask()) // 2, len(get_elf_mask()) - 12):
-    valid_p_shifts = check_symmetry(i)
-    if valid_p_shifts:
-        for offset, solutions in valid_p_shifts.items():
-            elf, res = solutions
-            reconstructed_placeholders = reconstruct_placeholders(res)
-            if (
-                # is_valid_placeholder_reconstruction(reconstructed_placeholders)
-                (us := is_usable(elf))
-                >= 20
-                # and offset != 8
-            ):
-                print(
-                    f'Symmetry found at axis {i}: score {len(elf)//2}\n'
-                    f'  - offset {offset//2}\n'
-                    f'  - elf: {elf}\n'
-                    f'  - Resolutions: {res}\n'
-                    f'  - Reconstructed: {reconstructed_placeholders}\n'
-                    f'  - Usable bytes: {us//2}\n'
-                    f'  - ELF header: {elf[:len(get_elf_mask())]}\n'
-                    f'  - PE header: {elf[offset:offset+len(get_pe_mask())]}\n',
-                )
-
-if (1 - 1) != 0:
-    print(check_symmetry(81))
-#
+def first_half_wildcards(mask: NibbleMask) -> int:
+    return (mask.wildcard_bits >> 4 * (mask.size - mask.size // 2)).bit_count() // 4
+
+
+def usable_score(mask: NibbleMask) -> int:
+    """`is_usable` of the mask, from its bits instead of one scan of the string per placeholder"""
+    return len(mask.placeholders() & USABLE_PLACEHOLDERS) + first_half_wildcards(mask)
+
+
+def refined_score_bound(mask: NibbleMask) -> int:
+    """Upper bound of the scores of the masks refining `mask`: fixing fields and laying
+    the program header only fill wildcards and merge placeholders, but they may bring
+    those of the program header"""
+    placeholders = len(mask.placeholders()) + len(pe_nibble_mask().placeholders())
+    return placeholders + first_half_wildcards(mask)
+
+
+@cache
+def score_bound(axis: int) -> int:
+    """Upper bound of the scores of the symmetries at `axis` (-1 when there are none)"""
+    if not pe_offsets(axis):
+        return -1
+    inter, _ = axis_intersection(axis)
+    return -1 if inter is None else refined_score_bound(inter)
+
+
+class TopK:
+    """The `k` best symmetries by score, in a min-heap whose top is the worst one kept.
+    Ties go to the smaller palindrome, then to the smaller offset."""
+
+    def __init__(self, k: int) -> None:
+        if k <= 0:
+            raise ValueError(f'k must be positive, got {k}')
+        self.k = k
+        self.heap: list[tuple[tuple[int, int, int], Symmetry]] = []
+        self.kept: set[tuple[int, int]] = set()  # (axis, offset) of the heap entries
+
+    def __len__(self) -> int:
+        return len(self.heap)
+
+    @staticmethod
+    def rank(symmetry: Symmetry) -> tuple[int, int, int]:
+        return symmetry.score, -symmetry.axis, -symmetry.offset
+
+    def push(self, symmetry: Symmetry) -> bool:
+        """Keep `symmetry` if it is one of the `k` best so far"""
+        unit = (symmetry.axis, symmetry.offset)
+        if unit in self.kept:
+            return False
+        entry = (self.rank(symmetry), symmetry)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif entry[0] > self.heap[0][0]:
+            _rank, dropped = heapq.heapreplace(self.heap, entry)
+            self.kept.discard((dropped.axis, dropped.offset))
+        else:
+            return False
+        self.kept.add(unit)
+        return True
+
+    def can_improve(self, bound: int) -> bool:
+        """Whether a symmetry scoring at most `bound` could still be kept"""
+        return len(self.heap) < self.k or bound >= self.heap[0][0][0]
+
+    def prune(self, axis: int) -> bool:
+        """Whether the remaining units of `axis` cannot make it to the top (see `search`)"""
+        return not self.can_improve(score_bound(axis))
+
+    def results(self) -> list[Symmetry]:
+        """The symmetries kept, best first"""
+        return [symmetry for _rank, symmetry in sorted(self.heap, reverse=True)]
+
+
+def write_jsonl(symmetries: Iterable[Symmetry], out: TextIO) -> None:
+    for symmetry in symmetries:
+        out.write(json.dumps(symmetry.as_dict()) + '\n')
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    size: int
+
+
+def cache_stats() -> dict[str, CacheStats]:
+    """Statistics of the mask caches of this process"""
+    stats = {}
+    for cached in (
+        get_elf_mask,
+        get_pe_mask,
+        elf_nibble_mask,
+        pe_nibble_mask,
+        get_palindrome,
+        axis_intersection,
+        axis_state,
+        score_bound,
+    ):
+        info = cached.cache_info()
+        stats[cached.__name__] = CacheStats(info.hits, info.misses, info.currsize)
+    return stats
+
+
+def sum_cache_stats(all_stats: Iterable[dict[str, CacheStats]]) -> dict[str, CacheStats]:
+    total: dict[str, CacheStats] = {}
+    for stats in all_stats:
+        for name, (hits, misses, size) in stats.items():
+            previous = total.get(name, CacheStats(0, 0, 0))
+            total[name] = CacheStats(previous.hits + hits, previous.misses + misses, previous.size + size)
+    return total
+
+
+def check_units(
+    units: list[tuple[int, int]],
+    min_score: int = 0,
+    vectorized: bool = False,
+) -> tuple[list[Symmetry], int, dict[str, CacheStats]]:
+    """Worker side of `search`: check a batch of (axis, offset) units. Also returns the
+    pid of the worker and the statistics of its caches."""
+    if vectorized:
+        # Only the vectorized mode needs NumPy
+        from symmetry_batch import candidate_offsets
+    found = []
+    for axis, offset in units:
+        _inter, res0 = axis_intersection(axis)
+        state = axis_state(axis)
+        if state is None or (vectorized and offset not in candidate_offsets(axis)) or not state.feasible(offset):
+            continue
+        symmetry = check_offset(axis, offset, res0)
+        if symmetry is not None and symmetry.score >= min_score:
+            found.append(symmetry)
+    return found, os.getpid(), cache_stats()
+
+
+def search(
+    axes: Iterable[int],
+    *,
+    min_score: int = 0,
+    jobs: int | None = None,
+    batch_size: int = 64,
+    progress: Callable[[int, int, int], None] | None = None,
+    stats: dict[str, CacheStats] | None = None,
+    prune: Callable[[int], bool] | None = None,
+    vectorized: bool = False,
+) -> Iterator[Symmetry]:
+    """Check every (axis, offset) unit in a process pool and yield the symmetries as
+    the workers find them (in order with jobs=1). The units are sent in batches and
+    only a bounded number of batches are in flight. `progress(axis, done, total)` is
+    called when all the units of an axis have been checked, and `stats` is filled with
+    the statistics of the caches of all the workers at the end.
+
+    The units of the axes whose `score_bound` is below `min_score`, or for which
+    `prune(axis)` holds when they are about to be sent, are skipped (e.g. `TopK.prune`
+    stops the search once no axis left can beat the symmetries kept).
+
+    With `vectorized`, the workers first drop the offsets of an axis that
+    `symmetry_batch.candidate_offsets` rules out, all at once with NumPy."""
+    axes = list(dict.fromkeys(axes))
+    remaining = {axis: len(pe_offsets(axis)) for axis in axes}
+    done_axes = 0
+
+    def axis_done(axis: int) -> None:
+        nonlocal done_axes
+        done_axes += 1
+        if progress is not None:
+            progress(axis, done_axes, len(axes))
+
+    def completed(units: list[tuple[int, int]]) -> None:
+        for axis, _offset in units:
+            remaining[axis] -= 1
+            if remaining[axis] == 0:
+                axis_done(axis)
+
+    for axis in axes:
+        if remaining[axis] == 0:
+            # Too short to hold a program header
+            axis_done(axis)
+
+    def axis_units(axis: int) -> Iterator[tuple[int, int]]:
+        offsets = pe_offsets(axis)
+        for k, offset in enumerate(offsets):
+            if score_bound(axis) < min_score or (prune is not None and prune(axis)):
+                completed([(axis, skipped) for skipped in offsets[k:]])
+                return
+            yield axis, offset
+
+    units = (unit for axis in axes for unit in axis_units(axis))
+    jobs = jobs or os.cpu_count() or 1
+    worker_stats: dict[int, dict[str, CacheStats]] = {}  # Pid -> latest statistics
+    if jobs == 1:
+        while batch := list(itertools.islice(units, batch_size)):
+            found, pid, worker_stats[pid] = check_units(batch, min_score, vectorized)
+            yield from found
+            completed(batch)
+    else:
+        max_pending = jobs * 2
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            pending: dict[Future[tuple[list[Symmetry], int, dict[str, CacheStats]]], list[tuple[int, int]]] = {}
+            while True:
+                batch = list(itertools.islice(units, batch_size))
+                if batch:
+                    pending[executor.submit(check_units, batch, min_score, vectorized)] = batch
+                if not pending:
+                    break
+                if batch and len(pending) < max_pending:
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    found, pid, worker_stats[pid] = future.result()
+                    yield from found
+                    completed(pending.pop(future))
+    if stats is not None:
+        stats.update(sum_cache_stats(worker_stats.values()))
+
+
+def print_symmetry(symmetry: Symmetry) -> None:
+    i, offset, elf, res, us = symmetry
+    reconstructed_placeholders = reconstruct_placeholders(res)
+    print(
+        f'Symmetry found at axis {i}: score {len(elf)//2}\n'
+        f'  - offset {offset//2}\n'
+        f'  - elf: {elf}\n'
+        f'  - Resolutions: {res}\n'
+        f'  - Reconstructed: {reconstructed_placeholders}\n'
+        f'  - Usable bytes: {us//2}\n'
+        f'  - ELF header: {elf[:len(get_elf_mask())]}\n'
+        f'  - PE header: {elf[offset:offset+len(get_pe_mask())]}\n',
+    )
+
+
 # print(get_elf_mask())
 # print(len(get_elf_mask()))
 # print(len(get_pe_mask()))
@@ -291,27 +657,86 @@ elf04 = '7F454C4680CD939680CDC90F2CB504B0020003006853B2433B002C002C0000000000000
 elf81 = '7F454C46B25143B52C0FC9B004CD8068020003009693CD8004002c002C0000002C000000010020000\
 0002000010000002C0000002C002c000480CD9396000300026880CD04B0C90F2CB54351B2464C457F'
 
-# if valid_intersection(elf01, get_elf_mask(e_entry="04003200", e_phoff=int_to_hex_le(100 // 2, 4)))[0] != "":
-#    print("Valid intersection elf01")
-#
-# if valid_intersection(elf01, get_palindrome(elf01, 89)) != ("", {}):
-#    print("elf01 is symmetric at axis 89")
-#
-# if valid_intersection(elf02, get_elf_mask(e_entry="82003200", e_phoff=int_to_hex_le(100 // 2, 4)))[0] != "":
-#    print("Valid intersection elf02")
-#
-# if valid_intersection(elf02, get_palindrome(elf02, 89)) != ("", {}):
-#    print("elf02 is symmetric at axis 89")
-#
-# if valid_intersection(elf04, get_elf_mask(e_entry="3B002C00", e_phoff=int_to_hex_le(44 // 2, 4)))[0] != "":
-#    print("Valid intersection elf04")
-#
-if valid_intersection(elf04, get_palindrome(elf04, 83)) != ('', {}):
-    print('elf04 is symmetric at axis 83')
-if valid_intersection(elf81, get_palindrome(elf81, 81)) != ('', {}):
-    print('elf81 is symmetric at axis 81')
-
-# print(elf01)
-# print(elf02)
-print(elf04)
-print(elf81)
+def check_examples() -> None:
+    # if valid_intersection(elf01, get_elf_mask(e_entry="04003200", e_phoff=int_to_hex_le(100 // 2, 4)))[0] != "":
+    #    print("Valid intersection elf01")
+    #
+    # if valid_intersection(elf01, get_palindrome(elf01, 89)) != ("", {}):
+    #    print("elf01 is symmetric at axis 89")
+    #
+    # if valid_intersection(elf02, get_elf_mask(e_entry="82003200", e_phoff=int_to_hex_le(100 // 2, 4)))[0] != "":
+    #    print("Valid intersection elf02")
+    #
+    # if valid_intersection(elf02, get_palindrome(elf02, 89)) != ("", {}):
+    #    print("elf02 is symmetric at axis 89")
+    #
+    # if valid_intersection(elf04, get_elf_mask(e_entry="3B002C00", e_phoff=int_to_hex_le(44 // 2, 4)))[0] != "":
+    #    print("Valid intersection elf04")
+    #
+    mask04 = NibbleMask.from_str(elf04)
+    if valid_intersection(mask04, get_palindrome(mask04, 83))[0] is not None:
+        print('elf04 is symmetric at axis 83')
+    mask81 = NibbleMask.from_str(elf81)
+    if valid_intersection(mask81, get_palindrome(mask81, 81))[0] is not None:
+        print('elf81 is symmetric at axis 81')
+
+    # print(elf01)
+    # print(elf02)
+    print(elf04)
+    print(elf81)
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Search the axes and program header offsets of the quinindrome')
+    argparser.add_argument('--min-axis', type=int, default=len(get_elf_mask()) // 2, help='smallest size in bytes')
+    argparser.add_argument('--max-axis', type=int, default=len(get_elf_mask()) - 12, help='largest size (excluded)')
+    argparser.add_argument('--min-score', type=int, default=20, help='minimum is_usable score of a symmetry')
+    argparser.add_argument('-j', '--jobs', type=int, default=None, help='worker processes (default: all the cores)')
+    argparser.add_argument('--batch-size', type=int, default=64, help='(axis, offset) units per task')
+    argparser.add_argument('--no-examples', dest='examples', action='store_false', help='skip the known headers')
+    argparser.add_argument('--cache-stats', action='store_true', help='print the statistics of the mask caches')
+    argparser.add_argument('--top', type=int, default=0, help='only print the K best symmetries, best first')
+    argparser.add_argument('--jsonl', action='store_true', help='print the symmetries as JSON lines')
+    argparser.add_argument('--vectorized', action='store_true', help='prefilter the offsets of each axis with NumPy')
+    args = argparser.parse_args()
+    if args.top < 0:
+        argparser.error('--top must be positive')
+
+    def progress(axis: int, done: int, total: int) -> None:
+        print(f'[{done}/{total}] axis {axis} done', file=sys.stderr, flush=True)
+
+    def output(symmetries: Iterable[Symmetry]) -> None:
+        for symmetry in symmetries:
+            if args.jsonl:
+                write_jsonl([symmetry], sys.stdout)
+            else:
+                print_symmetry(symmetry)
+            sys.stdout.flush()
+
+    stats: dict[str, CacheStats] = {}
+    top = TopK(args.top) if args.top else None
+    found = search(
+        range(args.min_axis, args.max_axis),
+        min_score=args.min_score,
+        jobs=args.jobs,
+        batch_size=args.batch_size,
+        progress=progress,
+        stats=stats,
+        prune=top.prune if top is not None else None,
+        vectorized=args.vectorized,
+    )
+    if top is None:
+        output(found)
+    else:
+        for symmetry in found:
+            top.push(symmetry)
+        output(top.results())
+    if args.cache_stats:
+        for name, (hits, misses, size) in stats.items():
+            print(f'{name}: {hits} hits, {misses} misses, {size} entries', file=sys.stderr)
+    if args.examples:
+        check_examples()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Vectorized check of all the program header offsets of an axis.
+
+The closed ELF mask of the axis (`axis_intersection`) is encoded once as an array of
+nibble codes (the digit, -1 for a wildcard, 16 + the placeholder id otherwise) and
+broadcast to one row per offset. Only e_phoff depends on the offset: each row gets
+the digits of its offset on every nibble of the classes of the e_phoff nibbles. The
+program header template is then compared with the window of each row at its offset
+(one fancy-indexed gather), with its own mirror and with the digits its placeholders
+meet, so the offsets where two different digits meet are dropped in one pass.
+
+These checks only ever drop infeasible offsets, but the unions between placeholders
+are left to the union-find of `close`, which `feasible_offsets` runs on the offsets
+left: `check_symmetry` gives the same symmetries as `symmetries.check_symmetry`.
+"""
+
+import argparse
+from functools import cache
+
+import numpy as np
+
+from nibble_mask import HEX_DIGITS, WILDCARD, NibbleMask, placeholder_id
+from symmetries import (
+    E_PHOFF,
+    ELF_HEADER,
+    Symmetry,
+    axis_intersection,
+    check_offset,
+    pe_nibble_mask,
+    pe_offsets,
+    print_symmetry,
+)
+
+E_PHOFF_SHIFTS = np.array(ELF_HEADER.field('e_phoff').nibble_shifts())  # Nibbles of the value, in file order
+PLACEHOLDER_BASE = 16
+
+
+def encode(mask: NibbleMask) -> np.ndarray:
+    """Nibble codes of the mask: 0..15 for the digits, -1 for the wildcards, 16 + id for the placeholders"""
+    return np.array(
+        [
+            int(char, 16) if char in HEX_DIGITS else -1 if char == WILDCARD else PLACEHOLDER_BASE + placeholder_id(char)
+            for char in str(mask)
+        ],
+        dtype=np.int16,
+    )
+
+
+def is_digit(codes: np.ndarray) -> np.ndarray:
+    return (codes >= 0) & (codes < PLACEHOLDER_BASE)
+
+
+def mirror(positions: np.ndarray, size: int) -> np.ndarray:
+    """Nibble positions of the mirrors in a byte palindrome of `size` nibbles"""
+    return size - 2 - positions // 2 * 2 + positions % 2
+
+
+def patch_e_phoff(base: np.ndarray, offsets: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """One row of `base` per offset with e_phoff set to the offset, and the rows where
+    a nibble of e_phoff conflicts"""
+    digits = offsets[:, None] // 2 >> E_PHOFF_SHIFTS & 0xF
+    rows = np.repeat(base[None, :], len(offsets), axis=0)
+    bad = np.zeros(len(offsets), dtype=bool)
+    for j, code in enumerate(base[E_PHOFF : E_PHOFF + len(E_PHOFF_SHIFTS)]):
+        if 0 <= code < PLACEHOLDER_BASE:
+            bad |= digits[:, j] != code
+            continue
+        # The mask is closed: the class, or the wildcard and its mirror, is the whole
+        # set of nibbles that take the digit
+        position = E_PHOFF + j
+        if code >= PLACEHOLDER_BASE:
+            columns = np.flatnonzero(base == code)
+        else:
+            columns = np.array([position, mirror(np.array(position), len(base))])
+        previous = rows[:, position]
+        bad |= is_digit(previous) & (previous != digits[:, j])  # Set by an earlier nibble of the class
+        rows[:, columns] = digits[:, j, None]
+    return rows, bad
+
+
+@cache
+def candidate_offsets(axis: int) -> frozenset[int]:
+    """Nibble offsets of the program header at `axis` where no two different digits meet"""
+    inter, _ = axis_intersection(axis)
+    offsets = np.array(pe_offsets(axis))
+    if inter is None or not len(offsets):
+        return frozenset()
+    rows, bad = patch_e_phoff(encode(inter), offsets)
+    pe = encode(pe_nibble_mask())
+    pe_digit = is_digit(pe)
+    everywhere = np.arange(len(offsets))[:, None]
+
+    # The program header against the row under it (and its mirror, which is the same in a closed row)
+    windows = offsets[:, None] + np.arange(len(pe))
+    under = rows[everywhere, windows]
+    bad |= (pe_digit & is_digit(under) & (under != pe)).any(axis=1)
+
+    # The program header against itself where it overlaps its mirror
+    mirrored = mirror(windows, inter.size) - offsets[:, None]
+    overlaps = (mirrored >= 0) & (mirrored < len(pe))
+    facing = pe[np.clip(mirrored, 0, len(pe) - 1)]
+    bad |= (overlaps & pe_digit & is_digit(facing) & (facing != pe)).any(axis=1)
+
+    # Each placeholder of the program header has to meet one digit at most
+    met = np.where(is_digit(under), under, -1)
+    met_facing = np.where(overlaps & is_digit(facing), facing, -1)
+    for code in np.unique(pe[pe >= PLACEHOLDER_BASE]):
+        columns = pe == code
+        digits = np.concatenate([met[:, columns], met_facing[:, columns]], axis=1)
+        highest = digits.max(axis=1)
+        lowest = np.where(digits >= 0, digits, PLACEHOLDER_BASE).min(axis=1)
+        bad |= (highest >= 0) & (lowest != highest)
+    return frozenset(offsets[~bad].tolist())
+
+
+def feasible_offsets(axis: int) -> list[Symmetry]:
+    """The symmetries at `axis`, `check_offset` only running on the candidate offsets"""
+    _inter, res0 = axis_intersection(axis)
+    candidates = candidate_offsets(axis)
+    found = (check_offset(axis, offset, res0) for offset in pe_offsets(axis) if offset in candidates)
+    return [symmetry for symmetry in found if symmetry is not None]
+
+
+def check_symmetry(axis: int) -> dict[int, tuple[str, dict[str, str]]]:
+    """`symmetries.check_symmetry` with the vectorized prefilter"""
+    return {symmetry.offset: (symmetry.elf, symmetry.resolutions) for symmetry in feasible_offsets(axis)}
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Check the program header offsets of the axes in one pass each')
+    argparser.add_argument('--min-axis', type=int, default=48)
+    argparser.add_argument('--max-axis', type=int, default=84, help='excluded')
+    argparser.add_argument('--min-score', type=int, default=20, help='minimum is_usable score of a symmetry')
+    args = argparser.parse_args()
+    for axis in range(args.min_axis, args.max_axis):
+        for symmetry in feasible_offsets(axis):
+            if symmetry.score >= args.min_score:
+                print_symmetry(symmetry)
+
+
+if __name__ == '__main__':
+    main()
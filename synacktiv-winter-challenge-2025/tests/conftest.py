@@ -0,0 +1,20 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules are scripts in the parent directory, not an installed package
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mirror import mirror  # noqa: E402
+
+# First half of quiny95.asm assembled by hand, the file is its mirror on an odd axis
+QUINY95_HALF = bytes.fromhex(
+    '7f454c46 01000000 00000000 0000900d 0200 0300 b25f4306 1400900d 04000000'  # Headers
+    'b1d9 c1e114 cd80 96 93 a9 2000 0100 cd80',  # Code
+)
+
+
+@pytest.fixture
+def quiny95() -> bytes:
+    return mirror(QUINY95_HALF)
@@ -0,0 +1,49 @@
+from elf_parser import ElfParser, Phdr, PhType, SegmentMap
+
+PT_LOAD = PhType.PT_LOAD.value
+
+
+def load(offset: int, vaddr: int, filesz: int, memsz: int) -> Phdr:
+    return Phdr(PT_LOAD, offset, vaddr, vaddr, filesz, memsz, 5, 0x1000)
+
+
+def test_segment_maps_from_the_page_start() -> None:
+    segments = SegmentMap([load(0x10, 0x08048010, 0x100, 0x100)])
+    (mapping,) = segments.mappings
+    assert (mapping.start, mapping.end, mapping.file_start) == (0x08048000, 0x08049000, 0)
+    # Without bss the rest of the last page still holds the file
+    assert mapping.file_end == 0x08049000
+    assert segments.vaddr_to_offset(0x08048000) == 0
+    assert segments.vaddr_to_offset(0x08048FFF) == 0xFFF
+    assert segments.offset_to_vaddr(0x10) == 0x08048010
+    assert segments.lookup(0x08049000) is None
+
+
+def test_segment_bss_is_not_file_backed() -> None:
+    segments = SegmentMap([load(0, 0x10000, 0x20, 0x2000)])
+    (mapping,) = segments.mappings
+    assert (mapping.file_end, mapping.end) == (0x10020, 0x12000)
+    assert segments.vaddr_to_offset(0x1001F) == 0x1F
+    assert segments.vaddr_to_offset(0x10020) is None
+    assert segments.offset_to_vaddr(0x20) is None
+
+
+def test_later_segment_replaces_the_pages_it_maps() -> None:
+    segments = SegmentMap([load(0, 0x10000, 0x3000, 0x3000), load(0x5000, 0x11000, 0x1000, 0x1000)])
+    assert [(m.start, m.end, m.index) for m in segments.mappings] == [
+        (0x10000, 0x11000, 0),
+        (0x11000, 0x12000, 1),
+        (0x12000, 0x13000, 0),
+    ]
+    assert segments.vaddr_to_offset(0x11000) == 0x5000
+    assert segments.vaddr_to_offset(0x12000) == 0x2000
+
+
+def test_parse_twice_keeps_one_table(tmp_path, quiny95: bytes) -> None:
+    path = tmp_path / 'quiny95'
+    path.write_bytes(quiny95)
+    parser = ElfParser(str(path), verbose=False)
+    assert parser.parse()
+    assert parser.parse()
+    assert len(parser.phdrs) == 1
+    assert parser.phdrs[0].p_vaddr == 0x0D900000
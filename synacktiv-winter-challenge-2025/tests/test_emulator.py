@@ -0,0 +1,55 @@
+import struct
+
+import pytest
+
+from elf_parser import PAGE_SIZE
+from emulator import EFAULT, MASK32, SYS_WRITE, Emulator, Fault, handler_of, verify
+from x86_decoder import decode
+
+ORG = 0x0D900000
+P_VADDR = 4 + 8  # quiny95 lays its program header at offset 4
+
+
+def patched(data: bytes, offset: int, value: int) -> bytes:
+    """`data` with the dword at `offset` and its mirror set to `value`"""
+    image = bytearray(data)
+    field = struct.pack('<I', value)
+    image[offset : offset + 4] = field
+    image[len(image) - offset - 4 : len(image) - offset] = field[::-1]
+    return bytes(image)
+
+
+def test_quiny95_is_a_quinindrome(quiny95: bytes) -> None:
+    verdict = verify(quiny95)
+    assert verdict.ok, verdict
+    assert verdict.size == 95
+
+
+def test_write_from_unreadable_page(quiny95: bytes) -> None:
+    emulator = Emulator(quiny95)
+    # A PF_X only page: executable but not readable
+    emulator.pages[ORG // PAGE_SIZE] = (bytearray(quiny95.ljust(PAGE_SIZE, b'\0')), False, False, True)
+    assert emulator.read_bytes(ORG, len(quiny95)) == b''
+    emulator.regs[:4] = [SYS_WRITE, ORG, len(quiny95), 1]
+    emulator.syscall()
+    assert emulator.regs[0] == -EFAULT & MASK32
+    assert emulator.stdout == b''
+
+
+def test_segment_below_mmap_min_addr(quiny95: bytes) -> None:
+    verdict = verify(patched(quiny95, P_VADDR, 0x8000))
+    assert not verdict.ok
+    assert verdict.error is not None and 'mmap_min_addr' in verdict.error
+
+
+def test_idiv_signed_range(quiny95: bytes) -> None:
+    emulator = Emulator(quiny95)
+    idiv_ecx = decode(bytes.fromhex('f7 f9'))
+    assert idiv_ecx is not None
+    # -2^31 / 1 fits, 2^31 / 1 does not
+    emulator.regs[0], emulator.regs[1], emulator.regs[2] = 0x80000000, 1, 0xFFFFFFFF
+    handler_of(idiv_ecx)(emulator, idiv_ecx)
+    assert emulator.regs[0] == 0x80000000
+    emulator.regs[0], emulator.regs[1], emulator.regs[2] = 0x80000000, 1, 0
+    with pytest.raises(Fault, match='SIGFPE'):
+        handler_of(idiv_ecx)(emulator, idiv_ecx)
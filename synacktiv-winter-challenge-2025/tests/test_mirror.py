@@ -0,0 +1,18 @@
+from mirror import first_mismatch, mirror, mirror_file
+
+
+def test_mirror_axes() -> None:
+    assert mirror(b'abc') == b'abcba'
+    assert mirror(b'abc', 'even') == b'abccba'
+    assert first_mismatch(b'abcba') is None
+    assert first_mismatch(b'abcbb') == 0
+
+
+def test_mirror_file_in_place(tmp_path) -> None:
+    path = tmp_path / 'a'
+    path.write_bytes(b'abc')
+    path.chmod(0o755)
+    assert mirror_file(str(path), str(path)) == 5
+    assert path.read_bytes() == b'abcba'
+    assert path.stat().st_mode & 0o777 == 0o755
+    assert [p.name for p in tmp_path.iterdir()] == ['a']
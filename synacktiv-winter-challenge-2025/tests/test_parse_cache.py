@@ -0,0 +1,34 @@
+import os
+
+from elf_parser import ElfParser
+from parse_cache import ReportCache
+
+
+def cached_report(path: str, cache: ReportCache) -> dict:
+    return ElfParser(path, verbose=False).cached_report(cache)
+
+
+def test_pointers_stay_in_the_cache(tmp_path, quiny95: bytes) -> None:
+    binaries = tmp_path / 'bin'
+    binaries.mkdir()
+    binary = binaries / 'quinx'
+    binary.write_bytes(quiny95)
+    cache = ReportCache(str(tmp_path / 'cache'))
+    report = cached_report(str(binary), cache)
+    assert os.listdir(binaries) == ['quinx']
+    assert len(os.listdir(tmp_path / 'cache' / 'paths')) == 1
+    assert cache.previous(str(binary), {}) is not None
+
+    assert cached_report(str(binary), cache) == report
+    assert cache.hits == 1
+
+
+def test_evict_removes_the_pointers(tmp_path, quiny95: bytes) -> None:
+    binary = tmp_path / 'quinx'
+    binary.write_bytes(quiny95)
+    cache = ReportCache(str(tmp_path / 'cache'))
+    cached_report(str(binary), cache)
+    cache.max_bytes = 0
+    cache.evict()
+    assert os.listdir(tmp_path / 'cache') == ['paths']
+    assert os.listdir(tmp_path / 'cache' / 'paths') == []
@@ -0,0 +1,13 @@
+import pytest
+
+import symmetries
+import symmetry_batch
+
+
+@pytest.mark.parametrize('axis', range(48, 84))
+def test_prefilter_keeps_the_symmetries(axis: int) -> None:
+    assert symmetry_batch.check_symmetry(axis) == symmetries.check_symmetry(axis)
+
+
+def test_some_axes_have_symmetries() -> None:
+    assert any(symmetries.check_symmetry(axis) for axis in range(48, 84))
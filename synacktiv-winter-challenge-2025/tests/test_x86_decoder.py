@@ -0,0 +1,53 @@
+import pytest
+
+from x86_decoder import Flow, decode, sweep
+
+
+@pytest.mark.parametrize(
+    ('code', 'text'),
+    [
+        ('b2 5f', 'mov dl, 0x5f'),
+        ('c1 e1 14', 'shl ecx, 20'),
+        ('cd 80', 'int 0x80'),
+        ('a9 20 00 01 00', 'test eax, 0x10020'),
+        ('8b 44 24 08', 'mov eax, [esp+0x8]'),
+        ('8d 04 8d 00 00 00 00', 'lea eax, [ecx*4]'),
+        ('81 c3 78 56 34 12', 'add ebx, 0x12345678'),
+        ('eb fe', 'jmp short 0x0 (-2)'),
+        ('0f b6 c0', 'movzx eax, al'),
+        # Prefixes
+        ('66 b8 34 12', 'mov ax, 0x1234'),
+        ('66 a1 12 34 56 78', 'mov ax, [0x78563412]'),
+        ('67 a1 12 34', 'mov eax, [0x3412]'),
+        ('64 a1 00 00 00 00', 'mov eax, fs:[0x0]'),
+        ('f3 a4', 'rep movsb'),
+        ('f2 ae', 'repne scasb'),
+        ('a7', 'cmpsd'),
+    ],
+)
+def test_decode(code: str, text: str) -> None:
+    raw = bytes.fromhex(code)
+    instruction = decode(raw)
+    assert instruction is not None
+    assert instruction.raw == raw
+    assert instruction.text == text
+
+
+def test_decode_truncated() -> None:
+    assert decode(bytes.fromhex('b8 01 02')) is None
+
+
+def test_address_size_modrm_is_invalid() -> None:
+    instruction = decode(bytes.fromhex('67 8b 03'))
+    assert instruction is not None and instruction.flow is Flow.INVALID
+
+
+def test_sweep_stays_in_step() -> None:
+    code = bytes.fromhex('66 a1 90 90 90 90 66 b8 90 90 cd 80')
+    assert [instruction.address for instruction in sweep(code)] == [0, 6, 10]
+
+
+def test_branch_target() -> None:
+    instruction = decode(bytes.fromhex('e8 fb ff ff ff'), address=0x1000)
+    assert instruction is not None
+    assert instruction.flow is Flow.CALL and instruction.target == 0x1000
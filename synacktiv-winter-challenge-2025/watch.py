@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""Watch the quiny*.asm sources and rebuild/verify them as soon as they are saved.
+
+This replaces the chain of the README (nasm, mirror.py, running the binary, xxd,
+diff, test.sh): only `nasm` is still a separate process, the mirror step, the
+palindrome/quine/exit code checks (with the emulator, nothing is executed) and
+the header diagnostics (ElfParser) run in-process. A source is only rebuilt when
+its content changed, and only verified again when the binary changed. Changes
+are detected with inotify on Linux and by polling the mtimes elsewhere.
+"""
+
+import argparse
+import ctypes
+import fnmatch
+import hashlib
+import os
+import select
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+from typing import NamedTuple
+
+from elf_parser import ElfParser
+from emulator import Verdict, verify
+from mirror import mirror
+
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+INOTIFY_EVENT = struct.Struct('iIII')  # wd, mask, cookie, len (followed by the name)
+
+
+class InotifyWatcher:
+    """Names of the files of `directory` written or moved in, through inotify"""
+
+    def __init__(self, directory: str) -> None:
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        # Editors either rewrite the file in place or rename a temporary file over it
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f'inotify_add_watch failed on {directory}')
+
+    def changes(self, timeout: float) -> set[str]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 1 << 16)
+        names = set()
+        offset = 0
+        while offset < len(data):
+            _wd, _mask, _cookie, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            names.add(os.fsdecode(data[offset : offset + length].rstrip(b'\x00')))
+            offset += length
+        return names
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class PollingWatcher:
+    """Names of the files of `directory` whose mtime or size changed, by polling"""
+
+    def __init__(self, directory: str, interval: float = 0.02) -> None:
+        self.directory = directory
+        self.interval = interval
+        self.stats = self.scan()
+
+    def scan(self) -> dict[str, tuple[int, int]]:
+        stats = {}
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file():
+                    stat = entry.stat()
+                    stats[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def changes(self, timeout: float) -> set[str]:
+        deadline = time.monotonic() + timeout
+        while True:
+            stats = self.scan()
+            changed = {name for name, stat in stats.items() if self.stats.get(name) != stat}
+            self.stats = stats
+            if changed or time.monotonic() >= deadline:
+                return changed
+            time.sleep(self.interval)
+
+    def close(self) -> None:
+        pass
+
+
+class BuildResult(NamedTuple):
+    source: str
+    size: int  # Size of the quinindrome
+    verdict: Verdict | None
+    diagnostics: list[str]  # Assembler messages, ElfParser notes
+    elapsed: float
+
+    @property
+    def ok(self) -> bool:
+        return self.verdict is not None and self.verdict.ok
+
+    def summary(self) -> str:
+        if self.verdict is None:
+            status = 'BUILD FAILED'
+        else:
+            checks = [
+                f'palindrome {"ok" if self.verdict.palindrome else "KO"}',
+                f'quine {"ok" if self.verdict.quine else "KO"}',
+                f'exit {self.verdict.exit_code}',
+            ]
+            status = ('PASS  ' if self.ok else 'FAIL  ') + '  '.join(checks)
+            if self.verdict.error:
+                status += f'  ({self.verdict.error})'
+        return f'{self.source}: {self.size:4} bytes  {status}  [{self.elapsed * 1000:.1f} ms]'
+
+
+def assemble(source: str, assembler: str) -> tuple[bytes | None, str]:
+    """Assemble a flat binary with nasm, return it (None on error) and the messages"""
+    fd, output = tempfile.mkstemp(suffix='.bin')
+    os.close(fd)
+    try:
+        result = subprocess.run(
+            [assembler, '-f', 'bin', source, '-o', output], check=False, capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            return None, result.stderr.strip()
+        with open(output, 'rb') as f:
+            return f.read(), result.stderr.strip()
+    except OSError as e:
+        return None, str(e)
+    finally:
+        os.remove(output)
+
+
+class Builder:
+    """Rebuild and verify the sources, remembering what was already done"""
+
+    def __init__(self, out_dir: str, *, assembler: str = 'nasm', mirrored: bool = True) -> None:
+        self.out_dir = out_dir
+        self.assembler = assembler
+        self.mirrored = mirrored
+        self.sources: dict[str, str] = {}  # Path -> digest of the last source built
+        self.binaries: dict[str, BuildResult] = {}  # Digest of a quinindrome -> its result
+        os.makedirs(out_dir, exist_ok=True)
+
+    def build(self, source: str) -> BuildResult | None:
+        """Build `source` if its content changed since the last build (None otherwise)"""
+        start = time.perf_counter()
+        with open(source, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        if self.sources.get(source) == digest:
+            return None
+        self.sources[source] = digest
+        name = os.path.basename(source)
+
+        half, messages = assemble(source, self.assembler)
+        if half is None:
+            return BuildResult(name, 0, None, [messages], time.perf_counter() - start)
+        data = mirror(half) if self.mirrored else half
+        stem = os.path.splitext(name)[0]
+        output = os.path.join(self.out_dir, f'{stem}.quinindrome' if self.mirrored else stem)
+        with open(output, 'wb') as f:
+            f.write(data)
+        os.chmod(output, 0o755)
+
+        binary_digest = hashlib.sha256(data).hexdigest()
+        previous = self.binaries.get(binary_digest)
+        if previous is not None:
+            # Only comments or formatting changed: same binary, same verdict
+            return previous._replace(elapsed=time.perf_counter() - start)
+
+        diagnostics = [messages] if messages else []
+        with ElfParser(output, verbose=False) as parser:
+            if parser.parse() and parser.entry_file_offset() is None:
+                parser.note(f'entry point 0x{parser.ehdr.e_entry:x} is not loaded from the file')
+            diagnostics.extend(note.strip() for note in parser.notes if note.strip())
+        result = BuildResult(name, len(data), verify(data), diagnostics, time.perf_counter() - start)
+        self.binaries[binary_digest] = result
+        return result
+
+
+def report(result: BuildResult) -> None:
+    """One line per build, followed by the diagnostics when it failed"""
+    print(result.summary())
+    if not result.ok:
+        for diagnostic in result.diagnostics:
+            print(f'    {diagnostic}')
+    sys.stdout.flush()
+
+
+def main() -> None:
+    argparser = argparse.ArgumentParser(description='Rebuild and verify the quinindrome sources when they change')
+    argparser.add_argument('patterns', nargs='*', default=['quiny*.asm'], help='sources to watch (default: quiny*.asm)')
+    argparser.add_argument('--dir', default='.', help='directory holding the sources')
+    argparser.add_argument('--out', default='build', help='where the binaries are written')
+    argparser.add_argument('--assembler', default='nasm')
+    argparser.add_argument('--no-mirror', dest='mirrored', action='store_false', help='the sources are whole quines')
+    argparser.add_argument('--poll', action='store_true', help='poll the mtimes instead of using inotify')
+    argparser.add_argument('--once', action='store_true', help='build everything once and exit')
+    args = argparser.parse_args()
+
+    builder = Builder(os.path.join(args.dir, args.out), assembler=args.assembler, mirrored=args.mirrored)
+
+    def matching(names: set[str]) -> list[str]:
+        return sorted(name for name in names if any(fnmatch.fnmatch(name, pattern) for pattern in args.patterns))
+
+    all_ok = True
+    for name in matching(set(os.listdir(args.dir))):
+        result = builder.build(os.path.join(args.dir, name))
+        if result is not None:
+            report(result)
+            all_ok &= result.ok
+    if args.once:
+        sys.exit(0 if all_ok else 1)
+
+    watcher: InotifyWatcher | PollingWatcher
+    try:
+        watcher = PollingWatcher(args.dir) if args.poll else InotifyWatcher(args.dir)
+    except (OSError, AttributeError):
+        # No inotify (not Linux)
+        watcher = PollingWatcher(args.dir)
+    print(f'Watching {", ".join(args.patterns)} in {args.dir} ({type(watcher).__name__})')
+    try:
+        while True:
+            for name in matching(watcher.changes(1.0)):
+                path = os.path.join(args.dir, name)
+                if os.path.exists(path):
+                    result = builder.build(path)
+                    if result is not None:
+                        report(result)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,457 @@
+#!/usr/bin/env python3
+"""Table driven decoder for the (golfed) 32-bit x86 code found in tiny ELFs.
+
+Every opcode is described once by an `OpcodeEntry` in a 256 entries table (plus
+the 0x0F escape table and the ModRM.reg extended groups), so decoding an
+instruction is a table lookup followed by the ModRM / immediate fetch described
+by the entry. The result is an `Instruction` and the text is only formatted
+when it is asked for, which keeps linear sweeps of whole segments cheap.
+"""
+
+import struct
+import sys
+from collections.abc import Iterator
+from enum import Enum
+from typing import NamedTuple
+
+REG32_NAMES = ('eax', 'ecx', 'edx', 'ebx', 'esp', 'ebp', 'esi', 'edi')
+REG16_NAMES = ('ax', 'cx', 'dx', 'bx', 'sp', 'bp', 'si', 'di')
+REG8_NAMES = ('al', 'cl', 'dl', 'bl', 'ah', 'ch', 'dh', 'bh')
+MAX_INSTRUCTION_SIZE = 15
+CONDITIONS = ('o', 'no', 'b', 'ae', 'z', 'nz', 'be', 'a', 's', 'ns', 'p', 'np', 'l', 'ge', 'le', 'g')
+
+# Legacy prefixes consumed before the opcode
+SEGMENT_PREFIXES = {0x26: 'es', 0x2E: 'cs', 0x36: 'ss', 0x3E: 'ds', 0x64: 'fs', 0x65: 'gs'}
+REPEAT_PREFIXES = {0xF0: 'lock', 0xF2: 'repne', 0xF3: 'rep'}
+OPERAND_SIZE_PREFIX = 0x66
+ADDRESS_SIZE_PREFIX = 0x67
+PREFIXES = frozenset(SEGMENT_PREFIXES) | frozenset(REPEAT_PREFIXES) | {OPERAND_SIZE_PREFIX, ADDRESS_SIZE_PREFIX}
+# Immediate format of the memory offset of mov al/eax, [moffs], sized by the address size
+MOFFS = 'A'
+# With the operand size prefix the 32-bit immediates and mnemonics shrink to 16 bits
+IMM16_FORMATS = {'I': 'H', 'i': 'h'}
+MNEMONICS16 = {
+    'cwde': 'cbw',
+    'cdq': 'cwd',
+    'pushad': 'pushaw',
+    'popad': 'popaw',
+    'pushfd': 'pushf',
+    'popfd': 'popf',
+    'movsd': 'movsw',
+    'cmpsd': 'cmpsw',
+    'scasd': 'scasw',
+    'stosd': 'stosw',
+    'lodsd': 'lodsw',
+}
+
+
+class ModRM(Enum):
+    NONE = 0  # No ModRM byte
+    REG = 1  # ModRM.reg is a register operand
+    GROUP = 2  # ModRM.reg extends the opcode (see GROUP_TABLES)
+
+
+class Flow(Enum):
+    NEXT = 0  # Execution continues with the next instruction
+    JUMP = 1  # Unconditional relative jump
+    BRANCH = 2  # Conditional relative jump (jcc, loop, jecxz)
+    CALL = 3  # Relative call
+    RET = 4
+    INDIRECT = 5  # Jump or call through a register / memory
+    HALT = 6  # hlt, int3, ud2
+    INVALID = 7  # Opcode unknown to the decoder
+
+
+class OpcodeEntry(NamedTuple):
+    mnemonic: str
+    # Operands template: {r32}/{r8} register (opcode low bits or ModRM.reg),
+    # {rm32}/{rm16}/{rm8} ModRM.rm operand, {imm} hex immediate, {imm_dec} decimal
+    # immediate and {target} destination of a relative branch
+    operands: str = ''
+    modrm: ModRM = ModRM.NONE
+    imm: str = ''  # struct format of the immediate ('' when there is none) or MOFFS
+    flow: Flow = Flow.NEXT
+    rel: bool = False  # The immediate is relative to the next instruction
+
+
+IMM_STRUCTS = {fmt: struct.Struct('<' + fmt) for fmt in 'bBhHiI'}
+DISP8 = IMM_STRUCTS['b']
+DISP32 = IMM_STRUCTS['i']
+
+UNKNOWN = OpcodeEntry('<unknown>', flow=Flow.INVALID)
+UNKNOWN_0F = OpcodeEntry('<unknown 0F opcode>', flow=Flow.INVALID)
+# The 16-bit addressing of the address size prefix changes the ModRM layout and is not decoded
+ADDRESS16 = OpcodeEntry('<16-bit addressing>', flow=Flow.INVALID)
+
+
+def build_one_byte_table() -> list[OpcodeEntry]:
+    table = [UNKNOWN] * 256
+
+    # ALU blocks: add, or, adc, sbb, and, sub, xor, cmp
+    for i, op in enumerate(('add', 'or', 'adc', 'sbb', 'and', 'sub', 'xor', 'cmp')):
+        base = i * 8
+        table[base + 0] = OpcodeEntry(op, '{rm8}, {r8}', ModRM.REG)
+        table[base + 1] = OpcodeEntry(op, '{rm32}, {r32}', ModRM.REG)
+        table[base + 2] = OpcodeEntry(op, '{r8}, {rm8}', ModRM.REG)
+        table[base + 3] = OpcodeEntry(op, '{r32}, {rm32}', ModRM.REG)
+        table[base + 4] = OpcodeEntry(op, 'al, {imm}', imm='B')
+        table[base + 5] = OpcodeEntry(op, 'eax, {imm}', imm='I')
+
+    for opcode, segment in ((0x06, 'es'), (0x0E, 'cs'), (0x16, 'ss'), (0x1E, 'ds')):
+        table[opcode] = OpcodeEntry('push', segment)
+        if segment != 'cs':
+            table[opcode + 1] = OpcodeEntry('pop', segment)
+    table[0x27] = OpcodeEntry('daa')
+    table[0x2F] = OpcodeEntry('das')
+    table[0x37] = OpcodeEntry('aaa')
+    table[0x3F] = OpcodeEntry('aas')
+
+    for reg in range(8):
+        table[0x40 + reg] = OpcodeEntry('inc', '{r32}')
+        table[0x48 + reg] = OpcodeEntry('dec', '{r32}')
+        table[0x50 + reg] = OpcodeEntry('push', '{r32}')
+        table[0x58 + reg] = OpcodeEntry('pop', '{r32}')
+        table[0x90 + reg] = OpcodeEntry('xchg', 'eax, {r32}')
+        table[0xB0 + reg] = OpcodeEntry('mov', '{r8}, {imm}', imm='B')
+        table[0xB8 + reg] = OpcodeEntry('mov', '{r32}, {imm}', imm='I')
+    table[0x90] = OpcodeEntry('nop')
+
+    table[0x60] = OpcodeEntry('pushad')
+    table[0x61] = OpcodeEntry('popad')
+    table[0x68] = OpcodeEntry('push', '{imm}', imm='I')
+    table[0x69] = OpcodeEntry('imul', '{r32}, {rm32}, {imm}', ModRM.REG, 'I')
+    table[0x6A] = OpcodeEntry('push', '{imm}', imm='b')
+    table[0x6B] = OpcodeEntry('imul', '{r32}, {rm32}, {imm}', ModRM.REG, 'b')
+
+    for cc in range(16):
+        table[0x70 + cc] = OpcodeEntry('j' + CONDITIONS[cc], '{target}', imm='b', flow=Flow.BRANCH, rel=True)
+
+    table[0x80] = OpcodeEntry('<group 1>', modrm=ModRM.GROUP)
+    table[0x81] = OpcodeEntry('<group 1>', modrm=ModRM.GROUP)
+    table[0x83] = OpcodeEntry('<group 1>', modrm=ModRM.GROUP)
+    table[0x84] = OpcodeEntry('test', '{rm8}, {r8}', ModRM.REG)
+    table[0x85] = OpcodeEntry('test', '{rm32}, {r32}', ModRM.REG)
+    table[0x86] = OpcodeEntry('xchg', '{rm8}, {r8}', ModRM.REG)
+    table[0x87] = OpcodeEntry('xchg', '{rm32}, {r32}', ModRM.REG)
+    table[0x88] = OpcodeEntry('mov', '{rm8}, {r8}', ModRM.REG)
+    table[0x89] = OpcodeEntry('mov', '{rm32}, {r32}', ModRM.REG)
+    table[0x8A] = OpcodeEntry('mov', '{r8}, {rm8}', ModRM.REG)
+    table[0x8B] = OpcodeEntry('mov', '{r32}, {rm32}', ModRM.REG)
+    table[0x8D] = OpcodeEntry('lea', '{r32}, {rm32}', ModRM.REG)
+    table[0x8F] = OpcodeEntry('<group 1a>', modrm=ModRM.GROUP)
+
+    table[0x98] = OpcodeEntry('cwde')
+    table[0x99] = OpcodeEntry('cdq')
+    table[0x9C] = OpcodeEntry('pushfd')
+    table[0x9D] = OpcodeEntry('popfd')
+    table[0x9E] = OpcodeEntry('sahf')
+    table[0x9F] = OpcodeEntry('lahf')
+    table[0xA0] = OpcodeEntry('mov', 'al, [{imm}]', imm=MOFFS)
+    table[0xA1] = OpcodeEntry('mov', 'eax, [{imm}]', imm=MOFFS)
+    table[0xA2] = OpcodeEntry('mov', '[{imm}], al', imm=MOFFS)
+    table[0xA3] = OpcodeEntry('mov', '[{imm}], eax', imm=MOFFS)
+    table[0xA4] = OpcodeEntry('movsb')
+    table[0xA5] = OpcodeEntry('movsd')
+    table[0xA6] = OpcodeEntry('cmpsb')
+    table[0xA7] = OpcodeEntry('cmpsd')
+    table[0xA8] = OpcodeEntry('test', 'al, {imm}', imm='B')
+    table[0xA9] = OpcodeEntry('test', 'eax, {imm}', imm='I')
+    table[0xAA] = OpcodeEntry('stosb')
+    table[0xAB] = OpcodeEntry('stosd')
+    table[0xAC] = OpcodeEntry('lodsb')
+    table[0xAD] = OpcodeEntry('lodsd')
+    table[0xAE] = OpcodeEntry('scasb')
+    table[0xAF] = OpcodeEntry('scasd')
+
+    for opcode in (0xC0, 0xC1, 0xD0, 0xD1, 0xD2, 0xD3, 0xF6, 0xF7, 0xFE, 0xFF):
+        table[opcode] = OpcodeEntry('<group>', modrm=ModRM.GROUP)
+    table[0xC2] = OpcodeEntry('ret', '{imm}', imm='H', flow=Flow.RET)
+    table[0xC3] = OpcodeEntry('ret', flow=Flow.RET)
+    table[0xC6] = OpcodeEntry('<group 11>', modrm=ModRM.GROUP)
+    table[0xC7] = OpcodeEntry('<group 11>', modrm=ModRM.GROUP)
+    table[0xC9] = OpcodeEntry('leave')
+    table[0xCC] = OpcodeEntry('int3', flow=Flow.HALT)
+    table[0xCD] = OpcodeEntry('int', '{imm}', imm='B')
+
+    table[0xE0] = OpcodeEntry('loopnz', '{target}', imm='b', flow=Flow.BRANCH, rel=True)
+    table[0xE1] = OpcodeEntry('loopz', '{target}', imm='b', flow=Flow.BRANCH, rel=True)
+    table[0xE2] = OpcodeEntry('loop', '{target}', imm='b', flow=Flow.BRANCH, rel=True)
+    table[0xE3] = OpcodeEntry('jecxz', '{target}', imm='b', flow=Flow.BRANCH, rel=True)
+    table[0xE8] = OpcodeEntry('call', '{target}', imm='i', flow=Flow.CALL, rel=True)
+    table[0xE9] = OpcodeEntry('jmp', '{target}', imm='i', flow=Flow.JUMP, rel=True)
+    table[0xEB] = OpcodeEntry('jmp', 'short {target}', imm='b', flow=Flow.JUMP, rel=True)
+
+    table[0xF4] = OpcodeEntry('hlt', flow=Flow.HALT)
+    table[0xF5] = OpcodeEntry('cmc')
+    table[0xF8] = OpcodeEntry('clc')
+    table[0xF9] = OpcodeEntry('stc')
+    table[0xFA] = OpcodeEntry('cli')
+    table[0xFB] = OpcodeEntry('sti')
+    table[0xFC] = OpcodeEntry('cld')
+    table[0xFD] = OpcodeEntry('std')
+    return table
+
+
+def build_two_byte_table() -> list[OpcodeEntry]:
+    table = [UNKNOWN_0F] * 256
+    table[0x05] = OpcodeEntry('syscall')
+    table[0x0B] = OpcodeEntry('ud2', flow=Flow.HALT)
+    table[0x1F] = OpcodeEntry('nop', '{rm32}', ModRM.REG)
+    table[0x31] = OpcodeEntry('rdtsc')
+    table[0x34] = OpcodeEntry('sysenter')
+    table[0xA2] = OpcodeEntry('cpuid')
+    table[0xAF] = OpcodeEntry('imul', '{r32}, {rm32}', ModRM.REG)
+    table[0xB6] = OpcodeEntry('movzx', '{r32}, {rm8}', ModRM.REG)
+    table[0xB7] = OpcodeEntry('movzx', '{r32}, {rm16}', ModRM.REG)
+    table[0xBE] = OpcodeEntry('movsx', '{r32}, {rm8}', ModRM.REG)
+    table[0xBF] = OpcodeEntry('movsx', '{r32}, {rm16}', ModRM.REG)
+    for cc in range(16):
+        table[0x80 + cc] = OpcodeEntry('j' + CONDITIONS[cc], '{target}', imm='i', flow=Flow.BRANCH, rel=True)
+        table[0x90 + cc] = OpcodeEntry('set' + CONDITIONS[cc], '{rm8}', ModRM.REG)
+    for reg in range(8):
+        table[0xC8 + reg] = OpcodeEntry('bswap', '{r32}')
+    return table
+
+
+def build_group_tables() -> dict[int, tuple[OpcodeEntry, ...]]:
+    alu = ('add', 'or', 'adc', 'sbb', 'and', 'sub', 'xor', 'cmp')
+    shifts = ('rol', 'ror', 'rcl', 'rcr', 'shl', 'shr', 'sal', 'sar')
+    unary = ('test', 'test', 'not', 'neg', 'mul', 'imul', 'div', 'idiv')
+    groups: dict[int, tuple[OpcodeEntry, ...]] = {
+        0x80: tuple(OpcodeEntry(op, '{rm8}, {imm}', ModRM.GROUP, 'B') for op in alu),
+        0x81: tuple(OpcodeEntry(op, '{rm32}, {imm}', ModRM.GROUP, 'I') for op in alu),
+        0x83: tuple(OpcodeEntry(op, '{rm32}, {imm}', ModRM.GROUP, 'b') for op in alu),
+        0xC0: tuple(OpcodeEntry(op, '{rm8}, {imm_dec}', ModRM.GROUP, 'B') for op in shifts),
+        0xC1: tuple(OpcodeEntry(op, '{rm32}, {imm_dec}', ModRM.GROUP, 'B') for op in shifts),
+        0xD0: tuple(OpcodeEntry(op, '{rm8}, 1', ModRM.GROUP) for op in shifts),
+        0xD1: tuple(OpcodeEntry(op, '{rm32}, 1', ModRM.GROUP) for op in shifts),
+        0xD2: tuple(OpcodeEntry(op, '{rm8}, cl', ModRM.GROUP) for op in shifts),
+        0xD3: tuple(OpcodeEntry(op, '{rm32}, cl', ModRM.GROUP) for op in shifts),
+    }
+    # Only the two test forms of group 3 have an immediate
+    groups[0xF6] = tuple(
+        OpcodeEntry(op, '{rm8}, {imm}', ModRM.GROUP, 'B') if op == 'test' else OpcodeEntry(op, '{rm8}', ModRM.GROUP)
+        for op in unary
+    )
+    groups[0xF7] = tuple(
+        OpcodeEntry(op, '{rm32}, {imm}', ModRM.GROUP, 'I') if op == 'test' else OpcodeEntry(op, '{rm32}', ModRM.GROUP)
+        for op in unary
+    )
+    groups[0x8F] = (OpcodeEntry('pop', '{rm32}', ModRM.GROUP),) + (UNKNOWN,) * 7
+    groups[0xC6] = (OpcodeEntry('mov', '{rm8}, {imm}', ModRM.GROUP, 'B'),) + (UNKNOWN,) * 7
+    groups[0xC7] = (OpcodeEntry('mov', '{rm32}, {imm}', ModRM.GROUP, 'I'),) + (UNKNOWN,) * 7
+    groups[0xFE] = (
+        OpcodeEntry('inc', '{rm8}', ModRM.GROUP),
+        OpcodeEntry('dec', '{rm8}', ModRM.GROUP),
+    ) + (UNKNOWN,) * 6
+    groups[0xFF] = (
+        OpcodeEntry('inc', '{rm32}', ModRM.GROUP),
+        OpcodeEntry('dec', '{rm32}', ModRM.GROUP),
+        OpcodeEntry('call', '{rm32}', ModRM.GROUP, flow=Flow.INDIRECT),
+        UNKNOWN,
+        OpcodeEntry('jmp', '{rm32}', ModRM.GROUP, flow=Flow.INDIRECT),
+        UNKNOWN,
+        OpcodeEntry('push', '{rm32}', ModRM.GROUP),
+        UNKNOWN,
+    )
+    return groups
+
+
+ONE_BYTE_TABLE = build_one_byte_table()
+TWO_BYTE_TABLE = build_two_byte_table()
+GROUP_TABLES = build_group_tables()
+
+
+def format_memory(mod: int, rm: int, sib: int, disp: int) -> str:
+    """Format a ModRM memory operand (32-bit addressing)"""
+    parts = []
+    if rm == 4:
+        scale = 1 << (sib >> 6)
+        index = (sib >> 3) & 7
+        base = sib & 7
+        if not (base == 5 and mod == 0):
+            parts.append(REG32_NAMES[base])
+        if index != 4:
+            parts.append(REG32_NAMES[index] + (f'*{scale}' if scale > 1 else ''))
+    elif not (mod == 0 and rm == 5):
+        parts.append(REG32_NAMES[rm])
+    if not parts:
+        return f'[0x{disp & 0xFFFFFFFF:x}]'
+    if disp < 0:
+        return f'[{"+".join(parts)}-0x{-disp:x}]'
+    if disp > 0:
+        return f'[{"+".join(parts)}+0x{disp:x}]'
+    return f'[{"+".join(parts)}]'
+
+
+class Instruction(NamedTuple):
+    address: int
+    raw: bytes
+    entry: OpcodeEntry
+    opcode: int  # One byte opcode, 0x0Fxx for the two byte ones
+    reg: int  # Register encoded in the low bits of the opcode or in ModRM.reg
+    mod: int = 3  # ModRM fields (register direct when there is no ModRM)
+    rm: int = 0
+    sib: int = 0
+    disp: int = 0
+    imm: int | None = None
+    prefixes: bytes = b''
+
+    @property
+    def operand16(self) -> bool:
+        """The operand size prefix selects 16-bit operands"""
+        return OPERAND_SIZE_PREFIX in self.prefixes
+
+    @property
+    def segment(self) -> str:
+        """Segment override of the memory operand ('' when there is none)"""
+        overrides = [SEGMENT_PREFIXES[prefix] for prefix in self.prefixes if prefix in SEGMENT_PREFIXES]
+        return overrides[-1] if overrides else ''
+
+    @property
+    def mnemonic(self) -> str:
+        mnemonic = self.entry.mnemonic
+        return MNEMONICS16.get(mnemonic, mnemonic) if self.operand16 else mnemonic
+
+    @property
+    def flow(self) -> Flow:
+        return self.entry.flow
+
+    @property
+    def length(self) -> int:
+        return len(self.raw)
+
+    @property
+    def next_address(self) -> int:
+        return self.address + len(self.raw)
+
+    @property
+    def target(self) -> int | None:
+        """Destination of a relative jump/call/loop (None for the other instructions)"""
+        if self.entry.rel and self.imm is not None:
+            # A 16-bit jump truncates eip to its low word
+            return (self.address + len(self.raw) + self.imm) & (0xFFFF if self.operand16 else 0xFFFFFFFF)
+        return None
+
+    def rm_operand(self, names: tuple[str, ...]) -> str:
+        if self.mod == 3:
+            return names[self.rm]
+        return format_memory(self.mod, self.rm, self.sib, self.disp)
+
+    @property
+    def op_str(self) -> str:
+        template = self.entry.operands
+        if not template:
+            return ''
+        imm = self.imm or 0
+        names = REG32_NAMES
+        if self.operand16:
+            names = REG16_NAMES
+            template = template.replace('eax', 'ax')
+        op_str = template.format(
+            r32=names[self.reg],
+            r8=REG8_NAMES[self.reg],
+            rm32=self.rm_operand(names) if '{rm' in template else '',
+            rm16=self.rm_operand(REG16_NAMES) if '{rm' in template else '',
+            rm8=self.rm_operand(REG8_NAMES) if '{rm' in template else '',
+            imm=f'0x{imm & 0xFFFFFFFF:x}',
+            imm_dec=imm,
+            target=f'0x{self.target or 0:x} ({imm:+d})',
+        )
+        segment = self.segment
+        return op_str.replace('[', f'{segment}:[', 1) if segment else op_str
+
+    @property
+    def text(self) -> str:
+        op_str = self.op_str
+        repeats = ''.join(REPEAT_PREFIXES[prefix] + ' ' for prefix in self.prefixes if prefix in REPEAT_PREFIXES)
+        return f'{repeats}{self.mnemonic} {op_str}' if op_str else repeats + self.mnemonic
+
+    def __str__(self) -> str:
+        return f'0x{self.address:08x}: {self.raw.hex(" "):<17} {self.text}'
+
+    def as_dict(self) -> dict[str, int | str]:
+        return {'address': self.address, 'bytes': self.raw.hex(), 'text': self.text}
+
+
+def decode(code: bytes | memoryview, offset: int = 0, address: int = 0) -> Instruction | None:
+    """Decode the instruction at `code[offset]` mapped at `address`. Returns None
+    when the instruction is truncated by the end of `code`."""
+    try:
+        opcode = code[offset]
+        pos = offset + 1
+        # A run of prefixes too long for an instruction ends on one, which the table rejects
+        while opcode in PREFIXES and pos - offset < MAX_INSTRUCTION_SIZE:
+            opcode = code[pos]
+            pos += 1
+        prefixes = bytes(code[offset : pos - 1])
+        if opcode == 0x0F:
+            opcode2 = code[pos]
+            pos += 1
+            entry = TWO_BYTE_TABLE[opcode2]
+            opcode = 0x0F00 | opcode2
+        else:
+            entry = ONE_BYTE_TABLE[opcode]
+        reg = opcode & 7
+        mod, rm, sib, disp = 3, 0, 0, 0
+
+        if entry.modrm is not ModRM.NONE and ADDRESS_SIZE_PREFIX in prefixes:
+            entry = ADDRESS16
+        elif entry.modrm is not ModRM.NONE:
+            modrm = code[pos]
+            pos += 1
+            mod = modrm >> 6
+            reg = (modrm >> 3) & 7
+            rm = modrm & 7
+            if entry.modrm is ModRM.GROUP:
+                entry = GROUP_TABLES[opcode][reg]
+            if mod != 3:
+                if rm == 4:
+                    sib = code[pos]
+                    pos += 1
+                if mod == 1:
+                    disp = DISP8.unpack_from(code, pos)[0]
+                    pos += 1
+                elif mod == 2 or (mod == 0 and (rm == 5 or (rm == 4 and sib & 7 == 5))):
+                    disp = DISP32.unpack_from(code, pos)[0]
+                    pos += 4
+
+        imm = None
+        if entry.imm:
+            if entry.imm == MOFFS:
+                imm_format = 'H' if ADDRESS_SIZE_PREFIX in prefixes else 'I'
+            elif OPERAND_SIZE_PREFIX in prefixes:
+                imm_format = IMM16_FORMATS.get(entry.imm, entry.imm)
+            else:
+                imm_format = entry.imm
+            imm_struct = IMM_STRUCTS[imm_format]
+            imm = imm_struct.unpack_from(code, pos)[0]
+            pos += imm_struct.size
+    except (IndexError, struct.error):
+        return None
+    return Instruction(address, bytes(code[offset:pos]), entry, opcode, reg, mod, rm, sib, disp, imm, prefixes)
+
+
+def sweep(code: bytes | memoryview, address: int = 0, offset: int = 0) -> Iterator[Instruction]:
+    """Linear sweep: decode the instructions back to back until the end of `code`"""
+    end = len(code)
+    while offset < end:
+        instruction = decode(code, offset, address + offset)
+        if instruction is None:
+            return
+        yield instruction
+        offset += len(instruction.raw)
+
+
+def main() -> None:
+    if len(sys.argv) < 2:
+        print('Usage: python3 x86_decoder.py <hex bytes> [address]')
+        sys.exit(1)
+    code = bytes.fromhex(sys.argv[1])
+    address = int(sys.argv[2], 0) if len(sys.argv) > 2 else 0
+    for instruction in sweep(code, address):
+        print(f'  {instruction}')
+
+
+if __name__ == '__main__':
+    main()